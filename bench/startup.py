@@ -0,0 +1,105 @@
+"""
+Measures how long a freshly spawned worker takes to execute its first
+instruction. Each run starts a new Python process that imports the headless
+core, builds a CPU, loads a program and executes one instruction, so the
+time includes interpreter startup and every import the core pulls in. The
+'pygame' variant imports pygame first, which shows what a worker would pay
+if the core still depended on it.
+"""
+
+import os
+import subprocess
+import sys
+
+from time import time
+
+from bench.workloads import build_rom
+
+# C O N S T A N T S ###########################################################
+
+# The number of processes to start for each variant
+DEFAULT_STARTUP_REPEAT = 10
+
+# The directory the chip8 package is imported from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The program run by each spawned process. It prints the wall clock time at
+# which the first instruction finished, the time spent inside the process,
+# and whether pygame ended up imported.
+STARTUP_SCRIPT = """
+import sys
+import time
+start = time.perf_counter()
+{imports}
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import Framebuffer
+cpu = Chip8CPU(Framebuffer(), seed=0)
+cpu.memory.store_many(0x200, bytes.fromhex(sys.argv[1]))
+cpu.execute_instruction()
+first = time.time()
+print(first, time.perf_counter() - start, int('pygame' in sys.modules))
+"""
+
+# The extra imports made by each variant before the core is imported
+VARIANTS = {
+    'headless': '',
+    'pygame': 'import pygame',
+}
+
+
+# F U N C T I O N S ###########################################################
+
+
+def time_first_instruction(variant, rom):
+    """
+    Starts a process that runs a ROM's first instruction.
+
+    :param variant: the name of the variant to run
+    :param rom: the ROM image
+    :return: the seconds from starting the process to the end of the first
+        instruction, the seconds of that spent inside the process, and
+        whether pygame was imported
+    """
+    script = STARTUP_SCRIPT.format(imports=VARIANTS[variant])
+    environment = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    launched = time()
+    output = subprocess.check_output(
+        [sys.executable, '-c', script, rom.hex()], cwd=ROOT,
+        env=environment, universal_newlines=True)
+    first, in_process, pygame_loaded = output.split()[-3:]
+    return float(first) - launched, float(in_process), pygame_loaded == '1'
+
+
+def measure_startup(repeat=DEFAULT_STARTUP_REPEAT, variants=None,
+                    output=sys.stdout):
+    """
+    Times the first instruction of freshly started processes, reporting the
+    median and fastest of several runs for each variant.
+
+    :param repeat: the number of processes to start for each variant
+    :param variants: the names of the variants, defaults to all of them
+    :param output: the stream to write progress to
+    :return: a dict of results, keyed by variant
+    """
+    rom = build_rom('alu')
+    results = {}
+    for variant in variants or sorted(VARIANTS):
+        runs = sorted(time_first_instruction(variant, rom)
+                      for _ in range(repeat))
+        in_process = sorted(run[1] for run in runs)
+        result = {
+            'first_instruction': runs[len(runs) // 2][0],
+            'fastest': runs[0][0],
+            'in_process': in_process[len(in_process) // 2],
+            'pygame_loaded': any(run[2] for run in runs),
+        }
+        results[variant] = result
+        output.write('{:<10} {:>10.1f} ms to first instruction (fastest '
+                     '{:.1f} ms, {:.1f} ms in process){}\n'.format(
+                         variant, result['first_instruction'] * 1000,
+                         result['fastest'] * 1000,
+                         result['in_process'] * 1000,
+                         ', pygame loaded' if result['pygame_loaded']
+                         else ''))
+        output.flush()
+    return results
@@ -0,0 +1,399 @@
+"""
+Runs the synthetic workloads against each execution backend, and reports
+instructions and frames per second. Results can be written to JSON, and two
+result files can be compared to flag regressions.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+
+from time import perf_counter
+
+from bench.startup import DEFAULT_STARTUP_REPEAT, VARIANTS, measure_startup
+from bench.workloads import WORKLOADS, build_rom, get_workload_quirks
+from chip8.chip8 import Chip8CPU
+from chip8.config import PROGRAM_COUNTER_START
+from chip8.framebuffer import Framebuffer
+from chip8.quirks import DEFAULT_PROFILE
+
+# C O N S T A N T S ###########################################################
+
+# The number of frames to run each workload for
+DEFAULT_FRAMES = 300
+
+# The instructions per frame; far more than a real ROM uses, so that the
+# run is dominated by execution rather than frame overhead
+DEFAULT_INSTRUCTIONS_PER_FRAME = 500
+
+# The number of times each benchmark is run; the fastest run is reported
+DEFAULT_REPEAT = 3
+
+# The slowdown, as a fraction, above which compare reports a regression
+DEFAULT_THRESHOLD = 0.05
+
+# The number of machines the vector backend runs at once
+VECTOR_LANES = 64
+
+# The backends that only run DEFAULT_PROFILE, and so skip workloads that
+# need another quirk profile
+DEFAULT_PROFILE_BACKENDS = ('vector',)
+
+# The metrics compared between result files
+METRICS = ('instructions_per_second', 'frames_per_second')
+
+
+# F U N C T I O N S ###########################################################
+
+
+def run_interpreter(rom, frames, instructions_per_frame,
+                    quirks=DEFAULT_PROFILE):
+    """
+    Runs a ROM on the interpreter with a headless frame buffer.
+
+    :param rom: the ROM image
+    :param frames: the number of frames to run
+    :param instructions_per_frame: the instructions to run per frame
+    :param quirks: the name of the quirk profile to run with
+    :return: the number of instructions executed and the elapsed seconds
+    """
+    cpu = Chip8CPU(Framebuffer(), instructions_per_frame=instructions_per_frame,
+                   seed=0, quirks=quirks)
+    cpu.memory.store_many(PROGRAM_COUNTER_START, rom)
+    return time_frames(cpu.run_frame, frames)
+
+
+def run_jit(rom, frames, instructions_per_frame,
+            quirks=DEFAULT_PROFILE):
+    """
+    Runs a ROM on the basic-block compiler with a headless frame buffer.
+
+    :param rom: the ROM image
+    :param frames: the number of frames to run
+    :param instructions_per_frame: the instructions to run per frame
+    :param quirks: the name of the quirk profile to run with
+    :return: the number of instructions executed and the elapsed seconds
+    """
+    from chip8.jit import BlockJIT
+
+    cpu = Chip8CPU(Framebuffer(), seed=0, quirks=quirks)
+    cpu.memory.store_many(PROGRAM_COUNTER_START, rom)
+    jit = BlockJIT(cpu)
+
+    def run_frame():
+        executed = jit.run(instructions_per_frame)
+        cpu.decrement_timers()
+        cpu.screen.update()
+        return executed
+
+    return time_frames(run_frame, frames)
+
+
+def run_display(rom, frames, instructions_per_frame,
+                quirks=DEFAULT_PROFILE):
+    """
+    Runs a ROM on the interpreter with a pygame Display that presents every
+    frame. Without a window system, SDL's dummy video driver is used.
+
+    :param rom: the ROM image
+    :param frames: the number of frames to run
+    :param instructions_per_frame: the instructions to run per frame
+    :param quirks: the name of the quirk profile to run with
+    :return: the number of instructions executed and the elapsed seconds
+    """
+    from chip8.display import Display
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    screen = Display(scale_factor=5, frame_rate=0)
+    screen.init_display()
+    try:
+        cpu = Chip8CPU(screen, instructions_per_frame=instructions_per_frame,
+                       seed=0, quirks=quirks)
+        cpu.memory.store_many(PROGRAM_COUNTER_START, rom)
+        return time_frames(cpu.run_frame, frames)
+    finally:
+        screen.destroy()
+
+
+def run_array_display(rom, frames, instructions_per_frame,
+                      quirks=DEFAULT_PROFILE):
+    """
+    Runs a ROM on the interpreter with a NumPy ArrayDisplay that presents
+    every frame. Without a window system, SDL's dummy video driver is used.
+
+    :param rom: the ROM image
+    :param frames: the number of frames to run
+    :param instructions_per_frame: the instructions to run per frame
+    :param quirks: the name of the quirk profile to run with
+    :return: the number of instructions executed and the elapsed seconds
+    """
+    from chip8.renderer import ArrayDisplay
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    screen = ArrayDisplay(scale_factor=5, frame_rate=0)
+    screen.init_display()
+    try:
+        cpu = Chip8CPU(screen, instructions_per_frame=instructions_per_frame,
+                       seed=0, quirks=quirks)
+        cpu.memory.store_many(PROGRAM_COUNTER_START, rom)
+        return time_frames(cpu.run_frame, frames)
+    finally:
+        screen.destroy()
+
+
+def run_vector(rom, frames, instructions_per_frame,
+               quirks=DEFAULT_PROFILE):
+    """
+    Runs VECTOR_LANES copies of a ROM in lockstep. Requires NumPy. Frames
+    are counted once per lockstep frame, not once per lane. The vector
+    engine only runs DEFAULT_PROFILE.
+
+    :param rom: the ROM image
+    :param frames: the number of frames to run
+    :param instructions_per_frame: the instructions to run per frame
+    :param quirks: the name of the quirk profile, which must be
+        DEFAULT_PROFILE
+    :return: the total instructions executed across all lanes and the
+        elapsed seconds
+    """
+    from chip8.vector import VectorChip8
+
+    machines = VectorChip8(VECTOR_LANES, instructions_per_frame,
+                           seeds=range(VECTOR_LANES))
+    machines.load(rom)
+    return time_frames(machines.run_frame, frames)
+
+
+def time_frames(run_frame, frames):
+    """
+    Calls run_frame the specified number of times.
+
+    :param run_frame: a function that runs one frame, and returns the
+        number of instructions executed
+    :param frames: the number of frames to run
+    :return: the number of instructions executed and the elapsed seconds
+    """
+    executed = 0
+    start = perf_counter()
+    for _ in range(frames):
+        executed += run_frame()
+    return executed, perf_counter() - start
+
+
+# The backends by name
+BACKENDS = {
+    'interpreter': run_interpreter,
+    'jit': run_jit,
+    'display': run_display,
+    'array': run_array_display,
+    'vector': run_vector,
+}
+
+
+def run_benchmark(workload, backend, frames=DEFAULT_FRAMES,
+                  instructions_per_frame=DEFAULT_INSTRUCTIONS_PER_FRAME,
+                  repeat=DEFAULT_REPEAT):
+    """
+    Runs one workload on one backend, keeping the fastest of several runs.
+
+    :param workload: the name of the workload
+    :param backend: the name of the backend
+    :param frames: the number of frames to run
+    :param instructions_per_frame: the instructions to run per frame
+    :param repeat: the number of runs
+    :return: a dict of results
+    """
+    rom = build_rom(workload)
+    quirks = get_workload_quirks(workload)
+    best = None
+    for _ in range(repeat):
+        executed, seconds = BACKENDS[backend](rom, frames,
+                                              instructions_per_frame, quirks)
+        if best is None or seconds < best[1]:
+            best = (executed, seconds)
+    executed, seconds = best
+    return {
+        'instructions': executed,
+        'frames': frames,
+        'seconds': seconds,
+        'instructions_per_second': executed / seconds if seconds else 0.0,
+        'frames_per_second': frames / seconds if seconds else 0.0,
+    }
+
+
+def run_suite(workloads=None, backends=None, frames=DEFAULT_FRAMES,
+              instructions_per_frame=DEFAULT_INSTRUCTIONS_PER_FRAME,
+              repeat=DEFAULT_REPEAT, output=sys.stdout):
+    """
+    Runs every combination of workload and backend. Backends whose optional
+    dependencies are missing, or that cannot run a workload's quirk profile,
+    are reported and left out of the results.
+
+    :param workloads: the names of the workloads, defaults to all of them
+    :param backends: the names of the backends, defaults to all of them
+    :param frames: the number of frames to run
+    :param instructions_per_frame: the instructions to run per frame
+    :param repeat: the number of runs of each benchmark
+    :param output: the stream to write progress to
+    :return: a dict holding the run's metadata and results
+    """
+    results = {}
+    for workload in workloads or sorted(WORKLOADS):
+        quirks = get_workload_quirks(workload)
+        for backend in backends or sorted(BACKENDS):
+            if backend in DEFAULT_PROFILE_BACKENDS and \
+                    quirks != DEFAULT_PROFILE:
+                output.write('{:<8} {:<12} skipped: needs the {} quirk '
+                             'profile\n'.format(workload, backend, quirks))
+                continue
+            try:
+                result = run_benchmark(workload, backend, frames,
+                                       instructions_per_frame, repeat)
+            except ImportError as exception:
+                output.write('{:<8} {:<12} skipped: {}\n'.format(
+                    workload, backend, exception))
+                continue
+            results.setdefault(workload, {})[backend] = result
+            output.write('{:<8} {:<12} {:>14,.0f} instr/s {:>10,.1f} '
+                         'frames/s\n'.format(
+                             workload, backend,
+                             result['instructions_per_second'],
+                             result['frames_per_second']))
+            output.flush()
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'frames': frames,
+        'instructions_per_frame': instructions_per_frame,
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares two sets of results. Only benchmarks present in both are
+    compared.
+
+    :param baseline: the results of run_suite to compare against
+    :param current: the new results of run_suite
+    :param threshold: the slowdown, as a fraction, that counts as a
+        regression
+    :return: a list of (workload, backend, metric, baseline value, current
+        value, change, regressed) tuples, where change is the fractional
+        difference from the baseline
+    """
+    rows = []
+    for workload, backends in sorted(baseline['results'].items()):
+        for backend, old in sorted(backends.items()):
+            new = current['results'].get(workload, {}).get(backend)
+            if new is None:
+                continue
+            for metric in METRICS:
+                if not old[metric]:
+                    continue
+                change = (new[metric] - old[metric]) / old[metric]
+                rows.append((workload, backend, metric, old[metric],
+                             new[metric], change, change < -threshold))
+    return rows
+
+
+def parse_arguments(argv=None):
+    """
+    Parses the command line arguments passed to the benchmark suite.
+
+    :param argv: the arguments to parse, defaults to sys.argv
+    :return: the parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog='bench',
+        description="Runs the Chip 8 benchmark suite, compares two sets of "
+                    "results, or measures worker startup time.")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run = commands.add_parser('run', help="run the benchmarks")
+    run.add_argument(
+        "-w", "--workload", action='append', choices=sorted(WORKLOADS),
+        dest='workloads', help="a workload to run (default is all of them)")
+    run.add_argument(
+        "-b", "--backend", action='append', choices=sorted(BACKENDS),
+        dest='backends', help="a backend to run (default is all of them)")
+    run.add_argument(
+        "-f", "--frames", type=int, default=DEFAULT_FRAMES,
+        help="the number of frames to run (default is {})".format(
+            DEFAULT_FRAMES))
+    run.add_argument(
+        "-i", "--instructions-per-frame", type=int,
+        default=DEFAULT_INSTRUCTIONS_PER_FRAME, dest='instructions_per_frame',
+        help="the number of instructions per frame (default is {})".format(
+            DEFAULT_INSTRUCTIONS_PER_FRAME))
+    run.add_argument(
+        "-r", "--repeat", type=int, default=DEFAULT_REPEAT,
+        help="the number of runs of each benchmark (default is {})".format(
+            DEFAULT_REPEAT))
+    run.add_argument(
+        "-o", "--output", help="the file to write the results to as JSON")
+
+    startup = commands.add_parser(
+        'startup', help="measure the time for a new process to execute its "
+                        "first instruction")
+    startup.add_argument(
+        "-v", "--variant", action='append', choices=sorted(VARIANTS),
+        dest='variants', help="a variant to run (default is all of them)")
+    startup.add_argument(
+        "-r", "--repeat", type=int, default=DEFAULT_STARTUP_REPEAT,
+        help="the number of processes to start for each variant (default "
+             "is {})".format(DEFAULT_STARTUP_REPEAT))
+    startup.add_argument(
+        "-o", "--output", help="the file to write the results to as JSON")
+
+    compare_parser = commands.add_parser(
+        'compare', help="compare two result files")
+    compare_parser.add_argument("baseline", help="the baseline results")
+    compare_parser.add_argument("current", help="the new results")
+    compare_parser.add_argument(
+        "-t", "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="the slowdown that counts as a regression (default is "
+             "{})".format(DEFAULT_THRESHOLD))
+    return parser.parse_args(argv)
+
+
+def main(argv=None, output=sys.stdout):
+    """
+    Runs the benchmark suite from the command line.
+
+    :param argv: the arguments to parse, defaults to sys.argv
+    :param output: the stream to write to
+    :return: the exit status; 1 if compare found a regression
+    """
+    args = parse_arguments(argv)
+    if args.command == 'run':
+        results = run_suite(args.workloads, args.backends, args.frames,
+                            args.instructions_per_frame, args.repeat, output)
+        if args.output:
+            with open(args.output, 'w') as result_file:
+                json.dump(results, result_file, indent=2, sort_keys=True)
+        return 0
+
+    if args.command == 'startup':
+        results = measure_startup(args.repeat, args.variants, output)
+        if args.output:
+            with open(args.output, 'w') as result_file:
+                json.dump(results, result_file, indent=2, sort_keys=True)
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(args.current) as current_file:
+        current = json.load(current_file)
+    regressions = 0
+    for workload, backend, metric, old, new, change, regressed in \
+            compare(baseline, current, args.threshold):
+        output.write('{:<8} {:<12} {:<24} {:>14,.1f} {:>14,.1f} {:>+8.1%}'
+                     '{}\n'.format(workload, backend, metric, old, new, change,
+                                   '  REGRESSION' if regressed else ''))
+        regressions += regressed
+    return 1 if regressions else 0
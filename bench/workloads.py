@@ -0,0 +1,155 @@
+"""
+Synthetic Chip 8 programs for the benchmark suite. Each workload is an
+endless loop that stresses one part of the emulator, built from a list of
+operands plus any sprite data it needs. Workloads that need a quirk profile
+other than the default name it in WORKLOAD_QUIRKS.
+"""
+
+from chip8.config import PROGRAM_COUNTER_START
+from chip8.quirks import DEFAULT_PROFILE
+
+# C O N S T A N T S ###########################################################
+
+# The address that sprite and scratch data is placed at
+DATA_ADDRESS = 0x300
+
+# Tight register arithmetic: 7xnn, 8xy4 and 8xy5 in a loop
+ALU = [
+    0x6001,  # 200: LOAD V0, 1
+    0x6100,  # 202: LOAD V1, 0
+    0x6200,  # 204: LOAD V2, 0
+    0x8104,  # 206: ADD  V1, V0
+    0x7203,  # 208: ADD  V2, 3
+    0x8125,  # 20A: SUB  V1, V2
+    0x8024,  # 20C: ADD  V0, V2
+    0x7101,  # 20E: ADD  V1, 1
+    0x8215,  # 210: SUB  V2, V1
+    0x1206,  # 212: JUMP 206
+]
+
+# Sprites of several heights, at positions that walk across the screen edges
+# so that both the wrapped and unwrapped drawing paths are taken
+DRAW = [
+    0xA000 | DATA_ADDRESS,  # 200: LOAD I, data
+    0x6000,  # 202: LOAD V0, 0
+    0x6100,  # 204: LOAD V1, 0
+    0xD013,  # 206: DRAW V0, V1, 3
+    0xD018,  # 208: DRAW V0, V1, 8
+    0xD01F,  # 20A: DRAW V0, V1, 15
+    0x7037,  # 20C: ADD  V0, 55
+    0x7113,  # 20E: ADD  V1, 19
+    0xD011,  # 210: DRAW V0, V1, 1
+    0x1206,  # 212: JUMP 206
+]
+
+# Extended mode scrolling in every direction, with a 16x16 sprite drawn in
+# between so that there is something to move
+SCROLL = [
+    0x00FF,  # 200: HIGH
+    0xA000 | DATA_ADDRESS,  # 202: LOAD I, data
+    0x6000,  # 204: LOAD V0, 0
+    0xD000,  # 206: DRAW V0, V0, 16x16
+    0x00C4,  # 208: SCROLL DOWN 4
+    0x00FB,  # 20A: SCROLL RIGHT
+    0x00FC,  # 20C: SCROLL LEFT
+    0x00C1,  # 20E: SCROLL DOWN 1
+    0x00FB,  # 210: SCROLL RIGHT
+    0x7029,  # 212: ADD  V0, 41
+    0x1206,  # 214: JUMP 206
+]
+
+# BCD conversion and register stores and loads through the index register
+MEMORY = [
+    0x6000,  # 200: LOAD V0, 0
+    0xA000 | DATA_ADDRESS,  # 202: LOAD I, data
+    0xF033,  # 204: BCD  V0
+    0xF755,  # 206: STOR [I], V7
+    0xF765,  # 208: LOAD V7, [I]
+    0xFF55,  # 20A: STOR [I], VF
+    0xFF65,  # 20C: LOAD VF, [I]
+    0x7007,  # 20E: ADD  V0, 7
+    0x1202,  # 210: JUMP 202
+]
+
+# XO-CHIP drawing on both bitplanes, long index loads and skips over them,
+# register range loads and stores, and scrolling up
+XOCHIP = [
+    0xF301,  # 200: PLANE 3
+    0xF000,  # 202: LOAD I, data
+    DATA_ADDRESS,
+    0x6000,  # 206: LOAD V0, 0
+    0x6100,  # 208: LOAD V1, 0
+    0xD01F,  # 20A: DRAW V0, V1, 15 on both planes
+    0x5A23,  # 20C: LOAD V2 - VA, [I]
+    0x5A22,  # 20E: STOR [I], V2 - VA
+    0x3000,  # 210: SKE  V0, 0
+    0xF000,  # 212: LOAD I, data
+    DATA_ADDRESS,
+    0x7035,  # 216: ADD  V0, 53
+    0x7117,  # 218: ADD  V1, 23
+    0x00D1,  # 21A: SCROLL UP 1
+    0x120A,  # 21C: JUMP 20A
+]
+
+# A 16x16 checkerboard-ish sprite, also used as scratch space
+SPRITE_DATA = bytes([0xF0, 0x0F, 0xAA, 0x55, 0xFF, 0x00, 0x3C, 0xC3] * 4)
+
+# The workloads by name: (operands, data placed at DATA_ADDRESS)
+WORKLOADS = {
+    'alu': (ALU, b''),
+    'draw': (DRAW, SPRITE_DATA),
+    'scroll': (SCROLL, SPRITE_DATA),
+    'memory': (MEMORY, bytes(16)),
+    'xochip': (XOCHIP, SPRITE_DATA),
+}
+
+# The quirk profile of each workload that does not run with DEFAULT_PROFILE
+WORKLOAD_QUIRKS = {
+    'xochip': 'xochip',
+}
+
+
+# F U N C T I O N S ###########################################################
+
+
+def assemble(operands, data=b''):
+    """
+    Builds a ROM image from a list of operands, with the data placed at
+    DATA_ADDRESS.
+
+    :param operands: the instructions, starting at PROGRAM_COUNTER_START
+    :param data: the bytes to place at DATA_ADDRESS
+    :return: the ROM image, to be loaded at PROGRAM_COUNTER_START
+    """
+    code = bytearray()
+    for operand in operands:
+        code.append(operand >> 8)
+        code.append(operand & 0xFF)
+    offset = DATA_ADDRESS - PROGRAM_COUNTER_START
+    if len(code) > offset:
+        raise ValueError("program overlaps the data area")
+    if data:
+        code.extend(bytes(offset - len(code)))
+        code.extend(data)
+    return bytes(code)
+
+
+def build_rom(name):
+    """
+    Assembles the named workload.
+
+    :param name: the name of the workload
+    :return: the ROM image
+    """
+    operands, data = WORKLOADS[name]
+    return assemble(operands, data)
+
+
+def get_workload_quirks(name):
+    """
+    Looks up the quirk profile that the named workload runs with.
+
+    :param name: the name of the workload
+    :return: the name of the quirk profile
+    """
+    return WORKLOAD_QUIRKS.get(name, DEFAULT_PROFILE)
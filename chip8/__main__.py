@@ -0,0 +1,4 @@
+from chip8.batch import main
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+An ahead-of-time analyzer for Chip 8 ROMs. Starting at the entry point, it
+follows every jump, call, skip and return it can see, and tracks the value
+of the index register where it is a known constant. That lets it resolve
+Bnnn computed jumps, and tell which addresses Fx33, Fx55 and the XO-CHIP
+5xy2 can write to. The result is a control flow graph of basic blocks, an
+index of the bytes that the program may write, and a list of any unknown
+op-codes that can be reached. Execution engines can use the index to decide
+which code is safe to cache or compile.
+"""
+
+import argparse
+import sys
+
+from collections import namedtuple
+
+from chip8.chip8 import Chip8CPU, UnknownOpCodeException
+from chip8.config import PROGRAM_COUNTER_START
+from chip8.loader import load_image
+from chip8.quirks import DEFAULT_PROFILE, JUMP_INDEX, PROFILES
+
+# C O N S T A N T S ###########################################################
+
+# The index register value used when it could hold more than one value
+UNKNOWN = -1
+
+# The top level operations that skip the next instruction
+SKIP_OPERATIONS = (0x3, 0x4, 0x5, 0x9, 0xE)
+
+Block = namedtuple('Block', ['start', 'end', 'successors'])
+
+
+# C L A S S E S ###############################################################
+
+
+class Analysis(object):
+    """
+    The result of analyzing a program. Addresses are memory addresses, and
+    block ends are exclusive.
+
+        instructions     - the op-code at every reachable instruction address
+        blocks           - the basic blocks, keyed by start address
+        written          - the addresses that Fx33, Fx55 and 5xy2 may write
+                           to
+        unknown_writes   - the addresses of Fx33, Fx55 and 5xy2 instructions
+                           whose index register is not a known constant
+        unresolved_jumps - the addresses of Bnnn instructions whose target
+                           is not a known constant
+        unknown_opcodes  - the op-code at every reachable address that the
+                           CPU cannot decode
+    """
+
+    def __init__(self):
+        self.instructions = {}
+        self.blocks = {}
+        self.written = set()
+        self.unknown_writes = set()
+        self.unresolved_jumps = set()
+        self.unknown_opcodes = {}
+
+    def may_self_modify(self):
+        """
+        Returns whether the program may write to its own code.
+        :return: True if any write could reach a reachable instruction
+        """
+        if self.unknown_writes:
+            return True
+        return any(address in self.written or address + 1 in self.written
+                   for address in self.instructions)
+
+    def is_cacheable(self, address):
+        """
+        Returns whether the instruction at an address can safely be decoded
+        or compiled once, because nothing the analysis found can write to it.
+        :param address: the address of the instruction
+        :return: True if the instruction is reachable and never written
+        """
+        return (address in self.instructions and not self.unknown_writes and
+                address not in self.written and
+                address + 1 not in self.written)
+
+    def report(self):
+        """
+        Formats a summary of the analysis.
+        :return: the summary as text
+        """
+        lines = [
+            '{} reachable instructions in {} blocks'.format(
+                len(self.instructions), len(self.blocks)),
+            '{} bytes written by Fx33/Fx55/5xy2, {} writes through an '
+            'unknown index'.format(len(self.written),
+                                   len(self.unknown_writes)),
+            'may self-modify: {}'.format(
+                'yes' if self.may_self_modify() else 'no'),
+        ]
+        for address in sorted(self.unresolved_jumps):
+            lines.append('unresolved computed jump at {:#05x}'.format(address))
+        for address, opcode in sorted(self.unknown_opcodes.items()):
+            lines.append('unknown op-code {:04X} at {:#05x}'.format(
+                opcode, address))
+        for start, block in sorted(self.blocks.items()):
+            lines.append('block {:#05x}-{:#05x} -> {}'.format(
+                start, block.end - 2, ', '.join(
+                    '{:#05x}'.format(successor)
+                    for successor in block.successors) or 'none'))
+        return '\n'.join(lines)
+
+
+# F U N C T I O N S ###########################################################
+
+
+def analyze(memory, start=PROGRAM_COUNTER_START, index=0, cpu=None):
+    """
+    Analyzes the program held in memory.
+    :param memory: the full contents of memory, with the program loaded
+    :param start: the entry point
+    :param index: the value of the index register at the entry point, or
+        UNKNOWN
+    :param cpu: the Chip8CPU whose decoder decides which op-codes are known,
+        and whose quirk profile decides what Bnnn, Fx55 and Fx65 do,
+        defaults to a new one without a screen
+    :return: an Analysis
+    """
+    if cpu is None:
+        cpu = Chip8CPU(None)
+    analysis = Analysis()
+    successors = {}
+    index_at = {start: index}
+    pending = [start]
+
+    while pending:
+        address = pending.pop()
+        if address + 1 >= len(memory):
+            continue
+        opcode = (memory[address] << 8) | memory[address + 1]
+        analysis.instructions[address] = opcode
+        current_index = index_at[address]
+        try:
+            cpu.decode(opcode)
+        except UnknownOpCodeException:
+            analysis.unknown_opcodes[address] = opcode
+            successors[address] = ()
+            continue
+
+        next_index, targets = step(analysis, address, opcode, current_index,
+                                   cpu.quirks, memory)
+        previous = successors.get(address, ())
+        successors[address] = tuple(sorted(set(previous) | set(targets)))
+        for target in targets:
+            merged = merge(index_at.get(target), next_index)
+            if merged != index_at.get(target) or target not in successors:
+                index_at[target] = merged
+                pending.append(target)
+
+    analysis.blocks = build_blocks(start, successors)
+    return analysis
+
+
+def step(analysis, address, opcode, index, quirks=PROFILES[DEFAULT_PROFILE],
+         memory=None):
+    """
+    Works out where control can go after an instruction, and what the index
+    register holds afterwards. Writes through the index register are
+    recorded in the analysis.
+    :param analysis: the Analysis to record writes and unresolved jumps in
+    :param address: the address of the instruction
+    :param opcode: the instruction
+    :param index: the value of the index register before the instruction
+    :param quirks: the chip8.quirks.Quirks of the CPU
+    :param memory: the full contents of memory, which the XO-CHIP F000 nnnn
+        instruction and the skips over it are read from
+    :return: the value of the index register after the instruction, and the
+        addresses that may be executed next
+    """
+    operation = (opcode & 0xF000) >> 12
+    source = (opcode & 0x0F00) >> 8
+    nnn = opcode & 0x0FFF
+    following = address + 2
+
+    if quirks.xochip:
+        if operation == 0xF and source and opcode & 0x00FF in (0x00, 0x02):
+            analysis.unknown_opcodes[address] = opcode
+            return index, ()
+        if opcode == 0xF000:
+            if memory is None:
+                return UNKNOWN, (following + 2,)
+            return (memory[following] << 8) | memory[following + 1], \
+                (following + 2,)
+        if operation == 0x5 and opcode & 0x000F == 0x2:
+            target = (opcode & 0x00F0) >> 4
+            length = abs(target - source) + 1
+            if index == UNKNOWN:
+                analysis.unknown_writes.add(address)
+            else:
+                analysis.written.update(range(index, index + length))
+            return index, (following,)
+        if operation == 0x5 and opcode & 0x000F == 0x3:
+            return index, (following,)
+        if operation in SKIP_OPERATIONS:
+            if memory is None:
+                return index, (following, following + 2, following + 4)
+            if is_long_load(memory, following):
+                return index, (following, following + 4)
+
+    if operation == 0x0:
+        if opcode & 0x00FF in (0xEE, 0xFD):
+            return index, ()
+        return index, (following,)
+    if operation == 0x1:
+        return index, (nnn,)
+    if operation == 0x2:
+        return index, (nnn, following)
+    if operation in SKIP_OPERATIONS:
+        return index, (following, following + 2)
+    if operation == 0xA:
+        return nnn, (following,)
+    if operation == 0xB:
+        if index == UNKNOWN or quirks.jump != JUMP_INDEX:
+            analysis.unresolved_jumps.add(address)
+            return index, ()
+        return index, (index + nnn,)
+    if operation == 0xF:
+        sub_operation = opcode & 0x00FF
+        if sub_operation in (0x1E, 0x29, 0x30):
+            return UNKNOWN, (following,)
+        if sub_operation in (0x33, 0x55):
+            length = 3 if sub_operation == 0x33 else source + 1
+            if index == UNKNOWN:
+                analysis.unknown_writes.add(address)
+            else:
+                analysis.written.update(range(index, index + length))
+        if sub_operation in (0x55, 0x65) and quirks.increment and \
+                index != UNKNOWN:
+            return (index + source + 1) & 0xFFFF, (following,)
+    return index, (following,)
+
+
+def is_long_load(memory, address):
+    """
+    Returns whether the instruction at an address is the XO-CHIP F000 nnnn,
+    which is 4 bytes long.
+    :param memory: the full contents of memory
+    :param address: the address of the instruction
+    :return: True if the instruction is F000
+    """
+    return address + 1 < len(memory) and memory[address] == 0xF0 and \
+        memory[address + 1] == 0x00
+
+
+def merge(first, second):
+    """
+    Combines two possible values of the index register.
+    :param first: a value, or None if there is none yet
+    :param second: another value
+    :return: the value if both agree, otherwise UNKNOWN
+    """
+    if first is None or first == second:
+        return second
+    return UNKNOWN
+
+
+def build_blocks(start, successors):
+    """
+    Groups reachable instructions into basic blocks. A block starts at the
+    entry point, at any instruction that is the target of a branch, and
+    after any instruction that does not simply fall through.
+    :param start: the entry point
+    :param successors: the possible next addresses of every instruction
+    :return: the Blocks, keyed by start address
+    """
+    leaders = {start}
+    for address, targets in successors.items():
+        if targets != (address + 2,):
+            leaders.update(targets)
+
+    blocks = {}
+    for leader in leaders:
+        if leader not in successors:
+            continue
+        address = leader
+        while successors[address] == (address + 2,) and \
+                address + 2 not in leaders and address + 2 in successors:
+            address += 2
+        blocks[leader] = Block(leader, address + 2, successors[address])
+    return blocks
+
+
+def analyze_rom(filename, offset=PROGRAM_COUNTER_START,
+                quirks=DEFAULT_PROFILE):
+    """
+    Loads a ROM into an otherwise empty memory image and analyzes it. The
+    image is the size of the memory of a CPU running the quirk profile, so
+    XO-CHIP ROMs may be up to 64 KB.
+    :param filename: the ROM file
+    :param offset: the address the ROM is loaded at, and its entry point
+    :param quirks: the name of the chip8.quirks profile to analyze with, or
+        a Quirks
+    :return: an Analysis
+    """
+    cpu = Chip8CPU(None, quirks=quirks)
+    rom = load_image(filename)
+    size = len(cpu.memory)
+    if offset + len(rom) > size:
+        raise ValueError("ROM {} does not fit in memory".format(filename))
+    memory = bytearray(size)
+    memory[offset:offset + len(rom)] = rom
+    return analyze(memory, offset, cpu=cpu)
+
+
+def parse_arguments(argv=None):
+    """
+    Parses the command line arguments passed to the analyzer.
+
+    :param argv: the arguments to parse, defaults to sys.argv
+    :return: the parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Analyzes Chip 8 ROMs and prints a summary of each.")
+    parser.add_argument(
+        "roms", nargs='+', help="the ROM files to analyze")
+    parser.add_argument(
+        "--quirks", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+        help="the quirk profile to analyze every ROM with "
+             "(default is {})".format(DEFAULT_PROFILE))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Analyzes the ROMs named on the command line, and prints a summary of
+    each.
+    :param argv: the arguments, defaults to sys.argv
+    :return: the exit status; 1 if any ROM has reachable unknown op-codes
+    """
+    args = parse_arguments(argv)
+    status = 0
+    for filename in args.roms:
+        analysis = analyze_rom(filename, quirks=args.quirks)
+        print('{}:'.format(filename))
+        print(analysis.report())
+        if analysis.unknown_opcodes:
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
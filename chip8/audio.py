@@ -0,0 +1,236 @@
+"""
+Sound output for the Chip 8 sound timer. The tone is a square wave that is
+generated once, when the audio device is opened, and looped by pygame.mixer
+for as long as the sound timer is non-zero. The CPU only reports the sound
+timer once per frame, so producing sound never blocks or allocates in the
+CPU loop. NullAudio has the same interface without a device, for headless
+runs and tests. pygame is only imported when an Audio device is opened.
+
+XO-CHIP programs can replace the square wave with a pattern of 128 one-bit
+samples, played back at a rate set by the pitch register. Loading a pattern
+or pitch only records it; the pattern is resampled to the mixer's rate by
+the next once-per-frame update, however many times it changed during the
+frame, and looped in the same way as the square wave.
+"""
+
+from array import array
+
+# C O N S T A N T S ###########################################################
+
+# The sample rate the mixer is opened with
+SAMPLE_RATE = 44100
+
+# The frequency of the tone, in Hz
+TONE_FREQUENCY = 440
+
+# The volume of the tone, as a fraction of full scale
+VOLUME = 0.25
+
+# The number of samples the mixer buffers; small, so that the tone starts
+# and stops within a frame
+MIXER_BUFFER = 512
+
+# The number of bytes in an XO-CHIP audio pattern, each holding 8 samples
+PATTERN_BYTES = 16
+
+# The XO-CHIP pitch register's initial value, and the rate in samples per
+# second that a pattern plays at with that pitch
+DEFAULT_PITCH = 64
+PATTERN_RATE = 4000
+
+
+# C L A S S E S ###############################################################
+
+
+class Audio(object):
+    """
+    Plays a looped square wave through pygame.mixer while the sound timer is
+    running.
+    """
+
+    def __init__(self, frequency=TONE_FREQUENCY, volume=VOLUME):
+        """
+        Sets up the tone, without opening the audio device.
+        :param frequency: the frequency of the tone, in Hz
+        :param volume: the volume, as a fraction of full scale
+        """
+        self.frequency = frequency
+        self.volume = volume
+        self.pattern = None
+        self.pitch = DEFAULT_PITCH
+        self.pattern_changed = False
+        self.mixer = None
+        self.tone = None
+        self.playing = False
+
+    def open(self):
+        """
+        Opens the audio device, and builds the tone in the format the mixer
+        ended up with. Raises pygame.error if there is no audio device.
+        """
+        from pygame import mixer
+
+        self.mixer = mixer
+        if not mixer.get_init():
+            mixer.init(frequency=SAMPLE_RATE, size=-16, channels=1,
+                       buffer=MIXER_BUFFER)
+        self.tone = self.build_tone()
+        self.pattern_changed = False
+
+    def build_tone(self):
+        """
+        Builds the looped tone: the audio pattern if one is loaded, or the
+        square wave otherwise.
+        :return: the pygame.mixer.Sound
+        """
+        sample_rate, _, channels = self.mixer.get_init()
+        if self.pattern is None:
+            samples = square_wave(self.frequency, sample_rate, self.volume)
+        else:
+            samples = pattern_wave(self.pattern, self.pitch, sample_rate,
+                                   self.volume)
+        if channels > 1:
+            samples = array('h', [sample for sample in samples
+                                  for _ in range(channels)])
+        return self.mixer.Sound(buffer=samples)
+
+    def load_pattern(self, pattern, pitch):
+        """
+        Records an XO-CHIP audio pattern to replace the tone with. Nothing
+        is built here, as this is called from the CPU loop; the next call to
+        update() rebuilds the tone. The square wave does not depend on the
+        pitch, so changing only the pitch without a pattern changes nothing.
+        :param pattern: the PATTERN_BYTES of the pattern, or None for the
+            square wave
+        :param pitch: the value of the pitch register
+        """
+        pattern = bytes(pattern) if pattern is not None else None
+        if pattern != self.pattern or \
+                (pattern is not None and pitch != self.pitch):
+            self.pattern_changed = True
+        self.pattern = pattern
+        self.pitch = pitch
+
+    def update(self, sound_timer):
+        """
+        Rebuilds the tone if the audio pattern changed since the last call,
+        and starts or stops it. Called once per frame. If the tone is
+        playing, the rebuilt one takes over at once.
+        :param sound_timer: the current value of the sound timer
+        """
+        if self.pattern_changed and self.tone is not None:
+            self.pattern_changed = False
+            tone = self.build_tone()
+            if self.playing:
+                self.tone.stop()
+                tone.play(loops=-1)
+            self.tone = tone
+        if sound_timer:
+            if not self.playing:
+                self.tone.play(loops=-1)
+                self.playing = True
+        elif self.playing:
+            self.tone.stop()
+            self.playing = False
+
+    def close(self):
+        """
+        Stops the tone and closes the audio device.
+        """
+        if self.tone is not None:
+            self.tone.stop()
+            self.tone = None
+            self.mixer.quit()
+        self.playing = False
+
+
+class NullAudio(object):
+    """
+    An audio device that plays nothing, but keeps track of when it would
+    have played.
+    """
+
+    __slots__ = ('playing', 'beeps', 'pattern', 'pitch')
+
+    def __init__(self):
+        self.playing = False
+        self.beeps = 0
+        self.pattern = None
+        self.pitch = DEFAULT_PITCH
+
+    def open(self):
+        pass
+
+    def load_pattern(self, pattern, pitch):
+        """
+        Records the XO-CHIP audio pattern that would be played.
+        :param pattern: the PATTERN_BYTES of the pattern, or None
+        :param pitch: the value of the pitch register
+        """
+        self.pattern = bytes(pattern) if pattern is not None else None
+        self.pitch = pitch
+
+    def update(self, sound_timer):
+        """
+        Records whether the tone would be playing.
+        :param sound_timer: the current value of the sound timer
+        """
+        if sound_timer and not self.playing:
+            self.beeps += 1
+        self.playing = bool(sound_timer)
+
+    def close(self):
+        self.playing = False
+
+
+# F U N C T I O N S ###########################################################
+
+
+def square_wave(frequency=TONE_FREQUENCY, sample_rate=SAMPLE_RATE,
+                volume=VOLUME):
+    """
+    Builds a single period of a square wave, as signed 16-bit samples. The
+    period is rounded to a whole number of samples, so that it loops without
+    a click.
+
+    :param frequency: the frequency of the wave, in Hz
+    :param sample_rate: the number of samples per second
+    :param volume: the amplitude, as a fraction of full scale
+    :return: an array of samples
+    """
+    period = max(2, int(round(sample_rate / float(frequency))))
+    high = period // 2
+    amplitude = int(32767 * volume)
+    return array('h', [amplitude] * high + [-amplitude] * (period - high))
+
+
+def pattern_rate(pitch):
+    """
+    Works out the rate an XO-CHIP audio pattern plays at.
+    :param pitch: the value of the pitch register
+    :return: the number of pattern samples played per second
+    """
+    return PATTERN_RATE * 2.0 ** ((pitch - DEFAULT_PITCH) / 48.0)
+
+
+def pattern_wave(pattern, pitch=DEFAULT_PITCH, sample_rate=SAMPLE_RATE,
+                 volume=VOLUME):
+    """
+    Resamples one pass through an XO-CHIP audio pattern to signed 16-bit
+    samples. Each bit of the pattern, most significant first, is a sample
+    that is either high or low.
+
+    :param pattern: the PATTERN_BYTES of the pattern
+    :param pitch: the value of the pitch register
+    :param sample_rate: the number of samples per second
+    :param volume: the amplitude, as a fraction of full scale
+    :return: an array of samples
+    """
+    bits = len(pattern) * 8
+    step = pattern_rate(pitch) / float(sample_rate)
+    length = max(1, int(round(bits / step)))
+    amplitude = int(32767 * volume)
+    levels = [amplitude if pattern[bit >> 3] & (0x80 >> (bit & 7))
+              else -amplitude for bit in range(bits)]
+    return array('h', [levels[int(sample * step) % bits]
+                       for sample in range(length)])
@@ -0,0 +1,195 @@
+"""
+Runs many ROMs headless and reports the result of each one as a line of
+JSON. ROMs are spread across a process pool, and every CPU is seeded
+explicitly, so a job produces the same result no matter which worker runs
+it.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from chip8.chip8 import Chip8CPU, UnknownOpCodeException
+from chip8.config import FONT_FILE, INSTRUCTIONS_PER_FRAME
+from chip8.framebuffer import Framebuffer
+from chip8.loader import prewarm
+from chip8.profiler import Profiler
+from chip8.quirks import DEFAULT_PROFILE, PROFILES
+
+# C O N S T A N T S ###########################################################
+
+# The number of instructions to run when no budget is given
+DEFAULT_CYCLES = 100000
+
+# The font that ships alongside the package, found wherever the batch runs
+DEFAULT_FONT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), FONT_FILE)
+
+
+# F U N C T I O N S ###########################################################
+
+
+def run_rom(rom, cycles=None, frames=None, seed=0,
+            instructions_per_frame=INSTRUCTIONS_PER_FRAME, font=DEFAULT_FONT,
+            profile=False, quirks=DEFAULT_PROFILE):
+    """
+    Runs a single ROM on a headless CPU for the specified budget. If frames
+    is set, that many 60 Hz frames are run; otherwise up to cycles
+    instructions are executed. A ROM or font that cannot be read is
+    reported in the result's error, like a ROM that fails while running.
+
+    :param rom: the path to the ROM file
+    :param cycles: the number of instructions to execute
+    :param frames: the number of frames to run
+    :param seed: the seed for the CPU's random number generator
+    :param instructions_per_frame: the instructions to run per frame
+    :param font: the path to the font file, or None to skip loading it
+    :param profile: whether to profile the run, and include the statistics
+        in the result
+    :param quirks: the name of the quirk profile to run with
+    :return: a dict describing the final state of the machine
+    """
+    screen = Framebuffer()
+    cpu = Chip8CPU(screen, instructions_per_frame=instructions_per_frame,
+                   seed=seed, quirks=quirks)
+    profiler = None
+    if profile:
+        profiler = Profiler(cpu)
+        profiler.enable()
+
+    error = None
+    executed = 0
+    run_frames = 0
+    start = perf_counter()
+    try:
+        if font:
+            cpu.load_rom(font, 0)
+        cpu.load_rom(rom)
+        if frames is not None:
+            while run_frames < frames and cpu.running:
+                executed += cpu.run_frame()
+                run_frames += 1
+        else:
+            executed = cpu.run(cycles or DEFAULT_CYCLES, uncapped=True)
+    except (UnknownOpCodeException, IndexError, ValueError,
+            OSError) as exception:
+        error = str(exception)
+    wall_time = perf_counter() - start
+
+    registers = cpu.registers
+    result = {
+        'rom': rom,
+        'seed': seed,
+        'quirks': quirks,
+        'registers': {
+            'v': list(registers.v),
+            'index': registers.index,
+            'pc': registers.pc,
+            'sp': registers.sp,
+            'delay': registers.delay,
+            'sound': registers.sound,
+        },
+        'mode': cpu.mode,
+        'running': cpu.running,
+        'framebuffer': hashlib.sha1(screen.to_bytes()).hexdigest(),
+        'instructions': executed,
+        'skipped_instructions': cpu.skipped_cycles,
+        'frames': run_frames,
+        'wall_time': wall_time,
+        'instructions_per_second': executed / wall_time if wall_time else 0.0,
+        'error': error,
+    }
+    if profiler is not None:
+        result['profile'] = profiler.to_dict()
+    return result
+
+
+def run_job(job):
+    """
+    Unpacks a job tuple for the process pool and runs it.
+
+    :param job: a (rom, keyword arguments) tuple
+    :return: the result of run_rom
+    """
+    rom, kwargs = job
+    return run_rom(rom, **kwargs)
+
+
+def parse_arguments(argv=None):
+    """
+    Parses the command line arguments passed to the batch runner.
+
+    :param argv: the arguments to parse, defaults to sys.argv
+    :return: the parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog='chip8',
+        description="Runs Chip 8 ROMs headless and prints one line of JSON "
+                    "per ROM.")
+    parser.add_argument(
+        "roms", nargs='+', help="the ROM files to run")
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument(
+        "-c", "--cycles", type=int, default=None,
+        help="the number of instructions to run per ROM "
+             "(default is {})".format(DEFAULT_CYCLES))
+    budget.add_argument(
+        "-f", "--frames", type=int, default=None,
+        help="the number of 60 Hz frames to run per ROM")
+    parser.add_argument(
+        "-i", "--instructions-per-frame", type=int,
+        default=INSTRUCTIONS_PER_FRAME, dest="instructions_per_frame",
+        help="the number of instructions per frame "
+             "(default is {})".format(INSTRUCTIONS_PER_FRAME))
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="the random number seed given to every CPU (default is 0)")
+    parser.add_argument(
+        "--quirks", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+        help="the quirk profile to run every ROM with "
+             "(default is {})".format(DEFAULT_PROFILE))
+    parser.add_argument(
+        "--font", default=DEFAULT_FONT,
+        help="the font file to load at address 0 "
+             "(default is the {} shipped with the package)".format(FONT_FILE))
+    parser.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count(),
+        help="the number of worker processes (default is the CPU count)")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="include per-opcode and per-screen-call timings in the results")
+    args = parser.parse_args(argv)
+    if not os.path.isfile(args.font):
+        parser.error("font file {} does not exist".format(args.font))
+    return args
+
+
+def main(argv=None, output=sys.stdout):
+    """
+    Runs every ROM named on the command line, and writes one line of JSON
+    per ROM to the output, in the order the ROMs were given.
+
+    :param argv: the arguments to parse, defaults to sys.argv
+    :param output: the stream to write results to
+    """
+    args = parse_arguments(argv)
+    kwargs = {
+        'cycles': args.cycles,
+        'frames': args.frames,
+        'seed': args.seed,
+        'instructions_per_frame': args.instructions_per_frame,
+        'font': args.font,
+        'profile': args.profile,
+        'quirks': args.quirks,
+    }
+    jobs = [(rom, kwargs) for rom in args.roms]
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=prewarm,
+                             initargs=([args.font],)) as executor:
+        for result in executor.map(run_job, jobs):
+            output.write(json.dumps(result, sort_keys=True) + '\n')
+            output.flush()
@@ -1,21 +1,91 @@
-import pygame
+from struct import Struct
+from time import perf_counter, sleep
 
-from pygame import key
-from random import randint
+from random import Random
 
+from chip8.audio import DEFAULT_PITCH, PATTERN_BYTES, NullAudio
 from chip8.config import (
-    MAX_MEMORY, STACK_POINTER_START, KEY_MAPPINGS, PROGRAM_COUNTER_START
+    MAX_MEMORY, DELAY_INTERVAL, INSTRUCTIONS_PER_FRAME, PROGRAM_COUNTER_START,
+    XOCHIP_MEMORY
 )
+from chip8.framebuffer import (
+    FIRST_PLANE, PLANE_COUNT, SCREEN_MODE_EXTENDED, SCREEN_HEIGHT,
+    SCREEN_WIDTH
+)
+from chip8.keypad import NO_KEYS
+from chip8.loader import load_image
+from chip8.memory import Memory
+from chip8.quirks import (
+    DEFAULT_PROFILE, JUMP_V0, JUMP_VX, SHIFT_VX, SHIFT_VY, get_quirks
+)
+from chip8.registers import Registers, REGISTER_LAYOUT
 
 # C O N S T A N T S ###########################################################
 
-# The total number of registers in the Chip 8 CPU
-NUM_REGISTERS = 0x10
-
 # The various modes of operation
 MODE_NORMAL = 'normal'
 MODE_EXTENDED = 'extended'
 
+# The top level operations, and the Fxnn operations, that may appear in an
+# idle loop. None of them write to memory or the screen or use the random
+# number generator, so a pass through a loop built from them that comes back
+# to the same register state will repeat until the frame ends.
+IDLE_OPERATIONS = frozenset(
+    [0x3, 0x4, 0x5, 0x6, 0x7, 0x8, 0x9, 0xA, 0xE, 0xF])
+IDLE_MISC_OPERATIONS = frozenset(
+    [0x07, 0x15, 0x18, 0x1E, 0x29, 0x30, 0x65, 0x75, 0x85])
+
+# The most passes through a loop that run_frame() lets go by without
+# looking at the registers, once the loop has been seen to change them. The
+# wait starts at one pass and doubles each time the registers differ again,
+# so that busy loops pay for very few register snapshots.
+IDLE_CHECK_BACKOFF = 64
+
+# The most memory a new Chip8CPU takes, not counting its screen: 4 KB of
+# memory, 2.5 KB of random number generator state, and the registers, slots
+# and empty caches. The decode cache grows by one entry per address executed,
+# and snapshot() allocates a buffer of SNAPSHOT_LAYOUT.size the first time it
+# is called. A CPU with the XO-CHIP extensions also takes the 60 KB of extra
+# memory.
+CPU_INSTANCE_BYTES = 8 * 1024
+
+# The layout used by snapshot(): memory, the packed registers, the mode (1 if
+# extended) and the packed screen, padded to the size of an extended screen.
+SNAPSHOT_LAYOUT = Struct('>{}s{}sB{}s'.format(
+    MAX_MEMORY, REGISTER_LAYOUT.size,
+    SCREEN_HEIGHT[SCREEN_MODE_EXTENDED] *
+    SCREEN_WIDTH[SCREEN_MODE_EXTENDED] // 8))
+
+# The layout used by snapshot() on a CPU with the XO-CHIP extensions: the
+# same fields, with all of memory and room for both planes of the screen,
+# followed by the selected planes, the pitch register, whether an audio
+# pattern is loaded, and the pattern.
+XOCHIP_SNAPSHOT_LAYOUT = Struct('>{}s{}sB{}sBBB{}s'.format(
+    XOCHIP_MEMORY, REGISTER_LAYOUT.size,
+    SCREEN_HEIGHT[SCREEN_MODE_EXTENDED] *
+    SCREEN_WIDTH[SCREEN_MODE_EXTENDED] // 4, PATTERN_BYTES))
+
+
+# F U N C T I O N S ###########################################################
+
+
+def dispatch_table(size, routines):
+    """
+    Builds a dispatch table for the Chip8CPU class.
+
+    :param size: the number of entries
+    :param routines: the routine for each index that has one
+    :return: a tuple holding the routine at each index, or None
+    """
+    table = [None] * size
+    for index, routine in routines.items():
+        table[index] = routine
+    return tuple(table)
+
+
+# C L A S S E S ###############################################################
+
+
 class UnknownOpCodeException(Exception):
     """
     A class to raise unknown op code exceptions.
@@ -24,105 +94,187 @@ class UnknownOpCodeException(Exception):
         Exception.__init__(self, "Unknown op-code: {:X}".format(op_code))
 
 class Chip8CPU(object):
+    """
+    A Chip 8 and Super Chip 8 CPU. Thousands of these may be hosted in one
+    process, so the dispatch tables are shared at class level and the
+    attributes live in slots. The only private buffers are the 4 KB memory
+    (64 KB with the XO-CHIP extensions), the registers and the random number
+    generator's state, and the decode cache as it fills. A new CPU takes
+    under CPU_INSTANCE_BYTES, not counting its screen.
+
+    The __dict__ slot is only filled in when a tool shadows a method for
+    one CPU, as the trace recorder does with execute_instruction() and the
+    pipeline does with poll_input(), so it costs nothing otherwise.
+    """
 
-    def __init__(self, screen):
+    __slots__ = (
+        'registers', 'v', 'operation_lookup', 'logical_operation_lookup',
+        'keyboard_routine_lookup', 'misc_routine_lookup', 'decode_cache',
+        'keys', 'keypad', 'audio', 'instructions_per_frame', 'halted',
+        'backward_jump', 'idle_loops', 'skipped_cycles', 'skip_idle',
+        'random', 'operand',
+        'mode', 'screen', 'memory', 'snapshot_buffer', 'running', 'quirks',
+        'planes', 'pitch', 'audio_pattern', '__dict__',
+    )
+
+    def __init__(self, screen, instructions_per_frame=INSTRUCTIONS_PER_FRAME,
+                 seed=None, audio=None, keypad=None, quirks=DEFAULT_PROFILE,
+                 skip_idle=True):
         """
         Initialize the Chip8 CPU. The only required parameter is a screen
-        object that supports the draw_pixel function. For testing purposes,
-        this can be set to None.
+        object that supports the draw_pixel function. A headless
+        chip8.framebuffer.Framebuffer can be used to run without any pygame
+        display. For testing purposes, this can be set to None.
         :param screen: the screen object to draw pixels on
+        :param instructions_per_frame: the instructions to run per 60 Hz frame
+        :param seed: the seed for this CPU's random number generator
+        :param audio: the chip8.audio device the sound timer drives, defaults
+            to a NullAudio
+        :param keypad: the chip8.keypad source the keys are polled from, such
+            as a PygameKeypad, or None to leave the keys to the caller
+        :param quirks: the name of the chip8.quirks profile to run with, or a
+            Quirks
+        :param skip_idle: whether run_frame() fast-forwards idle loops
         """
-        # There are two timer registers, one for sound and one that is general
+        # The register file holds V0 - VF, the RPL flags, the index register,
+        # the program counter, the stack pointer and the two timers. There
+        # are two timer registers, one for sound and one that is general
         # purpose known as the delay timer. The timers are loaded with a value
-        # and then decremented 60 times per second.
-        self.timers = {
-            'delay': 0,
-            'sound': 0,
-        }
-
-        self.registers = {
-            'v': [],
-            'index': 0,
-            'sp': 0,
-            'pc': 0,
-            'rpl': []
-        }
-
-        self.operation_lookup = {
-            0x0: self.clear_return,  # 0nnn - SYS  nnn
-            0x1: self.jump_to_address,  # 1nnn - JUMP nnn
-            0x2: self.jump_to_subroutine,  # 2nnn - CALL nnn
-            0x3: self.skip_if_reg_equal_val,  # 3snn - SKE  Vs, nn
-            0x4: self.skip_if_reg_not_equal_val,  # 4snn - SKNE Vs, nn
-            0x5: self.skip_if_reg_equal_reg,  # 5st0 - SKE  Vs, Vt
-            0x6: self.move_value_to_reg,  # 6snn - LOAD Vs, nn
-            0x7: self.add_value_to_reg,  # 7snn - ADD  Vs, nn
-            0x8: self.execute_logical_instruction,  # see subfunctions below
-            0x9: self.skip_if_reg_not_equal_reg,  # 9st0 - SKNE Vs, Vt
-            0xA: self.load_index_reg_with_value,  # Annn - LOAD I, nnn
-            0xB: self.jump_to_index_plus_value,  # Bnnn - JUMP [I] + nnn
-            0xC: self.generate_random_number,  # Ctnn - RAND Vt, nn
-            0xD: self.draw_sprite,  # Dstn - DRAW Vs, Vy, n
-            0xE: self.keyboard_routines,  # see subfunctions below
-            0xF: self.misc_routines,  # see subfunctions below
-        }
-
-        self.logical_operation_lookup = {
-            0x0: self.move_reg_into_reg,  # 8st0 - LOAD Vs, Vt
-            0x1: self.logical_or,  # 8st1 - OR   Vs, Vt
-            0x2: self.logical_and,  # 8st2 - AND  Vs, Vt
-            0x3: self.exclusive_or,  # 8st3 - XOR  Vs, Vt
-            0x4: self.add_reg_to_reg,  # 8st4 - ADD  Vs, Vt
-            0x5: self.subtract_reg_from_reg,  # 8st5 - SUB  Vs, Vt
-            0x6: self.right_shift_reg,  # 8st6 - SHR  Vs
-            0x7: self.subtract_reg_from_reg1,  # 8st7 - SUBN Vs, Vt
-            0xE: self.left_shift_reg,  # 8stE - SHL  Vs
-        }
-
-        self.misc_routine_lookup = {
-            0x07: self.move_delay_timer_into_reg,  # Ft07 - LOAD Vt, DELAY
-            0x0A: self.wait_for_keypress,  # Ft0A - KEYD Vt
-            0x15: self.move_reg_into_delay_timer,  # Fs15 - LOAD DELAY, Vs
-            0x18: self.move_reg_into_sound_timer,  # Fs18 - LOAD SOUND, Vs
-            0x1E: self.add_reg_into_index,  # Fs1E - ADD  I, Vs
-            0x29: self.load_index_with_reg_sprite,  # Fs29 - LOAD I, Vs
-            0x30: self.load_index_with_extended_reg_sprite,  # Fs30 - LOAD I, Vs
-            0x33: self.store_bcd_in_memory,  # Fs33 - BCD
-            0x55: self.store_regs_in_memory,  # Fs55 - STOR [I], Vs
-            0x65: self.read_regs_from_memory,  # Fs65 - LOAD Vs, [I]
-            0x75: self.store_regs_in_rpl,  # Fs75 - SRPL Vs
-            0x85: self.read_regs_from_rpl,  # Fs85 - LRPL Vs
-        }
+        # and then decremented 60 times per second. The V registers are also
+        # kept directly on the CPU, so that handlers reach them with a single
+        # attribute lookup.
+        self.registers = Registers()
+        self.v = self.registers.v
+
+        # The quirk profile is compiled into the dispatch tables, which are
+        # shared by every CPU that runs the same profile.
+        self.quirks = get_quirks(quirks)
+        (self.operation_lookup, self.logical_operation_lookup,
+         self.keyboard_routine_lookup, self.misc_routine_lookup) = \
+            self.get_quirk_tables(self.quirks)
+
+        # Decoded instructions, keyed by address. Each entry holds the handler
+        # to call and the operand it was decoded from. Entries must be
+        # invalidated whenever the memory they were decoded from is written.
+        self.decode_cache = {}
+
+        # The state of the 16 keys as a mask, with bit n set while key n is
+        # held down. Key events are gathered from the keypad once per frame
+        # by run_frame(), not on every instruction.
+        self.keys = NO_KEYS
+        self.keypad = keypad
+        self.audio = audio if audio is not None else NullAudio()
+
+        self.instructions_per_frame = instructions_per_frame
+        self.halted = False
+
+        # The (jump address, target) of the last backward 1nnn jump, which
+        # also sets halted so that run_frame() can check for an idle loop.
+        # Checked loops are cached by (jump address, target), and the number
+        # of instructions skipped by fast-forwarding idle loops is counted.
+        # Tools that must see every instruction, such as the trace recorder
+        # and the profiler, turn skip_idle off while they are attached.
+        self.backward_jump = None
+        self.idle_loops = {}
+        self.skipped_cycles = 0
+        self.skip_idle = skip_idle
+
+        # Each CPU has its own random number generator, so that a seeded run
+        # gives the same results regardless of what else runs in the process.
+        self.random = Random(seed)
 
         self.operand = 0
         self.mode = MODE_NORMAL
         self.screen = screen
-        self.memory = bytearray(MAX_MEMORY)
+        # Other execution engines and debuggers can watch memory ranges
+        # through self.memory.watch(), in the same way as the decode cache.
+        self.memory = Memory(
+            XOCHIP_MEMORY if self.quirks.xochip else MAX_MEMORY)
+        self.memory.watch(self.invalidate)
+
+        # The XO-CHIP state: the bitplanes that drawing, clearing and
+        # scrolling work on, the pitch register, and the audio pattern, or
+        # None until a program loads one.
+        self.planes = FIRST_PLANE
+        self.pitch = DEFAULT_PITCH
+        self.audio_pattern = None
+
+        # The buffer that snapshot() packs the machine into, allocated by the
+        # first snapshot
+        self.snapshot_buffer = None
+
         self.reset()
         self.running = True
 
     def execute_instruction(self, operand=None):
         """
+        Execute a single instruction. If an operand is passed, it is decoded
+        and executed directly. Otherwise the instruction at the program
+        counter is executed, using the decode cache so that memory is only
+        read and decoded the first time an address is executed.
+
         :param operand: the operand to execute
         :return: returns the operand executed
         """
         if operand:
             self.operand = operand
-        else:
-            self.operand = int(self.memory[self.registers['pc']])
-            self.operand = self.operand << 8
-            self.operand += int(self.memory[self.registers['pc'] + 1])
-            self.registers['pc'] += 2
-        operation = (self.operand & 0xF000) >> 12
-        self.operation_lookup[operation]()
-        return self.operand
+            self.decode(operand)(self)
+            return operand
 
-    def execute_logical_instruction(self):
-        operation = self.operand & 0x000F
+        pc = self.registers.pc
+        self.registers.pc = pc + 2
         try:
-            self.logical_operation_lookup[operation]()
+            handler, self.operand = self.decode_cache[pc]
         except KeyError:
+            self.operand = (self.memory[pc] << 8) | self.memory[pc + 1]
+            handler = self.decode(self.operand)
+            self.decode_cache[pc] = (handler, self.operand)
+        handler(self)
+        return self.operand
+
+    def decode(self, operand):
+        """
+        Looks up the routine that executes the specified operand, resolving
+        the second level lookup tables for the 0x8, 0xE and 0xF groups so
+        that the returned routine can be called directly, with the CPU as
+        its only argument.
+
+        :param operand: the operand to decode
+        :return: the unbound routine that executes the operand
+        """
+        operation = (operand & 0xF000) >> 12
+        if operation == 0x8:
+            routine = self.logical_operation_lookup[operand & 0x000F]
+        elif operation == 0xE:
+            routine = self.keyboard_routine_lookup[operand & 0x00FF]
+        elif operation == 0xF:
+            routine = self.misc_routine_lookup[operand & 0x00FF]
+        else:
+            return self.operation_lookup[operation]
+        if routine is None:
+            raise UnknownOpCodeException(operand)
+        return routine
+
+    def invalidate(self, address, length=1):
+        """
+        Removes any decoded instructions that overlap the specified memory
+        range. This is registered as a watcher on memory, so it is called
+        whenever memory is written through the Memory store helpers or
+        notify(), and self-modifying programs behave correctly.
+
+        :param address: the first address written
+        :param length: the number of bytes written
+        """
+        for cached_address in range(address - 1, address + length):
+            self.decode_cache.pop(cached_address, None)
+        if self.idle_loops:
+            self.idle_loops.clear()
+
+    def execute_logical_instruction(self):
+        routine = self.logical_operation_lookup[self.operand & 0x000F]
+        if routine is None:
             raise UnknownOpCodeException(self.operand)
+        routine(self)
 
     def clear_return(self):
         """
@@ -158,6 +310,55 @@ class Chip8CPU(object):
 
         if operation == 0x00FD:
             self.running = False
+            self.halted = True
+
+        if operation == 0x00FE:
+            self.disable_extended_mode()
+
+        if operation == 0x00FF:
+            self.enable_extended_mode()
+
+    def clear_return_planes(self):
+        """
+        Opcodes starting with a 0 on a CPU with the XO-CHIP extensions, which
+        clear and scroll only the selected planes:
+
+            0nnn - Jump to machine code function (ignored)
+            00Cn - Scroll n pixels down
+            00Dn - Scroll n pixels up
+            00E0 - Clear the display
+            00EE - Return from subroutine
+            00FB - Scroll 4 pixels right
+            00FC - Scroll 4 pixels left
+            00FD - Exit
+            00FE - Disable extended mode
+            00FF - Enable extended mode
+
+        Bound in place of clear_return() by XO-CHIP quirk profiles.
+        """
+        operation = self.operand & 0x00FF
+        sub_operation = operation & 0x00F0
+        if sub_operation == 0x00C0:
+            self.screen.scroll_down(operation & 0x000F, self.planes)
+
+        if sub_operation == 0x00D0:
+            self.screen.scroll_up(operation & 0x000F, self.planes)
+
+        if operation == 0x00E0:
+            self.screen.clear_screen(self.planes)
+
+        if operation == 0x00EE:
+            self.return_from_subroutine()
+
+        if operation == 0x00FB:
+            self.screen.scroll_right(self.planes)
+
+        if operation == 0x00FC:
+            self.screen.scroll_left(self.planes)
+
+        if operation == 0x00FD:
+            self.running = False
+            self.halted = True
 
         if operation == 0x00FE:
             self.disable_extended_mode()
@@ -172,10 +373,10 @@ class Chip8CPU(object):
         Return from subroutine. Pop the current value in the stack pointer
         off of the stack, and set the program counter to the value popped.
         """
-        self.registers['sp'] -= 1
-        self.registers['pc'] = self.memory[self.registers['sp']] << 8
-        self.registers['sp'] -= 1
-        self.registers['pc'] += self.memory[self.registers['sp']]
+        self.registers.sp -= 1
+        self.registers.pc = self.memory[self.registers.sp] << 8
+        self.registers.sp -= 1
+        self.registers.pc += self.memory[self.registers.sp]
 
     def jump_to_address(self):
         """
@@ -186,8 +387,15 @@ class Chip8CPU(object):
 
            Bits:  15-12    11-8      7-4      3-0
                   unused  address  address  address
+
+        A jump backwards ends the tight loop in run_frame(), so that it can
+        check whether the program is spinning in an idle loop.
         """
-        self.registers['pc'] = self.operand & 0x0FFF
+        target = self.operand & 0x0FFF
+        if target < self.registers.pc:
+            self.backward_jump = (self.registers.pc - 2, target)
+            self.halted = True
+        self.registers.pc = target
 
     def jump_to_subroutine(self):
         """
@@ -199,11 +407,12 @@ class Chip8CPU(object):
            Bits:  15-12    11-8      7-4      3-0
                   unused  address  address  address
         """
-        self.memory[self.registers['sp']] = self.registers['pc'] & 0x00FF
-        self.registers['sp'] += 1
-        self.memory[self.registers['sp']] = (self.registers['pc'] & 0xFF00) >> 8
-        self.registers['sp'] += 1
-        self.registers['pc'] = self.operand & 0x0FFF
+        self.memory.notify(self.registers.sp, 2)
+        self.memory[self.registers.sp] = self.registers.pc & 0x00FF
+        self.registers.sp += 1
+        self.memory[self.registers.sp] = (self.registers.pc & 0xFF00) >> 8
+        self.registers.sp += 1
+        self.registers.pc = self.operand & 0x0FFF
 
     def skip_if_reg_equal_val(self):
         """
@@ -219,8 +428,39 @@ class Chip8CPU(object):
         advancing it by 2 bytes.
         """
         source = (self.operand & 0x0F00) >> 8
-        if self.registers['v'][source] == (self.operand & 0x00FF):
-            self.registers['pc'] += 2
+        if self.v[source] == (self.operand & 0x00FF):
+            self.registers.pc += 2
+
+    def skip_next_instruction(self):
+        """
+        Advances the program counter past the next instruction, which is 4
+        bytes long if it is an XO-CHIP F000 nnnn, and 2 bytes otherwise.
+        Addresses wrap around the end of the 64 KB XO-CHIP memory.
+        """
+        registers = self.registers
+        pc = registers.pc
+        if self.memory[pc & 0xFFFF] == 0xF0 and \
+                self.memory[(pc + 1) & 0xFFFF] == 0x00:
+            registers.pc = (pc + 4) & 0xFFFF
+        else:
+            registers.pc = (pc + 2) & 0xFFFF
+
+    def skip_if_reg_equal_val_long(self):
+        """
+        3snn - SKE Vs, nn
+
+        Skip if register contents equal to constant value:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source  constant  constant
+
+        The next instruction is skipped with skip_next_instruction(), which
+        knows that F000 nnnn is 4 bytes long. Bound in place of
+        skip_if_reg_equal_val() by XO-CHIP quirk profiles.
+        """
+        source = (self.operand & 0x0F00) >> 8
+        if self.v[source] == (self.operand & 0x00FF):
+            self.skip_next_instruction()
 
     def skip_if_reg_not_equal_val(self):
         """
@@ -236,8 +476,25 @@ class Chip8CPU(object):
         advancing it by 2 bytes.
         """
         source = (self.operand & 0x0F00) >> 8
-        if self.registers['v'][source] != (self.operand & 0x00FF):
-            self.registers['pc'] += 2
+        if self.v[source] != (self.operand & 0x00FF):
+            self.registers.pc += 2
+
+    def skip_if_reg_not_equal_val_long(self):
+        """
+        4snn - SKNE Vs, nn
+
+        Skip if register contents not equal to constant value:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source  constant  constant
+
+        The next instruction is skipped with skip_next_instruction(), which
+        knows that F000 nnnn is 4 bytes long. Bound in place of
+        skip_if_reg_not_equal_val() by XO-CHIP quirk profiles.
+        """
+        source = (self.operand & 0x0F00) >> 8
+        if self.v[source] != (self.operand & 0x00FF):
+            self.skip_next_instruction()
 
     def skip_if_reg_equal_reg(self):
         """
@@ -254,8 +511,82 @@ class Chip8CPU(object):
         """
         source = (self.operand & 0x0F00) >> 8
         target = (self.operand & 0x00F0) >> 4
-        if self.registers['v'][source] == self.registers['v'][target]:
-            self.registers['pc'] += 2
+        if self.v[source] == self.v[target]:
+            self.registers.pc += 2
+
+    def register_routines(self):
+        """
+        Opcodes starting with a 5 on a CPU with the XO-CHIP extensions are
+        dispatched to the routines in the REGISTER_ROUTINES table. Bound in
+        place of skip_if_reg_equal_reg() by XO-CHIP quirk profiles.
+        """
+        routine = self.REGISTER_ROUTINES[self.operand & 0x000F]
+        if routine is None:
+            raise UnknownOpCodeException(self.operand)
+        routine(self)
+
+    def skip_if_reg_equal_reg_long(self):
+        """
+        5st0 - SKE  Vs, Vt
+
+        Skip if source register is equal to target register:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source    target      0
+
+        The next instruction is skipped with skip_next_instruction(), which
+        knows that F000 nnnn is 4 bytes long. Bound in place of
+        skip_if_reg_equal_reg() by XO-CHIP quirk profiles, through
+        register_routines().
+        """
+        source = (self.operand & 0x0F00) >> 8
+        target = (self.operand & 0x00F0) >> 4
+        if self.v[source] == self.v[target]:
+            self.skip_next_instruction()
+
+    def store_reg_range_in_memory(self):
+        """
+        5st2 - STOR [I], Vs - Vt
+
+        Store the V registers from the source register to the target
+        register, inclusive, in memory starting at the location pointed to
+        by the index register, which is left as it is. If the source is
+        after the target, the registers are stored in descending order. The
+        register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source    target      2
+        """
+        source = (self.operand & 0x0F00) >> 8
+        target = (self.operand & 0x00F0) >> 4
+        if source <= target:
+            values = self.v[source:target + 1]
+        else:
+            values = self.v[target:source + 1][::-1]
+        self.memory.store_many(self.registers.index, values)
+
+    def read_reg_range_from_memory(self):
+        """
+        5st3 - LOAD Vs - Vt, [I]
+
+        Read the V registers from the source register to the target register,
+        inclusive, from memory starting at the location pointed to by the
+        index register, which is left as it is. If the source is after the
+        target, the registers are read in descending order. The register
+        calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source    target      3
+        """
+        source = (self.operand & 0x0F00) >> 8
+        target = (self.operand & 0x00F0) >> 4
+        index = self.registers.index
+        if source <= target:
+            self.v[source:target + 1] = \
+                self.memory.fetch_many(index, target - source + 1)
+        else:
+            self.v[target:source + 1] = \
+                bytes(self.memory.fetch_many(index, source - target + 1))[::-1]
 
     def move_value_to_reg(self):
         """
@@ -268,7 +599,7 @@ class Chip8CPU(object):
                   unused   target    value     value
         """
         target = (self.operand & 0x0F00) >> 8
-        self.registers['v'][target] = self.operand & 0x00FF
+        self.v[target] = self.operand & 0x00FF
 
     def add_value_to_reg(self):
         """
@@ -281,8 +612,8 @@ class Chip8CPU(object):
                   unused   target    value     value
         """
         target = (self.operand & 0x0F00) >> 8
-        temp = self.registers['v'][target] + (self.operand & 0x00FF)
-        self.registers['v'][target] = temp if temp < 256 else temp - 256
+        temp = self.v[target] + (self.operand & 0x00FF)
+        self.v[target] = temp if temp < 256 else temp - 256
 
     def move_reg_into_reg(self):
         """
@@ -297,7 +628,7 @@ class Chip8CPU(object):
         """
         target = (self.operand & 0x0F00) >> 8
         source = (self.operand & 0x00F0) >> 4
-        self.registers['v'][target] = self.registers['v'][source]
+        self.v[target] = self.v[source]
 
     def logical_or(self):
         """
@@ -312,7 +643,7 @@ class Chip8CPU(object):
         """
         target = (self.operand & 0x0F00) >> 8
         source = (self.operand & 0x00F0) >> 4
-        self.registers['v'][target] |= self.registers['v'][source]
+        self.v[target] |= self.v[source]
 
     def logical_and(self):
         """
@@ -327,7 +658,7 @@ class Chip8CPU(object):
         """
         target = (self.operand & 0x0F00) >> 8
         source = (self.operand & 0x00F0) >> 4
-        self.registers['v'][target] &= self.registers['v'][source]
+        self.v[target] &= self.v[source]
 
     def exclusive_or(self):
         """
@@ -342,7 +673,56 @@ class Chip8CPU(object):
         """
         target = (self.operand & 0x0F00) >> 8
         source = (self.operand & 0x00F0) >> 4
-        self.registers['v'][target] ^= self.registers['v'][source]
+        self.v[target] ^= self.v[source]
+
+    def logical_or_reset_flag(self):
+        """
+        8ts1 - OR   Vs, Vt
+
+        As logical_or(), but also clears register VF, as the COSMAC VIP did.
+        Bound in place of logical_or() by quirk profiles with reset_flag set.
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   target    source      1
+        """
+        target = (self.operand & 0x0F00) >> 8
+        source = (self.operand & 0x00F0) >> 4
+        v = self.v
+        v[target] |= v[source]
+        v[0xF] = 0
+
+    def logical_and_reset_flag(self):
+        """
+        8ts2 - AND  Vs, Vt
+
+        As logical_and(), but also clears register VF, as the COSMAC VIP did.
+        Bound in place of logical_and() by quirk profiles with reset_flag set.
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   target    source      2
+        """
+        target = (self.operand & 0x0F00) >> 8
+        source = (self.operand & 0x00F0) >> 4
+        v = self.v
+        v[target] &= v[source]
+        v[0xF] = 0
+
+    def exclusive_or_reset_flag(self):
+        """
+        8ts3 - XOR  Vs, Vt
+
+        As exclusive_or(), but also clears register VF, as the COSMAC VIP
+        did. Bound in place of exclusive_or() by quirk profiles with
+        reset_flag set.
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   target    source      3
+        """
+        target = (self.operand & 0x0F00) >> 8
+        source = (self.operand & 0x00F0) >> 4
+        v = self.v
+        v[target] ^= v[source]
+        v[0xF] = 0
 
     def add_reg_to_reg(self):
         """
@@ -359,13 +739,14 @@ class Chip8CPU(object):
         """
         target = (self.operand & 0x0F00) >> 8
         source = (self.operand & 0x00F0) >> 4
-        temp = self.registers['v'][target] + self.registers['v'][source]
+        v = self.v
+        temp = v[target] + v[source]
         if temp > 255:
-            self.registers['v'][target] = temp - 256
-            self.registers['v'][0xF] = 1
+            v[target] = temp - 256
+            v[0xF] = 1
         else:
-            self.registers['v'][target] = temp
-            self.registers['v'][0xF] = 0
+            v[target] = temp
+            v[0xF] = 0
 
     def subtract_reg_from_reg(self):
         """
@@ -382,15 +763,16 @@ class Chip8CPU(object):
         """
         target = (self.operand & 0x0F00) >> 8
         source = (self.operand & 0x00F0) >> 4
-        source_reg = self.registers['v'][source]
-        target_reg = self.registers['v'][target]
+        v = self.v
+        source_reg = v[source]
+        target_reg = v[target]
         if target_reg > source_reg:
             target_reg -= source_reg
-            self.registers['v'][0xF] = 1
+            v[0xF] = 1
         else:
             target_reg = 256 + target_reg - source_reg
-            self.registers['v'][0xF] = 0
-        self.registers['v'][target] = target_reg
+            v[0xF] = 0
+        v[target] = target_reg & 0xFF
 
     def right_shift_reg(self):
         """
@@ -406,9 +788,47 @@ class Chip8CPU(object):
         """
         source = (self.operand & 0x0F00) >> 8
         target = (self.operand & 0x00F0) >> 4
-        bit_zero = self.registers['v'][source] & 0x1
-        self.registers['v'][target] = self.registers['v'][source] >> 1
-        self.registers['v'][0xF] = bit_zero
+        v = self.v
+        bit_zero = v[source] & 0x1
+        v[target] = v[source] >> 1
+        v[0xF] = bit_zero
+
+    def right_shift_source_into_target(self):
+        """
+        8ts6 - SHR  Vt, Vs
+
+        Shift the bits in the source register 1 bit to the right and store
+        the result in the target register, as the COSMAC VIP did. Bit 0 of
+        the source register is shifted into register VF. Bound in place of
+        right_shift_reg() by the SHIFT_VY quirk:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   target    source      6
+        """
+        target = (self.operand & 0x0F00) >> 8
+        source = (self.operand & 0x00F0) >> 4
+        v = self.v
+        bit_zero = v[source] & 0x1
+        v[target] = v[source] >> 1
+        v[0xF] = bit_zero
+
+    def right_shift_reg_in_place(self):
+        """
+        8t-6 - SHR  Vt
+
+        Shift the bits in the target register 1 bit to the right, ignoring
+        the second register, as the Super Chip 8 did. Bit 0 is shifted into
+        register VF. Bound in place of right_shift_reg() by the SHIFT_VX
+        quirk:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   target    unused      6
+        """
+        target = (self.operand & 0x0F00) >> 8
+        v = self.v
+        bit_zero = v[target] & 0x1
+        v[target] >>= 1
+        v[0xF] = bit_zero
 
     def subtract_reg_from_reg1(self):
         """
@@ -425,15 +845,16 @@ class Chip8CPU(object):
         """
         target = (self.operand & 0x0F00) >> 8
         source = (self.operand & 0x00F0) >> 4
-        source_reg = self.registers['v'][source]
-        target_reg = self.registers['v'][target]
+        v = self.v
+        source_reg = v[source]
+        target_reg = v[target]
         if source_reg > target_reg:
             target_reg = source_reg - target_reg
-            self.registers['v'][0xF] = 1
+            v[0xF] = 1
         else:
             target_reg = 256 + source_reg - target_reg
-            self.registers['v'][0xF] = 0
-        self.registers['v'][target] = target_reg
+            v[0xF] = 0
+        v[target] = target_reg & 0xFF
 
     def left_shift_reg(self):
         """
@@ -449,9 +870,47 @@ class Chip8CPU(object):
         """
         source = (self.operand & 0x0F00) >> 8
         target = (self.operand & 0x00F0) >> 4
-        bit_seven = (self.registers['v'][source] & 0x80) >> 8
-        self.registers['v'][target] = self.registers['v'][source] << 1
-        self.registers['v'][0xF] = bit_seven
+        v = self.v
+        bit_seven = (v[source] & 0x80) >> 7
+        v[target] = (v[source] << 1) & 0xFF
+        v[0xF] = bit_seven
+
+    def left_shift_source_into_target(self):
+        """
+        8tsE - SHL  Vt, Vs
+
+        Shift the bits in the source register 1 bit to the left and store
+        the result in the target register, as the COSMAC VIP did. Bit 7 of
+        the source register is shifted into register VF. Bound in place of
+        left_shift_reg() by the SHIFT_VY quirk:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   target    source      E
+        """
+        target = (self.operand & 0x0F00) >> 8
+        source = (self.operand & 0x00F0) >> 4
+        v = self.v
+        bit_seven = (v[source] & 0x80) >> 7
+        v[target] = (v[source] << 1) & 0xFF
+        v[0xF] = bit_seven
+
+    def left_shift_reg_in_place(self):
+        """
+        8t-E - SHL  Vt
+
+        Shift the bits in the target register 1 bit to the left, ignoring
+        the second register, as the Super Chip 8 did. Bit 7 is shifted into
+        register VF. Bound in place of left_shift_reg() by the SHIFT_VX
+        quirk:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   target    unused      E
+        """
+        target = (self.operand & 0x0F00) >> 8
+        v = self.v
+        bit_seven = (v[target] & 0x80) >> 7
+        v[target] = (v[target] << 1) & 0xFF
+        v[0xF] = bit_seven
 
     def skip_if_reg_not_equal_reg(self):
         """
@@ -468,8 +927,26 @@ class Chip8CPU(object):
         """
         source = (self.operand & 0x0F00) >> 8
         target = (self.operand & 0x00F0) >> 4
-        if self.registers['v'][source] != self.registers['v'][target]:
-            self.registers['pc'] += 2
+        if self.v[source] != self.v[target]:
+            self.registers.pc += 2
+
+    def skip_if_reg_not_equal_reg_long(self):
+        """
+        9st0 - SKNE Vs, Vt
+
+        Skip if source register is not equal to target register:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source    target    unused
+
+        The next instruction is skipped with skip_next_instruction(), which
+        knows that F000 nnnn is 4 bytes long. Bound in place of
+        skip_if_reg_not_equal_reg() by XO-CHIP quirk profiles.
+        """
+        source = (self.operand & 0x0F00) >> 8
+        target = (self.operand & 0x00F0) >> 4
+        if self.v[source] != self.v[target]:
+            self.skip_next_instruction()
 
     def load_index_reg_with_value(self):
         """
@@ -481,7 +958,7 @@ class Chip8CPU(object):
            Bits:  15-12     11-8      7-4       3-0
                   unused   constant  constant  constant
         """
-        self.registers['index'] = self.operand & 0x0FFF
+        self.registers.index = self.operand & 0x0FFF
 
     def jump_to_index_plus_value(self):
         """
@@ -494,7 +971,35 @@ class Chip8CPU(object):
            Bits:  15-12     11-8      7-4       3-0
                   unused   address  address  address
         """
-        self.registers['pc'] = self.registers['index'] + (self.operand & 0x0FFF)
+        self.registers.pc = self.registers.index + (self.operand & 0x0FFF)
+
+    def jump_to_v0_plus_value(self):
+        """
+        Bnnn - JUMP V0 + nnn
+
+        Load the program counter with the specified address plus the value of
+        register V0, as the COSMAC VIP did. Bound in place of
+        jump_to_index_plus_value() by the JUMP_V0 quirk:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   address  address  address
+        """
+        self.registers.pc = self.v[0] + (self.operand & 0x0FFF)
+
+    def jump_to_reg_plus_value(self):
+        """
+        Bsnn - JUMP Vs + snn
+
+        Load the program counter with the specified address plus the value of
+        the register named by the top nibble of the address, as the Super
+        Chip 8 did. Bound in place of jump_to_index_plus_value() by the
+        JUMP_VX quirk:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source    address  address
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.registers.pc = self.v[source] + (self.operand & 0x0FFF)
 
     def generate_random_number(self):
         """
@@ -510,7 +1015,7 @@ class Chip8CPU(object):
         """
         value = self.operand & 0x00FF
         target = (self.operand & 0x0F00) >> 8
-        self.registers['v'][target] = value & randint(0, 255)
+        self.v[target] = value & self.random.randint(0, 255)
 
     def draw_sprite(self):
         """
@@ -548,13 +1053,897 @@ class Chip8CPU(object):
         """
         x_source = (self.operand & 0x0F00) >> 8
         y_source = (self.operand & 0x00F0) >> 4
-        x_pos = self.registers['v'][x_source]
-        y_pos = self.registers['v'][y_source]
+        x_pos = self.v[x_source]
+        y_pos = self.v[y_source]
         num_bytes = self.operand & 0x000F
-        self.registers['v'][0xF] = 0
+        self.v[0xF] = 0
 
         if self.mode == MODE_EXTENDED and num_bytes == 0:
             self.draw_extended(x_pos, y_pos, 16)
         else:
             self.draw_normal(x_pos, y_pos, num_bytes)
 
+    def draw_sprite_clipped(self):
+        """
+        Dxyn - DRAW x, y, num_bytes
+
+        As draw_sprite(), but pixels that fall off the edge of the screen are
+        clipped rather than wrapped. The sprite's position still wraps. Bound
+        in place of draw_sprite() by quirk profiles with clip set.
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused    x_source  y_source  num_bytes
+        """
+        x_source = (self.operand & 0x0F00) >> 8
+        y_source = (self.operand & 0x00F0) >> 4
+        x_pos = self.v[x_source]
+        y_pos = self.v[y_source]
+        num_bytes = self.operand & 0x000F
+        self.v[0xF] = 0
+
+        if self.mode == MODE_EXTENDED and num_bytes == 0:
+            self.draw_extended(x_pos, y_pos, 16, False)
+        else:
+            self.draw_normal(x_pos, y_pos, num_bytes, False)
+
+    def draw_sprite_planes(self):
+        """
+        Dxyn - DRAW x, y, num_bytes
+
+        As draw_sprite(), but on the selected planes of a CPU with the
+        XO-CHIP extensions. Bound in place of draw_sprite() by XO-CHIP quirk
+        profiles.
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused    x_source  y_source  num_bytes
+        """
+        self.draw_planes(True)
+
+    def draw_sprite_planes_clipped(self):
+        """
+        Dxyn - DRAW x, y, num_bytes
+
+        As draw_sprite_planes(), but pixels that fall off the edge of the
+        screen are clipped rather than wrapped. Bound in place of
+        draw_sprite() by XO-CHIP quirk profiles with clip set.
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused    x_source  y_source  num_bytes
+        """
+        self.draw_planes(False)
+
+    def draw_planes(self, wrap):
+        """
+        Draws a sprite on the selected planes. A height of 0 draws a 16x16
+        sprite in either mode. The sprite for each selected plane follows the
+        one for the plane before it in memory, and both planes are drawn
+        together. Register VF is set to 1 if any pixel in any plane was
+        turned off.
+
+        :param wrap: whether to wrap or clip at the screen edges
+        """
+        x_pos = self.v[(self.operand & 0x0F00) >> 8]
+        y_pos = self.v[(self.operand & 0x00F0) >> 4]
+        num_bytes = self.operand & 0x000F
+        planes = self.planes
+        index = self.registers.index
+        if num_bytes:
+            sprite_rows = self.memory.fetch_many(
+                index, num_bytes * PLANE_COUNT[planes])
+            self.v[0xF] = self.screen.draw_sprite(
+                x_pos, y_pos, sprite_rows, 8, wrap, planes)
+        else:
+            sprite_bytes = self.memory.fetch_many(
+                index, 32 * PLANE_COUNT[planes])
+            sprite_rows = [
+                (sprite_bytes[offset] << 8) | sprite_bytes[offset + 1]
+                for offset in range(0, len(sprite_bytes), 2)]
+            self.v[0xF] = self.screen.draw_sprite(
+                x_pos, y_pos, sprite_rows, 16, wrap, planes)
+
+    def draw_normal(self, x_pos, y_pos, num_bytes, wrap=True):
+        """
+        Draws a sprite on the screen while in NORMAL mode. Each sprite row is
+        a single byte, and pixels that fall off the edge of the screen wrap
+        around to the other side, unless wrap is False. Register VF is set to
+        1 if any pixel was turned off.
+
+        :param x_pos: the X position of the sprite
+        :param y_pos: the Y position of the sprite
+        :param num_bytes: the number of bytes to draw
+        :param wrap: whether to wrap or clip at the screen edges
+        """
+        index = self.registers.index
+        sprite_rows = self.memory.fetch_many(index, num_bytes)
+        self.v[0xF] = self.screen.draw_sprite(
+            x_pos, y_pos, sprite_rows, 8, wrap)
+
+    def draw_extended(self, x_pos, y_pos, num_bytes, wrap=True):
+        """
+        Draws a sprite on the screen while in EXTENDED mode. Sprites in this
+        mode are assumed to be 16x16 pixels, meaning that each row is made of
+        two consecutive bytes. Pixels that fall off the edge of the screen
+        wrap around to the other side, unless wrap is False. Register VF is
+        set to 1 if any pixel was turned off.
+
+        :param x_pos: the X position of the sprite
+        :param y_pos: the Y position of the sprite
+        :param num_bytes: the number of rows to draw
+        :param wrap: whether to wrap or clip at the screen edges
+        """
+        index = self.registers.index
+        sprite_bytes = self.memory.fetch_many(index, num_bytes * 2)
+        sprite_rows = [(sprite_bytes[offset] << 8) | sprite_bytes[offset + 1]
+                       for offset in range(0, len(sprite_bytes), 2)]
+        self.v[0xF] = self.screen.draw_sprite(
+            x_pos, y_pos, sprite_rows, 16, wrap)
+
+    def keyboard_routines(self):
+        """
+        Opcodes starting with an E are dispatched to the routines in the
+        keyboard_routine_lookup table.
+        """
+        routine = self.keyboard_routine_lookup[self.operand & 0x00FF]
+        if routine is None:
+            raise UnknownOpCodeException(self.operand)
+        routine(self)
+
+    def skip_if_key_pressed(self):
+        """
+        Es9E - SKPR Vs
+
+        Skip the next instruction if the key with the value held in the
+        source register is pressed. The register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      9         E
+        """
+        source = (self.operand & 0x0F00) >> 8
+        if self.keys & (1 << (self.v[source] & 0xF)):
+            self.registers.pc += 2
+
+    def skip_if_key_pressed_long(self):
+        """
+        Es9E - SKPR Vs
+
+        Skip the next instruction if the key with the value held in the
+        source register is pressed:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      9         E
+
+        The next instruction is skipped with skip_next_instruction(), which
+        knows that F000 nnnn is 4 bytes long. Bound in place of
+        skip_if_key_pressed() by XO-CHIP quirk profiles.
+        """
+        source = (self.operand & 0x0F00) >> 8
+        if self.keys & (1 << (self.v[source] & 0xF)):
+            self.skip_next_instruction()
+
+    def skip_if_key_not_pressed(self):
+        """
+        EsA1 - SKUP Vs
+
+        Skip the next instruction if the key with the value held in the
+        source register is not pressed. The register calculation is as
+        follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      A         1
+        """
+        source = (self.operand & 0x0F00) >> 8
+        if not self.keys & (1 << (self.v[source] & 0xF)):
+            self.registers.pc += 2
+
+    def skip_if_key_not_pressed_long(self):
+        """
+        EsA1 - SKUP Vs
+
+        Skip the next instruction if the key with the value held in the
+        source register is not pressed:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      A         1
+
+        The next instruction is skipped with skip_next_instruction(), which
+        knows that F000 nnnn is 4 bytes long. Bound in place of
+        skip_if_key_not_pressed() by XO-CHIP quirk profiles.
+        """
+        source = (self.operand & 0x0F00) >> 8
+        if not self.keys & (1 << (self.v[source] & 0xF)):
+            self.skip_next_instruction()
+
+    def misc_routines(self):
+        """
+        Opcodes starting with an F are dispatched to the routines in the
+        misc_routine_lookup table.
+        """
+        routine = self.misc_routine_lookup[self.operand & 0x00FF]
+        if routine is None:
+            raise UnknownOpCodeException(self.operand)
+        routine(self)
+
+    def move_delay_timer_into_reg(self):
+        """
+        Ft07 - LOAD Vt, DELAY
+
+        Move the value of the delay timer into the target register. The
+        register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   target      0         7
+        """
+        target = (self.operand & 0x0F00) >> 8
+        self.v[target] = self.registers.delay
+
+    def wait_for_keypress(self):
+        """
+        Ft0A - KEYD Vt
+
+        Wait for a keypress, and store the value of the key pressed in the
+        target register. Rather than blocking, the program counter is moved
+        back onto this instruction and the current frame is ended, so that
+        the instruction is re-executed once the keys have been polled again.
+        If several keys are held down, the lowest is taken. The register
+        calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   target      0         A
+        """
+        target = (self.operand & 0x0F00) >> 8
+        keys = self.keys
+        if keys:
+            self.v[target] = (keys & -keys).bit_length() - 1
+            return
+        self.registers.pc -= 2
+        self.halted = True
+
+    def move_reg_into_delay_timer(self):
+        """
+        Fs15 - LOAD DELAY, Vs
+
+        Move the value stored in the specified source register into the delay
+        timer. The register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      1         5
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.registers.delay = self.v[source]
+
+    def move_reg_into_sound_timer(self):
+        """
+        Fs18 - LOAD SOUND, Vs
+
+        Move the value stored in the specified source register into the sound
+        timer. The register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      1         8
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.registers.sound = self.v[source]
+
+    def add_reg_into_index(self):
+        """
+        Fs1E - ADD I, Vs
+
+        Add the value of the register into the index register value. The
+        register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      1         E
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.registers.index = (self.registers.index + self.v[source]) & 0xFFFF
+
+    def load_index_with_reg_sprite(self):
+        """
+        Fs29 - LOAD I, Vs
+
+        Load the index with the sprite indicated in the source register. All
+        sprites are 5 bytes long, so the location of the specified sprite
+        is its index multiplied by 5. The register calculation is as
+        follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      2         9
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.registers.index = self.v[source] * 5
+
+    def load_index_with_extended_reg_sprite(self):
+        """
+        Fs30 - LOAD I, Vs
+
+        Load the index with the extended sprite indicated in the source
+        register. Extended sprites are 10 bytes long and are stored after
+        the 16 normal sprites, so the location of the specified sprite is
+        its index multiplied by 10 plus 80. The register calculation is as
+        follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      3         0
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.registers.index = self.v[source] * 10 + 80
+
+    def store_bcd_in_memory(self):
+        """
+        Fs33 - BCD
+
+        Take the value of the register at source and store it as a binary
+        coded decimal in memory, starting at the address pointed to by the
+        index register. For example, the value 123 is stored as 1 at [I],
+        2 at [I + 1] and 3 at [I + 2]. The register calculation is as
+        follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      3         3
+        """
+        source = (self.operand & 0x0F00) >> 8
+        value = self.v[source]
+        self.memory.store_many(self.registers.index,
+                               (value // 100, (value // 10) % 10, value % 10))
+
+    def store_regs_in_memory(self):
+        """
+        Fs55 - STOR [I], Vs
+
+        Store all of the V registers in memory, up to and including register
+        Vs, starting at the location pointed to by the index register. The
+        register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      5         5
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.memory.store_many(self.registers.index, self.v[:source + 1])
+
+    def store_regs_in_memory_and_advance(self):
+        """
+        Fs55 - STOR [I], Vs
+
+        As store_regs_in_memory(), but leaves the index register pointing
+        after the last register stored, as the COSMAC VIP did. Bound in place
+        of store_regs_in_memory() by quirk profiles with increment set.
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      5         5
+        """
+        source = (self.operand & 0x0F00) >> 8
+        registers = self.registers
+        self.memory.store_many(registers.index, self.v[:source + 1])
+        registers.index = (registers.index + source + 1) & 0xFFFF
+
+    def read_regs_from_memory(self):
+        """
+        Fs65 - LOAD Vs, [I]
+
+        Read all of the V registers from memory, up to and including register
+        Vs, starting at the location pointed to by the index register. The
+        register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      6         5
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.v[:source + 1] = \
+            self.memory.fetch_many(self.registers.index, source + 1)
+
+    def read_regs_from_memory_and_advance(self):
+        """
+        Fs65 - LOAD Vs, [I]
+
+        As read_regs_from_memory(), but leaves the index register pointing
+        after the last register read, as the COSMAC VIP did. Bound in place
+        of read_regs_from_memory() by quirk profiles with increment set.
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      6         5
+        """
+        source = (self.operand & 0x0F00) >> 8
+        registers = self.registers
+        self.v[:source + 1] = \
+            self.memory.fetch_many(registers.index, source + 1)
+        registers.index = (registers.index + source + 1) & 0xFFFF
+
+    def store_regs_in_rpl(self):
+        """
+        Fs75 - SRPL Vs
+
+        Store all of the V registers in the RPL flags, up to and including
+        register Vs. The register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      7         5
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.registers.rpl[:source + 1] = self.v[:source + 1]
+
+    def read_regs_from_rpl(self):
+        """
+        Fs85 - LRPL Vs
+
+        Read all of the V registers from the RPL flags, up to and including
+        register Vs. The register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      8         5
+        """
+        source = (self.operand & 0x0F00) >> 8
+        self.v[:source + 1] = self.registers.rpl[:source + 1]
+
+    def load_index_with_long_value(self):
+        """
+        F000 nnnn - LOAD I, nnnn
+
+        Load the index register with the 16-bit value in the two bytes after
+        the instruction, and skip over them, wrapping around the end of
+        memory. Only on a CPU with the XO-CHIP extensions. The routine is
+        looked up on the low byte alone, so any other Fx00 is rejected here.
+        """
+        if self.operand & 0x0F00:
+            raise UnknownOpCodeException(self.operand)
+        registers = self.registers
+        pc = registers.pc
+        registers.index = (self.memory[pc & 0xFFFF] << 8) | \
+            self.memory[(pc + 1) & 0xFFFF]
+        registers.pc = (pc + 2) & 0xFFFF
+
+    def select_planes(self):
+        """
+        Fn01 - PLANE n
+
+        Select the bitplanes that drawing, clearing and scrolling work on.
+        Only on a CPU with the XO-CHIP extensions. The plane mask is taken
+        from the operand:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused    planes     0         1
+        """
+        self.planes = (self.operand & 0x0F00) >> 8 & 0x3
+
+    def load_audio_pattern(self):
+        """
+        F002 - AUDIO [I]
+
+        Load the 16 byte audio pattern from memory, starting at the location
+        pointed to by the index register, and hand it to the audio device.
+        Only on a CPU with the XO-CHIP extensions. The routine is looked up
+        on the low byte alone, so any other Fx02 is rejected here.
+        """
+        if self.operand & 0x0F00:
+            raise UnknownOpCodeException(self.operand)
+        self.audio_pattern = bytes(
+            self.memory.fetch_many(self.registers.index, PATTERN_BYTES))
+        self.audio.load_pattern(self.audio_pattern, self.pitch)
+
+    def move_reg_into_pitch(self):
+        """
+        Fs3A - PITCH Vs
+
+        Load the pitch register, which sets the rate the audio pattern plays
+        at, with the value of the source register. Only on a CPU with the
+        XO-CHIP extensions. The register calculation is as follows:
+
+           Bits:  15-12     11-8      7-4       3-0
+                  unused   source      3         A
+        """
+        self.pitch = self.v[(self.operand & 0x0F00) >> 8]
+        self.audio.load_pattern(self.audio_pattern, self.pitch)
+
+    def run_frame(self, cycles=None):
+        """
+        Runs a single 60 Hz frame. The keys are polled once, then
+        instructions are executed in a tight loop until the frame's budget
+        is used up, the CPU exits with 00FD, or an Fx0A instruction is
+        waiting for a key. Finally the timers are decremented and the screen
+        is presented.
+
+        Nothing but the program can change the machine's state until the
+        frame ends. When a backward jump is reached twice with the same
+        registers, and the loop it closes is an idle loop, one more pass is
+        run while checking that it stays inside the loop. If that pass comes
+        back to the jump with the same registers again, every further pass
+        would do exactly the same thing, so whole passes are skipped up to
+        the end of the budget. Only the last partial pass is executed, which
+        leaves the machine in the same state as running every instruction.
+        Skipped instructions count towards the number executed, and are also
+        added to skipped_cycles. Loops that cannot be idle are not looked at
+        again in the frame, and loops whose registers keep changing are only
+        looked at after a wait of up to IDLE_CHECK_BACKOFF passes.
+
+        This relies on the keys not changing during the frame. The Pipeline
+        sets them from the presenting thread at any time, so a key pressed
+        while an idle loop is being skipped is only seen from the next
+        frame, just as if the keys were polled once per frame. Skipping is
+        turned off with skip_idle.
+
+        :param cycles: the most instructions to execute, defaults to
+            instructions_per_frame
+        :return: the number of instructions executed
+        """
+        if cycles is None:
+            cycles = self.instructions_per_frame
+        self.poll_input()
+        self.halted = False
+        self.backward_jump = None
+        skip_idle = self.skip_idle
+        # The [passes to wait, current wait, registers at the last pass] of
+        # each loop seen in this frame
+        loop_checks = {}
+        execute_instruction = self.execute_instruction
+        executed = 0
+        while executed < cycles:
+            execute_instruction()
+            executed += 1
+            if self.halted:
+                backward_jump = self.backward_jump
+                if backward_jump is None:
+                    break
+                self.halted = False
+                self.backward_jump = None
+                if not skip_idle:
+                    continue
+                check = loop_checks.get(backward_jump)
+                if check is None:
+                    wait = 0 if self.is_idle_loop(*backward_jump) else cycles
+                    check = loop_checks[backward_jump] = [wait, 1, None]
+                if check[0]:
+                    check[0] -= 1
+                    continue
+                state = bytes(self.registers)
+                if state == check[2] and self.is_idle_loop(*backward_jump):
+                    executed += self.skip_idle_loop(
+                        backward_jump, state, cycles - executed)
+                    if self.halted:
+                        break
+                elif check[2] is not None:
+                    check[1] = min(check[1] * 2, IDLE_CHECK_BACKOFF)
+                    check[0] = check[1]
+                    state = None
+                check[2] = state
+        self.audio.update(self.registers.sound)
+        self.decrement_timers()
+        self.screen.update()
+        return executed
+
+    def run(self, cycles=None, uncapped=False):
+        """
+        Runs frames until the specified number of instructions have been
+        executed, or the CPU stops running. Unless uncapped is set, each frame
+        is paced to DELAY_INTERVAL milliseconds; uncapped runs frames back to
+        back, which is useful for benchmarks and headless runs.
+
+        :param cycles: the number of instructions to execute, or None to run
+            until the CPU stops
+        :param uncapped: whether to run without pacing frames
+        :return: the number of instructions executed
+        """
+        frame_interval = DELAY_INTERVAL / 1000.0
+        next_frame = perf_counter() + frame_interval
+        executed = 0
+        while self.running and (cycles is None or executed < cycles):
+            budget = self.instructions_per_frame
+            if cycles is not None:
+                budget = min(budget, cycles - executed)
+            executed += self.run_frame(budget)
+            if not uncapped:
+                delay = next_frame - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+                    next_frame += frame_interval
+                else:
+                    next_frame = perf_counter() + frame_interval
+        return executed
+
+    def poll_input(self):
+        """
+        Gathers the key events since the last poll into the keypad mask, and
+        stops the CPU if the window was closed. Without a keypad (for example
+        when running headless) the keys are left as they are, so that callers
+        can set them directly.
+        """
+        if self.keypad is None:
+            return
+        self.keys, closed = self.keypad.poll(self.keys)
+        if closed:
+            self.running = False
+
+    def skip_idle_loop(self, backward_jump, state, cycles):
+        """
+        Runs one pass of an idle loop, one instruction at a time, checking
+        that it stays between the target and the backward jump. If the pass
+        ends back at the jump with the registers in the same state, the
+        passes that would fit in the rest of the budget are skipped.
+
+        :param backward_jump: the (jump address, target) of the loop
+        :param state: the packed registers at the jump
+        :param cycles: the number of instructions left in the budget
+        :return: the number of instructions executed or skipped
+        """
+        jump_address, target = backward_jump
+        registers = self.registers
+        executed = 0
+        while executed < cycles:
+            if not target <= registers.pc <= jump_address:
+                return executed
+            self.execute_instruction()
+            executed += 1
+            if self.halted:
+                if self.backward_jump != backward_jump:
+                    return executed
+                self.halted = False
+                self.backward_jump = None
+                if bytes(registers) != state:
+                    return executed
+                skipped = (cycles - executed) // executed * executed
+                self.skipped_cycles += skipped
+                return executed + skipped
+        return executed
+
+    def is_idle_loop(self, jump_address, target):
+        """
+        Checks whether the code from target up to a backward jump could be
+        an idle loop: every instruction is in IDLE_OPERATIONS, and the only
+        jump is the backward jump itself. Skips may leave the loop, which
+        skip_idle_loop() checks for as it runs. The result is cached until
+        memory is next written.
+
+        :param jump_address: the address of the backward jump
+        :param target: the address it jumps to
+        :return: True if the loop is idle
+        """
+        key = (jump_address, target)
+        try:
+            return self.idle_loops[key]
+        except KeyError:
+            pass
+        idle = True
+        for address in range(target, jump_address, 2):
+            operand = (self.memory[address] << 8) | self.memory[address + 1]
+            operation = (operand & 0xF000) >> 12
+            if operation not in IDLE_OPERATIONS or operation == 0x1:
+                idle = False
+            elif operation == 0x5:
+                idle = operand & 0x000F != 0x2
+            elif operation == 0xF:
+                idle = operand & 0x00FF in IDLE_MISC_OPERATIONS
+            if idle:
+                try:
+                    self.decode(operand)
+                except UnknownOpCodeException:
+                    idle = False
+            if not idle:
+                break
+        self.idle_loops[key] = idle
+        return idle
+
+    def decrement_timers(self):
+        """
+        Decrement both the sound and delay timers.
+        """
+        if self.registers.delay != 0:
+            self.registers.delay -= 1
+        if self.registers.sound != 0:
+            self.registers.sound -= 1
+
+    def load_rom(self, filename, offset=PROGRAM_COUNTER_START):
+        """
+        Load the ROM file into memory starting at the specified offset. The
+        image comes from the process-wide loader cache, so each file is only
+        read from disk once, and is copied in with a single slice assignment.
+
+        :param filename: the name of the file to open
+        :param offset: the location in memory at which to load the data
+        """
+        romdata = load_image(filename)
+        if offset + len(romdata) > len(self.memory):
+            raise ValueError("ROM {} does not fit in memory".format(filename))
+        self.memory.store_many(offset, romdata)
+
+    def enable_extended_mode(self):
+        """
+        00FF - Enable extended mode
+        """
+        self.screen.set_extended()
+        self.mode = MODE_EXTENDED
+
+    def disable_extended_mode(self):
+        """
+        00FE - Disable extended mode
+        """
+        self.screen.set_normal()
+        self.mode = MODE_NORMAL
+
+    def snapshot(self):
+        """
+        Packs the whole machine - memory, registers, timers, mode and screen
+        - into a single blob of SNAPSHOT_LAYOUT.size bytes. A CPU with the
+        XO-CHIP extensions uses XOCHIP_SNAPSHOT_LAYOUT instead, which also
+        holds the selected planes and the audio state.
+
+        :return: the snapshot
+        """
+        layout = SNAPSHOT_LAYOUT
+        fields = [self.memory, bytes(self.registers),
+                  self.mode == MODE_EXTENDED, self.screen.to_bytes()]
+        if self.quirks.xochip:
+            layout = XOCHIP_SNAPSHOT_LAYOUT
+            pattern = self.audio_pattern
+            fields += [self.planes, self.pitch, pattern is not None,
+                       pattern or bytes(PATTERN_BYTES)]
+        buffer = self.snapshot_buffer
+        if buffer is None:
+            buffer = self.snapshot_buffer = bytearray(layout.size)
+        layout.pack_into(buffer, 0, *fields)
+        return bytes(buffer)
+
+    def restore(self, snapshot):
+        """
+        Restores the machine from the output of snapshot(). The screen is
+        switched to the snapshot's mode first if necessary.
+
+        :param snapshot: the snapshot to restore
+        """
+        if self.quirks.xochip:
+            (memory, registers, extended, screen, self.planes, self.pitch,
+             has_pattern, pattern) = XOCHIP_SNAPSHOT_LAYOUT.unpack(snapshot)
+            self.audio_pattern = pattern if has_pattern else None
+            self.audio.load_pattern(self.audio_pattern, self.pitch)
+        else:
+            memory, registers, extended, screen = \
+                SNAPSHOT_LAYOUT.unpack(snapshot)
+        if extended and self.mode != MODE_EXTENDED:
+            self.enable_extended_mode()
+        elif not extended and self.mode == MODE_EXTENDED:
+            self.disable_extended_mode()
+        self.memory.store_many(0, memory)
+        self.registers.load(registers)
+        self.screen.load_bytes(screen)
+
+    def reset(self):
+        """
+        Reset the CPU by blanking out all registers, and resetting the stack
+        pointer and program counter to their starting values. The XO-CHIP
+        plane selection and audio state go back to their defaults too.
+        """
+        self.registers.reset()
+        self.decode_cache.clear()
+        self.planes = FIRST_PLANE
+        if self.audio_pattern is not None or self.pitch != DEFAULT_PITCH:
+            self.audio_pattern = None
+            self.pitch = DEFAULT_PITCH
+            self.audio.load_pattern(None, DEFAULT_PITCH)
+
+    # The dispatch tables, shared by every CPU. Each is a tuple indexed by a
+    # nibble or the low byte of the operand, holding the unbound routine, or
+    # None where there is no op-code. Every CPU's lookup attributes start out
+    # pointing at these, so that a tool such as the profiler can swap in its
+    # own tables for one CPU without affecting the others.
+    OPERATIONS = (
+        clear_return,  # 0nnn - SYS  nnn
+        jump_to_address,  # 1nnn - JUMP nnn
+        jump_to_subroutine,  # 2nnn - CALL nnn
+        skip_if_reg_equal_val,  # 3snn - SKE  Vs, nn
+        skip_if_reg_not_equal_val,  # 4snn - SKNE Vs, nn
+        skip_if_reg_equal_reg,  # 5st0 - SKE  Vs, Vt
+        move_value_to_reg,  # 6snn - LOAD Vs, nn
+        add_value_to_reg,  # 7snn - ADD  Vs, nn
+        execute_logical_instruction,  # see LOGICAL_OPERATIONS
+        skip_if_reg_not_equal_reg,  # 9st0 - SKNE Vs, Vt
+        load_index_reg_with_value,  # Annn - LOAD I, nnn
+        jump_to_index_plus_value,  # Bnnn - JUMP [I] + nnn
+        generate_random_number,  # Ctnn - RAND Vt, nn
+        draw_sprite,  # Dstn - DRAW Vs, Vy, n
+        keyboard_routines,  # see KEYBOARD_ROUTINES
+        misc_routines,  # see MISC_ROUTINES
+    )
+
+    LOGICAL_OPERATIONS = dispatch_table(16, {
+        0x0: move_reg_into_reg,  # 8st0 - LOAD Vs, Vt
+        0x1: logical_or,  # 8st1 - OR   Vs, Vt
+        0x2: logical_and,  # 8st2 - AND  Vs, Vt
+        0x3: exclusive_or,  # 8st3 - XOR  Vs, Vt
+        0x4: add_reg_to_reg,  # 8st4 - ADD  Vs, Vt
+        0x5: subtract_reg_from_reg,  # 8st5 - SUB  Vs, Vt
+        0x6: right_shift_reg,  # 8st6 - SHR  Vs
+        0x7: subtract_reg_from_reg1,  # 8st7 - SUBN Vs, Vt
+        0xE: left_shift_reg,  # 8stE - SHL  Vs
+    })
+
+    KEYBOARD_ROUTINES = dispatch_table(256, {
+        0x9E: skip_if_key_pressed,  # Es9E - SKPR Vs
+        0xA1: skip_if_key_not_pressed,  # EsA1 - SKUP Vs
+    })
+
+    MISC_ROUTINES = dispatch_table(256, {
+        0x07: move_delay_timer_into_reg,  # Ft07 - LOAD Vt, DELAY
+        0x0A: wait_for_keypress,  # Ft0A - KEYD Vt
+        0x15: move_reg_into_delay_timer,  # Fs15 - LOAD DELAY, Vs
+        0x18: move_reg_into_sound_timer,  # Fs18 - LOAD SOUND, Vs
+        0x1E: add_reg_into_index,  # Fs1E - ADD  I, Vs
+        0x29: load_index_with_reg_sprite,  # Fs29 - LOAD I, Vs
+        0x30: load_index_with_extended_reg_sprite,  # Fs30 - LOAD I, Vs
+        0x33: store_bcd_in_memory,  # Fs33 - BCD
+        0x55: store_regs_in_memory,  # Fs55 - STOR [I], Vs
+        0x65: read_regs_from_memory,  # Fs65 - LOAD Vs, [I]
+        0x75: store_regs_in_rpl,  # Fs75 - SRPL Vs
+        0x85: read_regs_from_rpl,  # Fs85 - LRPL Vs
+    })
+
+    # The XO-CHIP opcodes starting with a 5, indexed by the low nibble, used
+    # by register_routines() on a CPU with the XO-CHIP extensions
+    REGISTER_ROUTINES = dispatch_table(16, {
+        0x0: skip_if_reg_equal_reg_long,  # 5st0 - SKE  Vs, Vt
+        0x2: store_reg_range_in_memory,  # 5st2 - STOR [I], Vs - Vt
+        0x3: read_reg_range_from_memory,  # 5st3 - LOAD Vs - Vt, [I]
+    })
+
+    # The dispatch tables for each quirk profile, keyed by Quirks, built the
+    # first time a CPU runs the profile
+    QUIRK_TABLES = {}
+
+    @classmethod
+    def get_quirk_tables(cls, quirks):
+        """
+        Builds the dispatch tables for a quirk profile, by binding the
+        variant of each quirky routine that the profile asks for into copies
+        of the class tables. The tables are cached, so every CPU that runs
+        the same profile shares them, and the routines never check a quirk
+        while they run.
+
+        :param quirks: the Quirks to build the tables for
+        :return: the operation, logical operation, keyboard routine and misc
+            routine tables
+        """
+        try:
+            return cls.QUIRK_TABLES[quirks]
+        except KeyError:
+            pass
+        operations = list(cls.OPERATIONS)
+        logical_operations = list(cls.LOGICAL_OPERATIONS)
+        keyboard_routines = list(cls.KEYBOARD_ROUTINES)
+        misc_routines = list(cls.MISC_ROUTINES)
+
+        if quirks.shift == SHIFT_VY:
+            logical_operations[0x6] = cls.right_shift_source_into_target
+            logical_operations[0xE] = cls.left_shift_source_into_target
+        elif quirks.shift == SHIFT_VX:
+            logical_operations[0x6] = cls.right_shift_reg_in_place
+            logical_operations[0xE] = cls.left_shift_reg_in_place
+        if quirks.jump == JUMP_V0:
+            operations[0xB] = cls.jump_to_v0_plus_value
+        elif quirks.jump == JUMP_VX:
+            operations[0xB] = cls.jump_to_reg_plus_value
+        if quirks.increment:
+            misc_routines[0x55] = cls.store_regs_in_memory_and_advance
+            misc_routines[0x65] = cls.read_regs_from_memory_and_advance
+        if quirks.clip:
+            operations[0xD] = cls.draw_sprite_clipped
+        if quirks.reset_flag:
+            logical_operations[0x1] = cls.logical_or_reset_flag
+            logical_operations[0x2] = cls.logical_and_reset_flag
+            logical_operations[0x3] = cls.exclusive_or_reset_flag
+        if quirks.xochip:
+            operations[0x0] = cls.clear_return_planes
+            operations[0x3] = cls.skip_if_reg_equal_val_long
+            operations[0x4] = cls.skip_if_reg_not_equal_val_long
+            operations[0x5] = cls.register_routines
+            operations[0x9] = cls.skip_if_reg_not_equal_reg_long
+            if quirks.clip:
+                operations[0xD] = cls.draw_sprite_planes_clipped
+            else:
+                operations[0xD] = cls.draw_sprite_planes
+            keyboard_routines[0x9E] = cls.skip_if_key_pressed_long
+            keyboard_routines[0xA1] = cls.skip_if_key_not_pressed_long
+            misc_routines[0x00] = cls.load_index_with_long_value
+            misc_routines[0x01] = cls.select_planes
+            misc_routines[0x02] = cls.load_audio_pattern
+            misc_routines[0x3A] = cls.move_reg_into_pitch
+
+        tables = cls.QUIRK_TABLES[quirks] = (
+            tuple(operations), tuple(logical_operations),
+            tuple(keyboard_routines), tuple(misc_routines))
+        return tables
@@ -1,30 +1,39 @@
-import pygame
-
 MAX_MEMORY = 4096
 
-STACK_POINTER_START = 0x52
+# The memory of a CPU with the XO-CHIP extensions
+XOCHIP_MEMORY = 65536
+
+STACK_POINTER_START = 0xB4
 
 PROGRAM_COUNTER_START = 0x200
 
+# The key on the computer's keyboard for each Chip 8 key, as the name of its
+# pygame key constant without the K_ prefix. The names are only resolved to
+# key codes by chip8.keypad.PygameKeypad, so that importing the configuration
+# does not import pygame.
 KEY_MAPPING = {
-    0x0: pygame.K_g,
-    0x1: pygame.K_4,
-    0x2: pygame.K_5,
-    0x3: pygame.K_6,
-    0x4: pygame.K_7,
-    0x5: pygame.K_r,
-    0x6: pygame.K_t,
-    0x7: pygame.K_y,
-    0x8: pygame.K_u,
-    0x9: pygame.K_f,
-    0xA: pygame.K_h,
-    0xB: pygame.K_j,
-    0xC: pygame.K_v,
-    0xD: pygame.K_b,
-    0xE: pygame.K_n,
-    0xF: pygame.K_m,
+    0x0: 'g',
+    0x1: '4',
+    0x2: '5',
+    0x3: '6',
+    0x4: '7',
+    0x5: 'r',
+    0x6: 't',
+    0x7: 'y',
+    0x8: 'u',
+    0x9: 'f',
+    0xA: 'h',
+    0xB: 'j',
+    0xC: 'v',
+    0xD: 'b',
+    0xE: 'n',
+    0xF: 'm',
 }
 
 FONT_FILE = "FONTS.chip8"
 
-DELAY_INTERVAL = 17
\ No newline at end of file
+DELAY_INTERVAL = 17
+
+INSTRUCTIONS_PER_FRAME = 10
+
+FRAME_RATE = 60
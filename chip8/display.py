@@ -1,57 +1,66 @@
-from pygame import display, HWSURFACE, DOUBLEBUF, Color, draw
+from time import monotonic
 
-# Various screen modes
-SCREEN_MODE_NORMAL = 'normal'
-SCREEN_MODE_EXTENDED = 'extended'
+from pygame import display, HWSURFACE, DOUBLEBUF, Color, Rect, draw
 
-SCREEN_HEIGHT = {
-    SCREEN_MODE_NORMAL: 32,
-    SCREEN_MODE_EXTENDED: 64
-}
-
-DEFAULT_HEIGHT = SCREEN_HEIGHT[SCREEN_MODE_NORMAL]
-
-SCREEN_WIDTH = {
-    SCREEN_MODE_NORMAL: 64,
-    SCREEN_MODE_EXTENDED: 128
-}
-DEFAULT_WIDTH = SCREEN_WIDTH[SCREEN_MODE_NORMAL]
+from chip8.config import FRAME_RATE
+from chip8.framebuffer import Framebuffer, DEFAULT_HEIGHT, DEFAULT_WIDTH
 
 # The depth of the screen is the number of bits used to represent the color
 # of a pixel.
 SCREEN_DEPTH = 8
 
 # The colors of the pixels to draw. The Chip 8 supports two colors: 0 (off)
-# and 1 (on). The format of the colors is in RGBA format.
+# and 1 (on). XO-CHIP programs can also draw in the second bitplane, which
+# gives colors 2 (second plane only) and 3 (both planes). The format of the
+# colors is in RGBA format.
 PIXEL_COLORS = {
     0: Color(0, 0, 0, 255),
-    1: Color(250, 250, 250, 255)
+    1: Color(250, 250, 250, 255),
+    2: Color(170, 170, 170, 255),
+    3: Color(85, 85, 85, 255)
 }
 
 
 # C L A S S E S ###############################################################
 
 
-class Display(object):
+class Display(Framebuffer):
     """
     A class to emulate a Chip 8 Screen. The original Chip 8 screen was 64 x 32
     with 2 colors. In this emulator, this translates to color 0 (off) and color
-    1 (on).
+    1 (on). All pixel state lives in the underlying Framebuffer; the pygame
+    surface is only painted from it when the display is presented, and only
+    the regions that changed since the last present are pushed to the window.
     """
 
-    def __init__(self, scale_factor, height=DEFAULT_HEIGHT, width=DEFAULT_WIDTH):
+    __slots__ = (
+        'scale_factor', 'surface', 'frame_interval', 'last_present',
+        'presented_rows', 'presents', 'skipped_presents', 'pending',
+    )
+
+    def __init__(self, scale_factor, height=DEFAULT_HEIGHT, width=DEFAULT_WIDTH,
+                 frame_rate=FRAME_RATE):
         """
         Initializes the main screen. The scale factor is used to modify
         the size of the main screen, since the original resolution of the
-        Chip 8 was 64 x 32, which is quite small.
+        Chip 8 was 64 x 32, which is quite small. Calls to update() are
+        capped to frame_rate presents per second; a frame_rate of 0 or None
+        presents on every call. An update that falls inside the cap is
+        deferred rather than dropped, and is presented by flush().
         :param scale_factor: the scaling factor to apply to the screen
         :param height: the height of the screen
         :param width: the width of the screen
+        :param frame_rate: the maximum number of presents per second
         """
-        self.height = height
-        self.width = width
+        Framebuffer.__init__(self, height, width)
         self.scale_factor = scale_factor
         self.surface = None
+        self.frame_interval = 1.0 / frame_rate if frame_rate else 0
+        self.last_present = None
+        self.presented_rows = None
+        self.presents = 0
+        self.skipped_presents = 0
+        self.pending = False
 
     def init_display(self):
         """
@@ -67,71 +76,111 @@ class Display(object):
             SCREEN_DEPTH)
         display.set_caption('CHIP8 Emulator')
         self.clear_screen()
-        self.update()
-
-    def draw_pixel(self, x_pos, y_pos, pixel_color):
-        """
-        Turn a pixel on or off at the specified location on the screen. Note
-        that the pixel will not automatically be drawn on the screen, you
-        must call the update() function to flip the drawing buffer to the
-        display. The coordinate system starts with (0, 0) being in the top
-        left of the screen.
-        :param x_pos: the x coordinate to place the pixel
-        :param y_pos: the y coordinate to place the pixel
-        :param pixel_color: the color of the pixel to draw
-        """
-        x_base = x_pos * self.scale_factor
-        y_base = y_pos * self.scale_factor
-        draw.rect(self.surface,
-                  PIXEL_COLORS[pixel_color],
-                  (x_base, y_base, self.scale_factor, self.scale_factor))
-
-    def get_pixel(self, x_pos, y_pos):
-        """
-        Returns whether the pixel is on (1) or off (0) at the specified
-        location.
-        :param x_pos: the x coordinate to check
-        :param y_pos: the y coordinate to check
-        :return: the color of the specified pixel (0 or 1)
-        """
-        x_scale = x_pos * self.scale_factor
-        y_scale = y_pos * self.scale_factor
-        pixel_color = self.surface.get_at((x_scale, y_scale))
-        if pixel_color == PIXEL_COLORS[0]:
-            color = 0
-        else:
-            color = 1
-        return color
-
-    def clear_screen(self):
-        """
-        Turns off all the pixels on the screen (writes color 0 to all pixels).
-        """
-        self.surface.fill(PIXEL_COLORS[0])
-
-    @staticmethod
-    def update():
-        """
-        Updates the display by swapping the back buffer and screen buffer.
-        According to the pygame documentation, the flip should wait for a
-        vertical retrace when both HWSURFACE and DOUBLEBUF are set on the
-        surface.
-        """
-        display.flip()
-
-    def get_width(self):
-        """
-        Returns the current value of the screen width.
-        :return: the width of the screen
-        """
-        return self.width
-
-    def get_height(self):
-        """
-        Returns the current value of the screen height.
-        :return: the height of the screen
-        """
-        return self.height
+        self.presented_rows = None
+        self.present()
+
+    def update(self):
+        """
+        Presents the display, unless it has already been presented within the
+        current video frame. Calls that fall inside the same frame are merged
+        into the next present and counted in skipped_presents; the display is
+        marked as pending until then, so that flush() can present it if no
+        further update comes.
+        """
+        if self.last_present is not None and \
+                monotonic() - self.last_present < self.frame_interval:
+            self.pending = True
+            self.skipped_presents += 1
+            return
+        self.pending = False
+        self.present()
+
+    def flush(self, force=False):
+        """
+        Presents an update that was deferred by the frame rate cap, once the
+        video frame it fell in is over. Does nothing if no update is pending.
+        :param force: whether to present a pending update at once, without
+            waiting for the video frame to end
+        """
+        if self.pending and (force or monotonic() - self.last_present >=
+                             self.frame_interval):
+            self.pending = False
+            self.present()
+
+    def present(self):
+        """
+        Paints the regions of the frame buffer that changed since the last
+        present onto the surface, and pushes only those regions to the
+        window. If nothing changed, the window is left alone and the call is
+        counted in skipped_presents.
+        """
+        self.last_present = monotonic()
+        rects = self.get_dirty_rects()
+        self.presented_rows = list(self.rows)
+        if not rects:
+            self.skipped_presents += 1
+            return
+        scale = self.scale_factor
+        for rect in rects:
+            self.paint(rect)
+        display.update([Rect(x_pos * scale, y_pos * scale,
+                             width * scale, height * scale)
+                        for x_pos, y_pos, width, height in rects])
+        self.presents += 1
+
+    def get_dirty_rects(self):
+        """
+        Compares the frame buffer to the rows that were last presented, and
+        returns the regions that changed. Consecutive changed rows are merged
+        into a single band spanning the left-most to right-most changed
+        pixel. Changes in the second bitplane are folded onto the first.
+        Coordinates are in Chip 8 pixels, not screen pixels.
+        :return: a list of (x, y, width, height) tuples
+        """
+        if self.presented_rows is None:
+            return [(0, 0, self.width, self.height)]
+        width = self.width
+        row_mask = (1 << width) - 1
+        rects = []
+        band = None
+        for y_pos, (row, old_row) in \
+                enumerate(zip(self.rows, self.presented_rows)):
+            changed = row ^ old_row
+            if not changed:
+                continue
+            changed = (changed | (changed >> width)) & row_mask
+            left = self.width - changed.bit_length()
+            right = self.width - (changed & -changed).bit_length()
+            if band is not None and band[1] == y_pos:
+                band[1] = y_pos + 1
+                band[2] = min(band[2], left)
+                band[3] = max(band[3], right)
+            else:
+                band = [y_pos, y_pos + 1, left, right]
+                rects.append(band)
+        return [(left, top, right - left + 1, bottom - top)
+                for top, bottom, left, right in rects]
+
+    def paint(self, rect):
+        """
+        Paints a region of the frame buffer onto the surface.
+        :param rect: the (x, y, width, height) region to paint, in Chip 8
+            pixels
+        """
+        scale = self.scale_factor
+        left, top, width, height = rect
+        self.surface.fill(PIXEL_COLORS[0],
+                          (left * scale, top * scale,
+                           width * scale, height * scale))
+        for y_pos in range(top, top + height):
+            row = self.rows[y_pos]
+            for x_pos in range(left, left + width):
+                pixels = row >> (self.width - 1 - x_pos)
+                color = (pixels & 1) | ((pixels >> (self.width - 1)) & 2)
+                if color:
+                    draw.rect(self.surface,
+                              PIXEL_COLORS[color],
+                              (x_pos * scale, y_pos * scale, scale, scale))
 
     @staticmethod
     def destroy():
@@ -145,8 +194,7 @@ class Display(object):
         Sets the screen mode to extended.
         """
         self.destroy()
-        self.height = SCREEN_HEIGHT[SCREEN_MODE_EXTENDED]
-        self.width = SCREEN_WIDTH[SCREEN_MODE_EXTENDED]
+        Framebuffer.set_extended(self)
         self.init_display()
 
     def set_normal(self):
@@ -154,56 +202,5 @@ class Display(object):
         Sets the screen mode to normal.
         """
         self.destroy()
-        self.height = SCREEN_HEIGHT[SCREEN_MODE_NORMAL]
-        self.width = SCREEN_WIDTH[SCREEN_MODE_NORMAL]
+        Framebuffer.set_normal(self)
         self.init_display()
-
-    def scroll_down(self, num_lines):
-        """
-        Scroll the screen down by num_lines.
-
-        :param num_lines: the number of lines to scroll down
-        """
-        for y_pos in range(self.height - num_lines, -1, -1):
-            for x_pos in range(self.width):
-                pixel_color = self.get_pixel(x_pos, y_pos)
-                self.draw_pixel(x_pos, y_pos + num_lines, pixel_color)
-
-        # Blank out the lines above the ones we scrolled
-        for y_pos in range(num_lines):
-            for x_pos in range(self.width):
-                self.draw_pixel(x_pos, y_pos, 0)
-
-        self.update()
-
-    def scroll_left(self):
-        """
-        Scroll the screen left 4 pixels.
-        """
-        for y_pos in range(self.height):
-            for x_pos in range(4, self.width):
-                pixel_color = self.get_pixel(x_pos, y_pos)
-                self.draw_pixel(x_pos - 4, y_pos, pixel_color)
-
-        # Blank out the lines to the right of the ones we just scrolled
-        for y_pos in range(self.height):
-            for x_pos in range(self.width - 4, self.width):
-                self.draw_pixel(x_pos, y_pos, 0)
-
-        self.update()
-
-    def scroll_right(self):
-        """
-        Scroll the screen right 4 pixels.
-        """
-        for y_pos in range(self.height):
-            for x_pos in range(self.width - 4, -1, -1):
-                pixel_color = self.get_pixel(x_pos, y_pos)
-                self.draw_pixel(x_pos + 4, y_pos, pixel_color)
-
-        # Blank out the lines to the left of the ones we just scrolled
-        for y_pos in range(self.height):
-            for x_pos in range(4):
-                self.draw_pixel(x_pos, y_pos, 0)
-
-        self.update()
\ No newline at end of file
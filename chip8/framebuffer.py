@@ -0,0 +1,357 @@
+"""
+A headless frame buffer for the Chip 8 screen. The screen state is kept as a
+list of packed rows, one integer per row, so that the emulator can run
+without any pygame display at all. Bit (width - 1 - x) of row y holds the
+pixel at (x, y), which means that the most significant bit of a row is the
+left-most pixel on the screen.
+
+XO-CHIP programs draw on two bitplanes. The second plane is packed into the
+same integer as the first, directly above it: bit (2 * width - 1 - x) of row
+y holds its pixel at (x, y). A sprite drawn on both planes is therefore
+still a single XOR per row, and a program that only uses the first plane
+leaves the rows exactly as they would be without planes. The color of a
+pixel is its first plane bit, plus 2 if its second plane bit is set.
+"""
+
+# C O N S T A N T S ###########################################################
+
+# Various screen modes
+SCREEN_MODE_NORMAL = 'normal'
+SCREEN_MODE_EXTENDED = 'extended'
+
+SCREEN_HEIGHT = {
+    SCREEN_MODE_NORMAL: 32,
+    SCREEN_MODE_EXTENDED: 64
+}
+
+DEFAULT_HEIGHT = SCREEN_HEIGHT[SCREEN_MODE_NORMAL]
+
+SCREEN_WIDTH = {
+    SCREEN_MODE_NORMAL: 64,
+    SCREEN_MODE_EXTENDED: 128
+}
+DEFAULT_WIDTH = SCREEN_WIDTH[SCREEN_MODE_NORMAL]
+
+# Bitplane selection masks
+FIRST_PLANE = 0x1
+SECOND_PLANE = 0x2
+ALL_PLANES = FIRST_PLANE | SECOND_PLANE
+
+# The number of planes in each selection mask
+PLANE_COUNT = (0, 1, 1, 2)
+
+
+# C L A S S E S ###############################################################
+
+
+class Framebuffer(object):
+    """
+    A class to emulate a Chip 8 Screen without a window. It exposes the same
+    drawing interface as the pygame Display, but keeps every pixel in packed
+    rows so that reads, writes and collision checks never touch a surface.
+    """
+
+    __slots__ = ('height', 'width', 'rows')
+
+    def __init__(self, height=DEFAULT_HEIGHT, width=DEFAULT_WIDTH):
+        """
+        Initializes an empty frame buffer of the specified size.
+        :param height: the height of the screen
+        :param width: the width of the screen
+        """
+        self.height = height
+        self.width = width
+        self.rows = [0] * height
+
+    def init_display(self):
+        """
+        Prepares the frame buffer for use. There is no window to create, so
+        this simply turns off every pixel.
+        """
+        self.clear_screen()
+
+    def draw_pixel(self, x_pos, y_pos, pixel_color):
+        """
+        Sets the color of a pixel at the specified location in the buffer.
+        The coordinate system starts with (0, 0) being in the top left of the
+        screen.
+        :param x_pos: the x coordinate to place the pixel
+        :param y_pos: the y coordinate to place the pixel
+        :param pixel_color: the color of the pixel to draw (0 to 3)
+        """
+        bit = 1 << (self.width - 1 - x_pos)
+        second_bit = bit << self.width
+        row = self.rows[y_pos] & ~(bit | second_bit)
+        if pixel_color & FIRST_PLANE:
+            row |= bit
+        if pixel_color & SECOND_PLANE:
+            row |= second_bit
+        self.rows[y_pos] = row
+
+    def get_pixel(self, x_pos, y_pos):
+        """
+        Returns the color of the pixel at the specified location: 0 if it is
+        off, 1 if it is on, and 2 or 3 if it is on in the second plane.
+        :param x_pos: the x coordinate to check
+        :param y_pos: the y coordinate to check
+        :return: the color of the specified pixel (0 to 3)
+        """
+        pixels = self.rows[y_pos] >> (self.width - 1 - x_pos)
+        return (pixels & 1) | ((pixels >> (self.width - 1)) & 2)
+
+    def get_plane_mask(self, planes):
+        """
+        Returns the bits of a row that belong to the selected planes.
+        :param planes: the plane selection mask
+        :return: the row mask
+        """
+        row_mask = (1 << self.width) - 1
+        plane_mask = row_mask if planes & FIRST_PLANE else 0
+        if planes & SECOND_PLANE:
+            plane_mask |= row_mask << self.width
+        return plane_mask
+
+    def draw_sprite(self, x_pos, y_pos, sprite_rows, sprite_width=8,
+                    wrap=True, planes=FIRST_PLANE):
+        """
+        XORs a sprite into the buffer, one whole row at a time. Each sprite
+        row is an integer whose most significant bit (of sprite_width bits)
+        is the left-most pixel. The row is shifted into position to form a
+        mask for the screen row, and the mask is XORed in with a single
+        operation. When wrap is set, pixels that fall off the right or bottom
+        edge of the screen re-appear on the left or top; otherwise they are
+        clipped.
+
+        When both planes are selected, sprite_rows holds the rows for the
+        first plane followed by the rows for the second, and each pair is
+        packed together before drawing, so that both planes are drawn with
+        one XOR per row.
+        :param x_pos: the x coordinate of the top left of the sprite
+        :param y_pos: the y coordinate of the top left of the sprite
+        :param sprite_rows: an iterable of sprite rows
+        :param sprite_width: the width of a sprite row in pixels
+        :param wrap: whether to wrap or clip at the screen edges
+        :param planes: the plane selection mask to draw on
+        :return: 1 if any pixel that was on was turned off, 0 otherwise
+        """
+        width = self.width
+        height = self.height
+        rows = self.rows
+        if planes != FIRST_PLANE:
+            sprite_rows = self.pack_planes(sprite_rows, planes)
+        shift = width - sprite_width
+        x_pos %= width
+        y_pos %= height
+        # A sprite that fits inside the right edge needs a single shift.
+        # Otherwise, the second plane's pixels that fall off the right edge
+        # are shifted into the top of the first plane, and must be masked
+        # off; they are put back at the left of the second plane when
+        # wrapping.
+        offset = shift - x_pos
+        edge = (1 << x_pos) - 1
+        clip_mask = ~(edge << (width - x_pos))
+        wrap_mask = ((1 << width) - 1) | (edge << (2 * width - x_pos))
+        collision = 0
+        for sprite_row in sprite_rows:
+            if not wrap and y_pos >= height:
+                break
+            if sprite_row:
+                if offset >= 0:
+                    mask = sprite_row << offset
+                else:
+                    mask = ((sprite_row << shift) >> x_pos) & clip_mask
+                    if wrap:
+                        mask |= (sprite_row << (shift + width - x_pos)) & \
+                            wrap_mask
+                old = rows[y_pos]
+                if old & mask:
+                    collision = 1
+                rows[y_pos] = old ^ mask
+            y_pos += 1
+            if wrap and y_pos == height:
+                y_pos = 0
+        return collision
+
+    def pack_planes(self, sprite_rows, planes):
+        """
+        Moves the rows of a sprite into the planes they are drawn on.
+        :param sprite_rows: the sprite rows, as passed to draw_sprite()
+        :param planes: the plane selection mask
+        :return: the packed sprite rows
+        """
+        width = self.width
+        if planes == SECOND_PLANE:
+            return [sprite_row << width for sprite_row in sprite_rows]
+        if planes == ALL_PLANES:
+            half = len(sprite_rows) // 2
+            return [first | (second << width) for first, second in
+                    zip(sprite_rows[:half], sprite_rows[half:])]
+        return []
+
+    def clear_screen(self, planes=ALL_PLANES):
+        """
+        Turns off all the pixels in the selected planes.
+        :param planes: the plane selection mask
+        """
+        if planes == ALL_PLANES:
+            self.rows = [0] * self.height
+        else:
+            keep = ~self.get_plane_mask(planes)
+            self.rows = [row & keep for row in self.rows]
+
+    def merge_planes(self, rows, planes):
+        """
+        Replaces the selected planes of every row, leaving the others as
+        they are.
+        :param rows: the new rows
+        :param planes: the plane selection mask
+        """
+        if planes == ALL_PLANES:
+            self.rows[:] = rows
+            return
+        plane_mask = self.get_plane_mask(planes)
+        self.rows[:] = [(old & ~plane_mask) | (new & plane_mask)
+                        for old, new in zip(self.rows, rows)]
+
+    def update(self):
+        """
+        Presents the buffer. A headless frame buffer has nothing to present,
+        so this does nothing.
+        """
+
+    def flush(self, force=False):
+        """
+        Presents an update that was deferred. A headless frame buffer never
+        defers one, so this does nothing.
+        :param force: whether to present without waiting
+        """
+
+    def get_width(self):
+        """
+        Returns the current value of the screen width.
+        :return: the width of the screen
+        """
+        return self.width
+
+    def get_height(self):
+        """
+        Returns the current value of the screen height.
+        :return: the height of the screen
+        """
+        return self.height
+
+    def to_bytes(self):
+        """
+        Packs the screen into bytes, one row after the other, with the left
+        most pixel of each row in the most significant bit of its first byte.
+        If any pixel is on in the second plane, the second plane follows the
+        first in the same format.
+        :return: the packed screen
+        """
+        width = self.width
+        row_bytes = width // 8
+        rows = self.rows
+        if not max(rows) >> width:
+            return b''.join(row.to_bytes(row_bytes, 'big') for row in rows)
+        row_mask = (1 << width) - 1
+        return b''.join([(row & row_mask).to_bytes(row_bytes, 'big')
+                         for row in rows] +
+                        [(row >> width).to_bytes(row_bytes, 'big')
+                         for row in rows])
+
+    def load_bytes(self, data):
+        """
+        Restores the screen from the output of to_bytes(). The buffer must
+        already be the size the data was packed from. Data with room for a
+        second plane after the first, as in a padded snapshot, is loaded
+        into both planes.
+        :param data: the packed screen
+        """
+        width = self.width
+        row_bytes = width // 8
+        plane_bytes = self.height * row_bytes
+        rows = [int.from_bytes(data[offset:offset + row_bytes], 'big')
+                for offset in range(0, plane_bytes, row_bytes)]
+        if len(data) >= 2 * plane_bytes:
+            rows = [row | (int.from_bytes(
+                data[offset:offset + row_bytes], 'big') << width)
+                for row, offset in zip(rows, range(
+                    plane_bytes, 2 * plane_bytes, row_bytes))]
+        self.rows[:] = rows
+
+    def destroy(self):
+        """
+        Releases the frame buffer. A headless frame buffer holds no external
+        resources, so this does nothing.
+        """
+
+    def resize(self, height, width):
+        """
+        Changes the size of the buffer. All of the pixels are turned off.
+        :param height: the new height of the screen
+        :param width: the new width of the screen
+        """
+        self.height = height
+        self.width = width
+        self.clear_screen()
+
+    def set_extended(self):
+        """
+        Sets the screen mode to extended.
+        """
+        self.resize(SCREEN_HEIGHT[SCREEN_MODE_EXTENDED],
+                    SCREEN_WIDTH[SCREEN_MODE_EXTENDED])
+
+    def set_normal(self):
+        """
+        Sets the screen mode to normal.
+        """
+        self.resize(SCREEN_HEIGHT[SCREEN_MODE_NORMAL],
+                    SCREEN_WIDTH[SCREEN_MODE_NORMAL])
+
+    def scroll_down(self, num_lines, planes=ALL_PLANES):
+        """
+        Scroll the selected planes down by num_lines. The whole buffer is
+        moved with a single slice, and the lines scrolled in at the top are
+        blank.
+
+        :param num_lines: the number of lines to scroll down
+        :param planes: the plane selection mask
+        """
+        num_lines = min(num_lines, self.height)
+        self.merge_planes(
+            [0] * num_lines + self.rows[:self.height - num_lines], planes)
+
+    def scroll_up(self, num_lines, planes=ALL_PLANES):
+        """
+        Scroll the selected planes up by num_lines. The lines scrolled in at
+        the bottom are blank.
+
+        :param num_lines: the number of lines to scroll up
+        :param planes: the plane selection mask
+        """
+        num_lines = min(num_lines, self.height)
+        self.merge_planes(self.rows[num_lines:] + [0] * num_lines, planes)
+
+    def scroll_left(self, planes=ALL_PLANES):
+        """
+        Scroll the selected planes left 4 pixels. The columns scrolled in at
+        the right are blank.
+
+        :param planes: the plane selection mask
+        """
+        width = self.width
+        row_mask = (1 << width) - 1
+        keep = (row_mask | (row_mask << width)) & ~(0xF | (0xF << width))
+        self.merge_planes([(row << 4) & keep for row in self.rows], planes)
+
+    def scroll_right(self, planes=ALL_PLANES):
+        """
+        Scroll the selected planes right 4 pixels. The columns scrolled in at
+        the left are blank.
+
+        :param planes: the plane selection mask
+        """
+        width = self.width
+        keep = ~((0xF << (width - 4)) | (0xF << (2 * width - 4)))
+        self.merge_planes([(row >> 4) & keep for row in self.rows], planes)
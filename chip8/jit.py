@@ -0,0 +1,366 @@
+"""
+A basic-block compiler for the Chip 8 CPU. Straight-line runs of
+instructions that only touch registers, timers and the index register are
+translated into Python source that works on local variables, compiled once,
+and cached by start address. Instructions that need the screen, the
+keyboard, the stack or that write to memory end the block, and are executed
+by the Chip8CPU interpreter instead. Quirky instructions are translated
+for the CPU's quirk profile when the block is compiled, in the same way as
+the interpreter binds them into its dispatch tables.
+"""
+
+import re
+
+from chip8.quirks import (
+    DEFAULT_PROFILE, JUMP_V0, JUMP_VX, PROFILES, SHIFT_VX, SHIFT_VY
+)
+
+# C O N S T A N T S ###########################################################
+
+# The maximum number of instructions to place in a single block
+MAX_BLOCK_LENGTH = 64
+
+# The register variable names used in generated code, indexed by register
+REGISTER_NAMES = ['v{:X}'.format(register) for register in range(0x10)]
+
+# Patterns that find the register and index variables used in generated code
+REGISTER_PATTERN = re.compile(r'\bv([0-9A-F])\b')
+INDEX_PATTERN = re.compile(r'\bi\b')
+
+
+# C L A S S E S ###############################################################
+
+
+class BlockJIT(object):
+    """
+    An optional execution engine for a Chip8CPU. Each call to
+    execute_block() runs one basic block starting at the current program
+    counter, compiling it the first time it is seen. Blocks are dropped
+    whenever the CPU writes to the memory they were compiled from.
+    """
+
+    def __init__(self, cpu, max_block_length=MAX_BLOCK_LENGTH):
+        """
+        Attaches the compiler to a CPU.
+        :param cpu: the Chip8CPU to execute code on
+        :param max_block_length: the most instructions to put in a block
+        """
+        self.cpu = cpu
+        self.max_block_length = max_block_length
+
+        # Compiled blocks keyed by start address. Each entry holds the block
+        # function (or None if the first instruction must be interpreted),
+        # the number of instructions in the block, and its end address.
+        self.blocks = {}
+
+        # The start addresses of the blocks that cover each memory address
+        self.block_index = {}
+
+        cpu.memory.watch(self.invalidate)
+
+    def execute_block(self):
+        """
+        Executes the basic block at the current program counter.
+        :return: the number of instructions executed
+        """
+        cpu = self.cpu
+        pc = cpu.registers.pc
+        try:
+            function, count, _ = self.blocks[pc]
+        except KeyError:
+            function, count, _ = self.compile_block(pc)
+        if function is None:
+            cpu.execute_instruction()
+        else:
+            function(cpu)
+        return count
+
+    def run(self, cycles):
+        """
+        Executes blocks until at least the specified number of instructions
+        have run, or the CPU stops running. Because whole blocks are
+        executed, up to max_block_length - 1 extra instructions may run.
+        :param cycles: the number of instructions to execute
+        :return: the number of instructions executed
+        """
+        cpu = self.cpu
+        executed = 0
+        while executed < cycles and cpu.running:
+            executed += self.execute_block()
+        return executed
+
+    def invalidate(self, address, length=1):
+        """
+        Drops every block compiled from the specified memory range. This is
+        registered as a watcher on the CPU's memory.
+        :param address: the first address written
+        :param length: the number of bytes written
+        """
+        for written in range(address, address + length):
+            for start in self.block_index.pop(written, ()):
+                block = self.blocks.pop(start, None)
+                if block is None:
+                    continue
+                for covered in range(start, block[2]):
+                    starts = self.block_index.get(covered)
+                    if starts is not None:
+                        starts.discard(start)
+
+    def compile_block(self, start):
+        """
+        Translates the instructions at the specified address into a block
+        function, and stores it in the block cache.
+        :param start: the address of the first instruction
+        :return: the cached (function, count, end) entry
+        """
+        memory = self.cpu.memory
+        quirks = self.cpu.quirks
+        lines = []
+        address = start
+        count = 0
+        terminated = False
+        while count < self.max_block_length and address + 1 < len(memory):
+            operand = (memory[address] << 8) | memory[address + 1]
+            translated = translate(operand, address, quirks)
+            if translated is None:
+                break
+            body, terminated = translated
+            lines.extend(body)
+            address += 2
+            count += 1
+            if terminated:
+                break
+
+        if count == 0:
+            block = (None, 1, start + 2)
+        else:
+            if not terminated:
+                lines.append('pc = {:#05x}'.format(address))
+            lines.append('cpu.operand = {:#06x}'.format(
+                (memory[address - 2] << 8) | memory[address - 1]))
+            source = generate_source(start, lines)
+            namespace = {}
+            exec(compile(source, '<chip8 block {:#05x}>'.format(start), 'exec'),
+                 namespace)
+            block = (namespace['block'], count, address)
+
+        self.blocks[start] = block
+        for covered in range(start, block[2]):
+            self.block_index.setdefault(covered, set()).add(start)
+        return block
+
+
+# F U N C T I O N S ###########################################################
+
+
+def generate_source(start, lines):
+    """
+    Wraps translated instructions in a function that loads the registers
+    they use into locals, and stores them back when the block ends.
+    :param start: the address of the first instruction
+    :param lines: the translated instructions
+    :return: the source code of the block function
+    """
+    body = '\n'.join(lines)
+    registers = sorted(set(int(register, 16)
+                           for register in REGISTER_PATTERN.findall(body)))
+    uses_index = INDEX_PATTERN.search(body) is not None
+
+    source = ['# block at {:#05x}'.format(start),
+              'def block(cpu):',
+              '    registers = cpu.registers',
+              '    v = cpu.v',
+              '    memory = cpu.memory']
+    if uses_index:
+        source.append('    i = registers.index')
+    for register in registers:
+        source.append('    {} = v[{}]'.format(REGISTER_NAMES[register],
+                                             register))
+    source.extend('    ' + line for line in lines)
+    for register in registers:
+        source.append('    v[{}] = {}'.format(register,
+                                             REGISTER_NAMES[register]))
+    if uses_index:
+        source.append('    registers.index = i')
+    source.append('    registers.pc = pc')
+    return '\n'.join(source) + '\n'
+
+
+def translate(operand, address, quirks=PROFILES[DEFAULT_PROFILE]):
+    """
+    Translates a single instruction into Python statements that operate on
+    local register variables (v0 - vF and i). The statements mirror the
+    Chip8CPU handler that the quirk profile binds for the instruction
+    exactly, including the order in which the target register and VF are
+    written. Instructions that change the program counter assign the next
+    address to the local pc, and end the block.
+    :param operand: the instruction to translate
+    :param address: the address of the instruction
+    :param quirks: the chip8.quirks.Quirks of the CPU
+    :return: a (statements, ends_block) tuple, or None if the instruction
+        must be executed by the interpreter
+    """
+    operation = (operand & 0xF000) >> 12
+    vx = REGISTER_NAMES[(operand & 0x0F00) >> 8]
+    vy = REGISTER_NAMES[(operand & 0x00F0) >> 4]
+    x = (operand & 0x0F00) >> 8
+    nn = operand & 0x00FF
+    nnn = operand & 0x0FFF
+    next_address = address + 2
+    skip_address = '{:#05x}'.format(address + 4)
+    if quirks.xochip:
+        # The skipped instruction is 4 bytes long if it is an F000 nnnn. It
+        # lies outside the block, so it is checked when the skip is taken.
+        skip_address = \
+            '({:#05x} if memory[{:#05x}] != 0xF0 or memory[{:#05x}] ' \
+            'else {:#05x})'.format(address + 4, address + 2, address + 3,
+                                   address + 6)
+
+    if operation == 0x1:
+        return ['pc = {:#05x}'.format(nnn)], True
+
+    if operation == 0x3:
+        return ['pc = {} if {} == {:#04x} else {:#05x}'.format(
+            skip_address, vx, nn, next_address)], True
+
+    if operation == 0x4:
+        return ['pc = {} if {} != {:#04x} else {:#05x}'.format(
+            skip_address, vx, nn, next_address)], True
+
+    if operation == 0x5 and operand & 0x000F == 0:
+        return ['pc = {} if {} == {} else {:#05x}'.format(
+            skip_address, vx, vy, next_address)], True
+
+    if operation == 0x6:
+        return ['{} = {:#04x}'.format(vx, nn)], False
+
+    if operation == 0x7:
+        return ['t = {} + {:#04x}'.format(vx, nn),
+                '{} = t if t < 256 else t - 256'.format(vx)], False
+
+    if operation == 0x8:
+        return translate_logical(operand, vx, vy, quirks)
+
+    if operation == 0x9 and operand & 0x000F == 0:
+        return ['pc = {} if {} != {} else {:#05x}'.format(
+            skip_address, vx, vy, next_address)], True
+
+    if operation == 0xA:
+        return ['i = {:#05x}'.format(nnn)], False
+
+    if operation == 0xB:
+        if quirks.jump == JUMP_V0:
+            return ['pc = v0 + {:#05x}'.format(nnn)], True
+        if quirks.jump == JUMP_VX:
+            return ['pc = {} + {:#05x}'.format(vx, nnn)], True
+        return ['pc = i + {:#05x}'.format(nnn)], True
+
+    if operation == 0xC:
+        return ['{} = {:#04x} & cpu.random.randint(0, 255)'.format(vx, nn)], \
+            False
+
+    if operation == 0xF:
+        return translate_misc(operand, vx, x, quirks)
+
+    return None
+
+
+def translate_logical(operand, vx, vy, quirks):
+    """
+    Translates the 8xyn register to register instructions.
+    :param operand: the instruction to translate
+    :param vx: the name of the x register variable
+    :param vy: the name of the y register variable
+    :param quirks: the chip8.quirks.Quirks of the CPU
+    :return: a (statements, ends_block) tuple, or None
+    """
+    operation = operand & 0x000F
+    if operation == 0x0:
+        return ['{} = {}'.format(vx, vy)], False
+    reset_flag = ['vF = 0'] if quirks.reset_flag else []
+    if operation == 0x1:
+        return ['{} |= {}'.format(vx, vy)] + reset_flag, False
+    if operation == 0x2:
+        return ['{} &= {}'.format(vx, vy)] + reset_flag, False
+    if operation == 0x3:
+        return ['{} ^= {}'.format(vx, vy)] + reset_flag, False
+    if operation == 0x4:
+        return ['t = {} + {}'.format(vx, vy),
+                '{} = t - 256 if t > 255 else t'.format(vx),
+                'vF = 1 if t > 255 else 0'], False
+    if operation == 0x5:
+        return ['c = 1 if {} > {} else 0'.format(vx, vy),
+                't = {0} - {1} if c else 256 + {0} - {1}'.format(vx, vy),
+                'vF = c',
+                '{} = t & 0xFF'.format(vx)], False
+    if operation == 0x6:
+        if quirks.shift == SHIFT_VY:
+            return ['b = {} & 0x1'.format(vy),
+                    '{} = {} >> 1'.format(vx, vy),
+                    'vF = b'], False
+        if quirks.shift == SHIFT_VX:
+            return ['b = {} & 0x1'.format(vx),
+                    '{} = {} >> 1'.format(vx, vx),
+                    'vF = b'], False
+        return ['b = {} & 0x1'.format(vx),
+                '{} = {} >> 1'.format(vy, vx),
+                'vF = b'], False
+    if operation == 0x7:
+        return ['c = 1 if {} > {} else 0'.format(vy, vx),
+                't = {1} - {0} if c else 256 + {1} - {0}'.format(vx, vy),
+                'vF = c',
+                '{} = t & 0xFF'.format(vx)], False
+    if operation == 0xE:
+        if quirks.shift == SHIFT_VY:
+            return ['b = ({} & 0x80) >> 7'.format(vy),
+                    '{} = ({} << 1) & 0xFF'.format(vx, vy),
+                    'vF = b'], False
+        if quirks.shift == SHIFT_VX:
+            return ['b = ({} & 0x80) >> 7'.format(vx),
+                    '{} = ({} << 1) & 0xFF'.format(vx, vx),
+                    'vF = b'], False
+        return ['b = ({} & 0x80) >> 7'.format(vx),
+                '{} = ({} << 1) & 0xFF'.format(vy, vx),
+                'vF = b'], False
+    return None
+
+
+def translate_misc(operand, vx, x, quirks):
+    """
+    Translates the Fxnn instructions that do not write to memory or wait
+    for the keyboard.
+    :param operand: the instruction to translate
+    :param vx: the name of the x register variable
+    :param x: the x register number
+    :param quirks: the chip8.quirks.Quirks of the CPU
+    :return: a (statements, ends_block) tuple, or None
+    """
+    operation = operand & 0x00FF
+    if operation == 0x07:
+        return ['{} = registers.delay'.format(vx)], False
+    if operation == 0x15:
+        return ['registers.delay = {}'.format(vx)], False
+    if operation == 0x18:
+        return ['registers.sound = {}'.format(vx)], False
+    if operation == 0x1E:
+        return ['i = (i + {}) & 0xFFFF'.format(vx)], False
+    if operation == 0x29:
+        return ['i = {} * 5'.format(vx)], False
+    if operation == 0x30:
+        return ['i = {} * 10 + 80'.format(vx)], False
+    if operation == 0x65:
+        statements = ['{} = memory[i + {}]'.format(REGISTER_NAMES[counter],
+                                                   counter)
+                      for counter in range(x + 1)]
+        if quirks.increment:
+            statements.append('i = (i + {}) & 0xFFFF'.format(x + 1))
+        return statements, False
+    if operation == 0x75:
+        return ['registers.rpl[{}] = {}'.format(counter,
+                                                REGISTER_NAMES[counter])
+                for counter in range(x + 1)], False
+    if operation == 0x85:
+        return ['{} = registers.rpl[{}]'.format(REGISTER_NAMES[counter],
+                                                counter)
+                for counter in range(x + 1)], False
+    return None
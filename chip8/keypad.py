@@ -0,0 +1,90 @@
+"""
+The Chip 8 keypad. The state of the 16 keys is held as a 16-bit mask, with
+bit n set while key n is held down, so that an instruction can test a key
+with a single AND. A PygameKeypad builds the mask up from pygame keyboard
+events as they arrive, rather than by sampling the whole keyboard on every
+poll. pygame is only imported when a PygameKeypad is created, so headless
+code can use the mask helpers without it.
+"""
+
+from chip8.config import KEY_MAPPING
+
+# C O N S T A N T S ###########################################################
+
+# The mask with no keys pressed
+NO_KEYS = 0
+
+
+# C L A S S E S ###############################################################
+
+
+class PygameKeypad(object):
+    """
+    Reads the keypad from the pygame event queue of a windowed frontend.
+    """
+
+    def __init__(self, mapping=KEY_MAPPING):
+        """
+        Imports pygame and resolves the key names to key codes.
+        :param mapping: the name of the pygame key for each Chip 8 key
+        """
+        import pygame
+
+        self.display = pygame.display
+        self.event = pygame.event
+        self.key_down = pygame.KEYDOWN
+        self.key_up = pygame.KEYUP
+        self.quit = pygame.QUIT
+        self.key_bits = {getattr(pygame, 'K_' + name): 1 << keyval
+                         for keyval, name in mapping.items()}
+
+    def poll(self, keys):
+        """
+        Applies the events waiting in the pygame event queue to a keypad
+        mask. When no pygame display has been initialized the mask is left
+        as it is.
+
+        :param keys: the keypad mask before the events
+        :return: the new keypad mask, and whether the window was closed
+        """
+        if not self.display.get_init():
+            return keys, False
+        return self.gather(keys, self.event.get())
+
+    def gather(self, keys, events):
+        """
+        Applies pygame events to a keypad mask. Key presses set the key's
+        bit, key releases clear it, and keys that are not on the keypad are
+        ignored.
+
+        :param keys: the keypad mask before the events
+        :param events: the pygame events to apply
+        :return: the new keypad mask, and whether a QUIT event was seen
+        """
+        closed = False
+        key_bits = self.key_bits
+        for pygame_event in events:
+            if pygame_event.type == self.key_down:
+                keys |= key_bits.get(pygame_event.key, NO_KEYS)
+            elif pygame_event.type == self.key_up:
+                keys &= ~key_bits.get(pygame_event.key, NO_KEYS)
+            elif pygame_event.type == self.quit:
+                closed = True
+        return keys, closed
+
+
+# F U N C T I O N S ###########################################################
+
+
+def keys_to_mask(pressed):
+    """
+    Builds a keypad mask from the state of each key.
+
+    :param pressed: 16 booleans, indexed by key value
+    :return: the keypad mask
+    """
+    keys = NO_KEYS
+    for keyval, is_pressed in enumerate(pressed):
+        if is_pressed:
+            keys |= 1 << keyval
+    return keys
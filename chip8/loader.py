@@ -0,0 +1,91 @@
+"""
+Loads ROM and font images for the Chip 8 CPU. Files are read through mmap
+and hashed with SHA-1 straight from the mapping, and the images are kept in
+a process-wide cache keyed by their digest. A process therefore reads each
+file once, and holds one copy of each distinct image no matter how many
+CPUs it creates or how many paths refer to the same contents.
+"""
+
+import hashlib
+import mmap
+import os
+
+# C O N S T A N T S ###########################################################
+
+# Loaded images keyed by the SHA-1 hex digest of their contents
+IMAGE_CACHE = {}
+
+# Digests keyed by (real path, size, modification time), so that a file that
+# has already been loaded is neither read nor hashed again
+DIGEST_CACHE = {}
+
+
+# F U N C T I O N S ###########################################################
+
+
+def load_image(path):
+    """
+    Returns the contents of a ROM or font file, loading it into the cache
+    if it has not been seen before, or if it has changed on disk.
+
+    :param path: the path to the file
+    :return: the contents of the file as bytes
+    """
+    return IMAGE_CACHE[load_digest(path)]
+
+
+def load_digest(path):
+    """
+    Loads a file into the cache, and returns the key it is cached under.
+
+    :param path: the path to the file
+    :return: the SHA-1 hex digest of the file's contents
+    """
+    status = os.stat(path)
+    key = (os.path.realpath(path), status.st_size, status.st_mtime_ns)
+    digest = DIGEST_CACHE.get(key)
+    if digest is not None:
+        return digest
+
+    with open(path, 'rb') as image_file:
+        if status.st_size == 0:
+            digest = cache_image(b'')
+        else:
+            with mmap.mmap(image_file.fileno(), 0,
+                           access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    digest = cache_image(view)
+    DIGEST_CACHE[key] = digest
+    return digest
+
+
+def cache_image(view):
+    """
+    Adds an image to the cache, unless an identical one is already there.
+
+    :param view: a bytes-like object holding the image
+    :return: the SHA-1 hex digest of the image
+    """
+    digest = hashlib.sha1(view).hexdigest()
+    if digest not in IMAGE_CACHE:
+        IMAGE_CACHE[digest] = bytes(view)
+    return digest
+
+
+def prewarm(paths):
+    """
+    Loads every file into the cache. Intended for use as a process pool
+    initializer, so that each worker reads the shared images up front.
+
+    :param paths: the paths of the files to load
+    :return: the digests of the files, in order
+    """
+    return [load_digest(path) for path in paths]
+
+
+def clear_cache():
+    """
+    Empties the image cache.
+    """
+    IMAGE_CACHE.clear()
+    DIGEST_CACHE.clear()
@@ -1,47 +1,93 @@
-class Memory(object):
+from chip8.config import MAX_MEMORY
 
-    def __init__(self):
+
+class Memory(bytearray):
+    """
+    The main memory of the Chip 8. Memory is a bytearray, so the CPU fetches
+    instructions by indexing it directly, without any bounds checks beyond
+    bytearray's own. The store and fetch helpers check their bounds, read
+    through zero-copy memoryviews and write with slice assignments. Every
+    store helper notifies the watchers registered for the range it wrote.
+    """
+
+    __slots__ = ('watchers',)
+
+    def __init__(self, size=MAX_MEMORY):
         """Allocates 4KB (4096 bytes) for program memory."""
-        self._mem = bytearray(0x1000)
+        bytearray.__init__(self, size)
+        self.watchers = []
 
     def store_byte(self, addr, data):
         """Stores 1 byte of data at the given address."""
-        if addr < 0 or addr >= len(self._mem):
+        if addr < 0 or addr >= len(self):
             raise ValueError
-        self._mem[addr] = data & 0xff # 11111111
+        self[addr] = data & 0xff # 11111111
+        self.notify(addr, 1)
         return True
 
     def fetch_byte(self, addr):
         """Fetches 1 byte of data from the given address."""
-        if addr < 0 or addr >= len(self._mem):
+        if addr < 0 or addr >= len(self):
             raise ValueError
-        return self._mem[addr]
+        return self[addr]
 
     def store_word(self, addr, data):
         """Stores word (2 bytes) of data at the given address."""
-        if addr < 0 or addr + 1 >= len(self._mem):
+        if addr < 0 or addr + 1 >= len(self):
             raise ValueError
-        self._mem[addr] = (data >> 8) & 0xff
-        self._mem[addr + 1] = data & 0xff
+        self[addr] = (data >> 8) & 0xff
+        self[addr + 1] = data & 0xff
+        self.notify(addr, 2)
         return True
 
     def fetch_word(self, addr):
         """Fetches word (2 bytes) of data from the given address."""
-        if addr < 0 or addr + 1 >= len(self._mem):
+        if addr < 0 or addr + 1 >= len(self):
             raise ValueError
-        return (self._mem[addr] << 8 | self._mem[addr + 1])
+        return (self[addr] << 8 | self[addr + 1])
 
     def store_many(self, addr, data):
-        """Stores many bytes of data at the given address."""
-        if addr < 0 or addr + len(data) - 1 >= len(self._mem):
+        """
+        Stores many bytes of data at the given address with a single slice
+        assignment. The data must be bytes-like, or hold values from 0 to 255.
+        """
+        if addr < 0 or addr + len(data) - 1 >= len(self):
             raise ValueError
-        for i, byte in enumerate(data):
-            self._mem[addr + i] = byte & 0xff
+        self[addr:addr + len(data)] = data
+        self.notify(addr, len(data))
         return True
 
     def fetch_many(self, addr, length):
-        """Fetched many bytes of data from the given address."""
-        if addr < 0 or addr + length - 1 >= len(self._mem):
+        """
+        Fetches many bytes of data from the given address, as a memoryview
+        onto the memory rather than a copy.
+        """
+        if addr < 0 or addr + length - 1 >= len(self):
             raise ValueError
-        return self._mem[addr:addr + length]
+        return memoryview(self)[addr:addr + length]
+
+    def watch(self, callback, start=0, end=None):
+        """
+        Registers a callback to be notified with (address, length) whenever
+        a store helper writes to the range [start, end). Returns a handle
+        that can be passed to unwatch.
+        """
+        if end is None:
+            end = len(self)
+        watcher = (start, end, callback)
+        self.watchers.append(watcher)
+        return watcher
+
+    def unwatch(self, watcher):
+        """Removes a watcher returned by watch."""
+        self.watchers.remove(watcher)
 
+    def notify(self, addr, length):
+        """
+        Notifies the watchers whose ranges overlap a write. Code that writes
+        to memory directly, rather than through the store helpers, must call
+        this itself.
+        """
+        for start, end, callback in self.watchers:
+            if addr < end and addr + length > start:
+                callback(addr, length)
@@ -0,0 +1,281 @@
+"""
+A threaded emulator pipeline. The CPU runs in a worker thread against a
+headless frame buffer that publishes an immutable, packed copy of itself to a
+bounded queue at the end of every frame. The main thread only gathers pygame
+events and presents the frames it takes from the queue, so a slow present
+never stalls instruction execution. When the presenter falls behind, the
+oldest queued frame is dropped to make room for the newest, so emulation
+keeps its own pace and the presenter skips frames instead.
+"""
+
+from collections import deque, namedtuple
+from threading import Condition, Thread
+
+from chip8.config import DELAY_INTERVAL
+from chip8.framebuffer import (
+    Framebuffer, SCREEN_MODE_EXTENDED, SCREEN_WIDTH
+)
+
+# C O N S T A N T S ###########################################################
+
+# The number of frames the queue holds before it starts dropping them
+QUEUE_SIZE = 3
+
+# A published frame: its sequence number, its size and the output of
+# Framebuffer.to_bytes()
+Frame = namedtuple('Frame', ['number', 'width', 'height', 'pixels'])
+
+
+# C L A S S E S ###############################################################
+
+
+class FrameQueue(object):
+    """
+    A bounded queue of frames that drops the oldest frame when a new one is
+    put on a full queue, so that putting never blocks.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        """
+        Creates an empty queue.
+        :param maxsize: the number of frames to hold
+        """
+        self.frames = deque()
+        self.maxsize = maxsize
+        self.condition = Condition()
+        self.closed = False
+        self.published = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, frame):
+        """
+        Adds a frame, dropping the oldest frame if the queue is full.
+        :param frame: the Frame to add
+        """
+        with self.condition:
+            if len(self.frames) == self.maxsize:
+                self.frames.popleft()
+                self.dropped += 1
+            self.frames.append(frame)
+            self.published += 1
+            self.max_depth = max(self.max_depth, len(self.frames))
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Takes the oldest frame, waiting for one if the queue is empty.
+        :param timeout: the most seconds to wait, or None to wait until a
+            frame arrives or the queue is closed
+        :return: the Frame, or None if none arrived in time or the queue is
+            closed and empty
+        """
+        with self.condition:
+            if not self.frames and not self.closed:
+                self.condition.wait(timeout)
+            if not self.frames:
+                return None
+            return self.frames.popleft()
+
+    def close(self):
+        """
+        Marks the queue as closed, waking any thread waiting on get(). Frames
+        already queued can still be taken.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def is_finished(self):
+        """
+        Returns whether the queue is closed and every frame has been taken.
+        :return: True if no more frames will be returned
+        """
+        with self.condition:
+            return self.closed and not self.frames
+
+    def get_depth(self):
+        """
+        Returns the number of frames waiting to be presented.
+        :return: the depth of the queue
+        """
+        return len(self.frames)
+
+
+class FramePublisher(Framebuffer):
+    """
+    A headless frame buffer that publishes a packed copy of itself to a
+    FrameQueue every time it is updated, which the CPU does once per frame.
+    """
+
+    __slots__ = ('frames', 'number')
+
+    def __init__(self, frames, height, width):
+        """
+        Creates a blank publisher.
+        :param frames: the FrameQueue to publish to
+        :param height: the height of the screen
+        :param width: the width of the screen
+        """
+        Framebuffer.__init__(self, height, width)
+        self.frames = frames
+        self.number = 0
+
+    def update(self):
+        """
+        Publishes the current contents of the buffer.
+        """
+        self.frames.put(Frame(self.number, self.width, self.height,
+                              self.to_bytes()))
+        self.number += 1
+
+
+class Pipeline(object):
+    """
+    Runs a Chip8CPU in a worker thread, and presents its frames on a screen
+    from the calling thread. While the pipeline runs, the CPU's screen is
+    replaced by a FramePublisher, and its poll_input() is shadowed so that
+    the worker never touches pygame; the CPU's keypad is polled by the
+    calling thread instead.
+    """
+
+    def __init__(self, cpu, screen, queue_size=QUEUE_SIZE):
+        """
+        Sets up the pipeline, without starting the worker.
+        :param cpu: the Chip8CPU to run
+        :param screen: the Display (or Framebuffer) to present frames on
+        :param queue_size: the number of frames to queue before dropping
+        """
+        self.cpu = cpu
+        self.screen = screen
+        self.frames = FrameQueue(queue_size)
+        self.worker = None
+        self.original_screen = None
+        self.executed = 0
+        self.presented = 0
+        self.error = None
+
+    def start(self, cycles=None, uncapped=False):
+        """
+        Starts running the CPU in the worker thread.
+        :param cycles: the number of instructions to execute, or None to run
+            until the CPU stops
+        :param uncapped: whether to run frames without pacing them
+        """
+        cpu = self.cpu
+        publisher = FramePublisher(self.frames, self.screen.get_height(),
+                                   self.screen.get_width())
+        publisher.load_bytes(self.screen.to_bytes())
+        self.original_screen = cpu.screen
+        cpu.screen = publisher
+        cpu.poll_input = self.poll_input
+        self.worker = Thread(target=self.emulate, args=(cycles, uncapped),
+                             name='chip8-cpu')
+        self.worker.daemon = True
+        self.worker.start()
+
+    def emulate(self, cycles, uncapped):
+        """
+        The body of the worker thread. Any exception raised by the CPU is
+        kept, and raised again from run() on the calling thread.
+        :param cycles: the number of instructions to execute
+        :param uncapped: whether to run frames without pacing them
+        """
+        try:
+            self.executed = self.cpu.run(cycles, uncapped)
+        except Exception as exception:
+            self.error = exception
+        finally:
+            self.frames.close()
+
+    def poll_input(self):
+        """
+        Stands in for the CPU's poll_input() on the worker thread. The keys
+        and the running flag are set from the presenting thread, so there is
+        nothing to do.
+        """
+
+    def handle_events(self):
+        """
+        Polls the CPU's keypad into its keys, and stops the CPU if the window
+        was closed. Does nothing if the CPU has no keypad.
+        """
+        keypad = self.cpu.keypad
+        if keypad is None:
+            return
+        keys, closed = keypad.poll(self.cpu.keys)
+        self.cpu.keys = keys
+        if closed:
+            self.cpu.running = False
+
+    def present(self, frame):
+        """
+        Presents a frame on the screen, switching the screen's mode first if
+        the frame was published in the other one.
+        :param frame: the Frame to present
+        """
+        screen = self.screen
+        if frame.width != screen.get_width():
+            if frame.width == SCREEN_WIDTH[SCREEN_MODE_EXTENDED]:
+                screen.set_extended()
+            else:
+                screen.set_normal()
+        screen.load_bytes(frame.pixels)
+        screen.update()
+        self.presented += 1
+
+    def run(self, cycles=None, uncapped=False):
+        """
+        Runs the CPU in the worker thread, and presents its frames until it
+        stops. While no frame arrives, an update the screen deferred because
+        of its frame rate cap is flushed, and once the CPU stops the last one
+        is presented at once.
+        :param cycles: the number of instructions to execute, or None to run
+            until the CPU stops
+        :param uncapped: whether to run frames without pacing them
+        :return: the number of instructions executed
+        """
+        timeout = DELAY_INTERVAL / 1000.0
+        self.start(cycles, uncapped)
+        try:
+            while not self.frames.is_finished():
+                self.handle_events()
+                frame = self.frames.get(timeout)
+                if frame is not None:
+                    self.present(frame)
+                else:
+                    self.screen.flush()
+            self.screen.flush(force=True)
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+        return self.executed
+
+    def stop(self):
+        """
+        Stops the CPU if it is still running, waits for the worker thread to
+        finish, and gives the CPU back its own screen and poll_input().
+        """
+        if self.worker is None:
+            return
+        if self.worker.is_alive():
+            self.cpu.running = False
+        self.worker.join()
+        self.worker = None
+        del self.cpu.poll_input
+        self.cpu.screen = self.original_screen
+
+    def get_stats(self):
+        """
+        Returns the pipeline's counters.
+        :return: a dict of the current and largest queue depth, and the
+            number of frames published, dropped and presented
+        """
+        return {
+            'depth': self.frames.get_depth(),
+            'max_depth': self.frames.max_depth,
+            'published': self.frames.published,
+            'dropped': self.frames.dropped,
+            'presented': self.presented,
+        }
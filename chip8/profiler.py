@@ -0,0 +1,261 @@
+"""
+An opt-in profiler for the Chip 8 CPU. Enabling it swaps the CPU's dispatch
+tables for copies whose entries count and time every call, and puts a
+timing proxy in front of the screen. Disabling it puts the original tables
+and screen back, so a CPU that is not being profiled runs exactly the same
+code as one that never was.
+"""
+
+import atexit
+import json
+import sys
+
+from time import perf_counter
+
+# C O N S T A N T S ###########################################################
+
+# The labels for the top level operations. The 0x8, 0xE and 0xF groups are
+# not timed at this level, since their routines are timed individually.
+OPERATION_LABELS = {
+    0x0: '0nnn', 0x1: '1nnn', 0x2: '2nnn', 0x3: '3xnn', 0x4: '4xnn',
+    0x5: '5xy0', 0x6: '6xnn', 0x7: '7xnn', 0x9: '9xy0', 0xA: 'Annn',
+    0xB: 'Bnnn', 0xC: 'Cxnn', 0xD: 'Dxyn',
+}
+
+# The screen methods that are timed
+SCREEN_METHODS = (
+    'draw_pixel', 'draw_sprite', 'clear_screen', 'scroll_down', 'scroll_up',
+    'scroll_left', 'scroll_right', 'update',
+)
+
+# The number of addresses to include in reports
+REPORT_ADDRESSES = 20
+
+
+# C L A S S E S ###############################################################
+
+
+class Profiler(object):
+    """
+    Collects per-opcode, per-address and per-screen-call statistics for a
+    Chip8CPU. Each statistic is a [count, seconds] pair. Time spent in the
+    screen is also included in the time of the instruction that called it,
+    so a draw-bound ROM shows up both under Dxyn and under draw_sprite.
+    Instructions executed inside BlockJIT blocks are not profiled.
+    """
+
+    def __init__(self, cpu):
+        """
+        Attaches the profiler to a CPU, without enabling it.
+        :param cpu: the Chip8CPU to profile
+        """
+        self.cpu = cpu
+        self.enabled = False
+        self.opcodes = {}
+        self.addresses = {}
+        self.screen_calls = {}
+        self.original_tables = None
+        self.original_screen = None
+        self.original_skip_idle = None
+
+    def enable(self):
+        """
+        Starts profiling, by swapping in timed dispatch tables and a timed
+        screen. The decode cache is cleared, since it holds the handlers
+        from the untimed tables. Idle loops are not skipped while profiling,
+        so that the counts include every instruction the CPU counts.
+        """
+        if self.enabled:
+            return
+        cpu = self.cpu
+        self.original_tables = (
+            cpu.operation_lookup, cpu.logical_operation_lookup,
+            cpu.keyboard_routine_lookup, cpu.misc_routine_lookup)
+        self.original_screen = cpu.screen
+
+        cpu.operation_lookup = tuple(
+            self.timed(OPERATION_LABELS[operation], routine)
+            if operation in OPERATION_LABELS else routine
+            for operation, routine in enumerate(cpu.operation_lookup))
+        cpu.logical_operation_lookup = self.timed_table(
+            '8xy{:X}', cpu.logical_operation_lookup)
+        cpu.keyboard_routine_lookup = self.timed_table(
+            'Ex{:02X}', cpu.keyboard_routine_lookup)
+        cpu.misc_routine_lookup = self.timed_table(
+            'Fx{:02X}', cpu.misc_routine_lookup)
+        cpu.screen = TimedScreen(cpu.screen, self.screen_calls)
+        cpu.decode_cache.clear()
+        self.original_skip_idle = cpu.skip_idle
+        cpu.skip_idle = False
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stops profiling, and restores the original dispatch tables, screen
+        and idle loop skipping. The statistics collected so far are kept.
+        """
+        if not self.enabled:
+            return
+        cpu = self.cpu
+        (cpu.operation_lookup, cpu.logical_operation_lookup,
+         cpu.keyboard_routine_lookup, cpu.misc_routine_lookup) = \
+            self.original_tables
+        cpu.screen = self.original_screen
+        cpu.skip_idle = self.original_skip_idle
+        cpu.decode_cache.clear()
+        self.enabled = False
+
+    def reset(self):
+        """
+        Discards the statistics collected so far.
+        """
+        self.opcodes.clear()
+        self.addresses.clear()
+        self.screen_calls.clear()
+
+    def timed_table(self, label_format, table):
+        """
+        Wraps every routine in a dispatch table.
+        :param label_format: the format of the label, given the index
+        :param table: the dispatch table to wrap
+        :return: a dispatch table of wrapped routines
+        """
+        return tuple(
+            None if routine is None
+            else self.timed(label_format.format(operation), routine)
+            for operation, routine in enumerate(table))
+
+    def timed(self, label, routine):
+        """
+        Wraps a routine so that each call is counted and timed under the
+        label, and under the address of the instruction being executed.
+        :param label: the opcode family of the routine
+        :param routine: the unbound routine to wrap
+        :return: the wrapped routine
+        """
+        registers = self.cpu.registers
+        addresses = self.addresses
+        statistic = self.opcodes.setdefault(label, [0, 0.0])
+
+        def timed_routine(cpu):
+            address = registers.pc - 2
+            start = perf_counter()
+            routine(cpu)
+            elapsed = perf_counter() - start
+            statistic[0] += 1
+            statistic[1] += elapsed
+            try:
+                address_statistic = addresses[address]
+            except KeyError:
+                address_statistic = addresses[address] = [0, 0.0]
+            address_statistic[0] += 1
+            address_statistic[1] += elapsed
+
+        return timed_routine
+
+    def to_dict(self):
+        """
+        Returns the statistics in a form that can be serialized as JSON.
+        Empty opcode families are left out, and addresses are formatted as
+        hex strings.
+        :return: a dict of opcodes, addresses and screen statistics
+        """
+        return {
+            'opcodes': {label: {'count': count, 'seconds': seconds}
+                        for label, (count, seconds) in self.opcodes.items()
+                        if count},
+            'addresses': {'{:#05x}'.format(address):
+                          {'count': count, 'seconds': seconds}
+                          for address, (count, seconds)
+                          in self.addresses.items()},
+            'screen': {method: {'count': count, 'seconds': seconds}
+                       for method, (count, seconds)
+                       in self.screen_calls.items()},
+        }
+
+    def report(self, addresses=REPORT_ADDRESSES):
+        """
+        Formats the statistics as a text report, with each section sorted by
+        total time, slowest first.
+        :param addresses: the number of addresses to include
+        :return: the report
+        """
+        lines = []
+        sections = (
+            ('opcode', self.opcodes, str, None),
+            ('screen', self.screen_calls, str, None),
+            ('address', self.addresses, '{:#05x}'.format, addresses),
+        )
+        for title, statistics, formatter, limit in sections:
+            rows = sorted(((seconds, count, key)
+                           for key, (count, seconds) in statistics.items()
+                           if count), reverse=True)
+            if limit is not None:
+                rows = rows[:limit]
+            lines.append('{:<10} {:>12} {:>12} {:>10}'.format(
+                title, 'count', 'seconds', 'us/call'))
+            for seconds, count, key in rows:
+                lines.append('{:<10} {:>12} {:>12.6f} {:>10.3f}'.format(
+                    formatter(key), count, seconds, seconds / count * 1e6))
+            lines.append('')
+        return '\n'.join(lines)
+
+    def dump(self, path=None):
+        """
+        Writes the statistics out. If a path is given they are written to it
+        as JSON; otherwise the text report is written to stderr.
+        :param path: the file to write JSON to, or None
+        """
+        if path is None:
+            sys.stderr.write(self.report())
+            return
+        with open(path, 'w') as output:
+            json.dump(self.to_dict(), output, indent=2, sort_keys=True)
+
+    def dump_at_exit(self, path=None):
+        """
+        Arranges for dump() to be called when the interpreter exits.
+        :param path: the file to write JSON to, or None for a text report
+        """
+        atexit.register(self.dump, path)
+
+
+class TimedScreen(object):
+    """
+    A proxy that times the drawing and presentation calls made on a screen,
+    and passes everything else straight through.
+    """
+
+    def __init__(self, screen, statistics):
+        """
+        Wraps a screen.
+        :param screen: the Framebuffer or Display to wrap
+        :param statistics: the dict to record [count, seconds] pairs in
+        """
+        self.screen = screen
+        for method in SCREEN_METHODS:
+            setattr(self, method, self.timed(
+                method, getattr(screen, method), statistics))
+
+    @staticmethod
+    def timed(name, method, statistics):
+        """
+        Wraps a screen method so that each call is counted and timed.
+        :param name: the name to record the calls under
+        :param method: the bound method to wrap
+        :param statistics: the dict to record the calls in
+        :return: the wrapped method
+        """
+        statistic = statistics.setdefault(name, [0, 0.0])
+
+        def timed_method(*args, **kwargs):
+            start = perf_counter()
+            result = method(*args, **kwargs)
+            statistic[0] += 1
+            statistic[1] += perf_counter() - start
+            return result
+
+        return timed_method
+
+    def __getattr__(self, name):
+        return getattr(self.screen, name)
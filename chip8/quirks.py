@@ -0,0 +1,76 @@
+"""
+Quirk profiles. The Chip 8 interpreters that ROMs were written for disagree
+on a handful of instructions, so a ROM only runs correctly with the
+behaviour it expects. A profile names one choice for each of them; the CPU
+binds the matching handler variants into its dispatch tables when it is
+constructed, so running under any profile costs the same.
+
+    shift      - which registers 8xy6 and 8xyE shift:
+                 SHIFT_LEGACY: Vy = Vx shifted (this emulator's original
+                               behaviour)
+                 SHIFT_VY:     Vx = Vy shifted (COSMAC VIP, XO-CHIP)
+                 SHIFT_VX:     Vx = Vx shifted, Vy ignored (SCHIP)
+    jump       - what Bnnn adds nnn to:
+                 JUMP_INDEX: the index register (this emulator's original
+                             behaviour)
+                 JUMP_V0:    V0 (COSMAC VIP, XO-CHIP)
+                 JUMP_VX:    Vx, where x is the top nibble of nnn (SCHIP)
+    increment  - whether Fx55 and Fx65 leave the index register pointing
+                 after the last register stored or loaded
+    clip       - whether sprites are clipped at the screen edges, rather
+                 than wrapping around to the other side
+    reset_flag - whether 8xy1, 8xy2 and 8xy3 clear VF
+    xochip     - whether the XO-CHIP extensions are available: 64 KB of
+                 memory, two bitplanes, the F000 nnnn long index load, the
+                 5xy2 and 5xy3 register range stores and loads, 00Dn
+                 scrolling, and the audio pattern buffer
+"""
+
+from collections import namedtuple
+
+# C O N S T A N T S ###########################################################
+
+SHIFT_LEGACY = 'legacy'
+SHIFT_VY = 'vy'
+SHIFT_VX = 'vx'
+
+JUMP_INDEX = 'index'
+JUMP_V0 = 'v0'
+JUMP_VX = 'vx'
+
+Quirks = namedtuple(
+    'Quirks', ['shift', 'jump', 'increment', 'clip', 'reset_flag', 'xochip'])
+
+# The profiles by name
+PROFILES = {
+    'legacy': Quirks(shift=SHIFT_LEGACY, jump=JUMP_INDEX, increment=False,
+                     clip=False, reset_flag=False, xochip=False),
+    'chip8': Quirks(shift=SHIFT_VY, jump=JUMP_V0, increment=True, clip=True,
+                    reset_flag=True, xochip=False),
+    'schip': Quirks(shift=SHIFT_VX, jump=JUMP_VX, increment=False,
+                    clip=True, reset_flag=False, xochip=False),
+    'xochip': Quirks(shift=SHIFT_VY, jump=JUMP_V0, increment=True,
+                     clip=False, reset_flag=False, xochip=True),
+}
+
+# The profile used when none is chosen, which keeps the behaviour this
+# emulator has always had
+DEFAULT_PROFILE = 'legacy'
+
+
+# F U N C T I O N S ###########################################################
+
+
+def get_quirks(profile):
+    """
+    Looks up a quirk profile.
+
+    :param profile: the name of a profile in PROFILES, or a Quirks
+    :return: the Quirks
+    """
+    if isinstance(profile, Quirks):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError("Unknown quirk profile: {}".format(profile))
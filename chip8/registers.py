@@ -0,0 +1,71 @@
+"""
+The register file of the Chip 8 CPU.
+"""
+
+from struct import Struct
+
+from chip8.config import STACK_POINTER_START, PROGRAM_COUNTER_START
+
+# C O N S T A N T S ###########################################################
+
+# The total number of registers in the Chip 8 CPU
+NUM_REGISTERS = 0x10
+
+# The layout used by bytes(): V0 - VF, the RPL flags, then I, PC, SP and the
+# delay and sound timers.
+REGISTER_LAYOUT = Struct('>16s16sHHHBB')
+
+
+# C L A S S E S ###############################################################
+
+
+class Registers(object):
+    """
+    Holds the CPU state that is not memory or the screen. The V registers
+    and RPL flags are bytearrays, so they always hold 8-bit values, while
+    the index register, program counter, stack pointer and the two timers
+    are plain attributes. Handlers should keep a local reference to v rather
+    than looking it up on every access; reset() and load() update it in
+    place, so references stay valid.
+    """
+    __slots__ = ('v', 'rpl', 'index', 'pc', 'sp', 'delay', 'sound')
+
+    def __init__(self):
+        self.v = bytearray(NUM_REGISTERS)
+        self.rpl = bytearray(NUM_REGISTERS)
+        self.index = 0
+        self.pc = PROGRAM_COUNTER_START
+        self.sp = STACK_POINTER_START
+        self.delay = 0
+        self.sound = 0
+
+    def reset(self):
+        """
+        Blanks out all registers and timers, and resets the stack pointer
+        and program counter to their starting values.
+        """
+        self.v[:] = bytes(NUM_REGISTERS)
+        self.rpl[:] = bytes(NUM_REGISTERS)
+        self.index = 0
+        self.pc = PROGRAM_COUNTER_START
+        self.sp = STACK_POINTER_START
+        self.delay = 0
+        self.sound = 0
+
+    def __bytes__(self):
+        """
+        Packs the registers into REGISTER_LAYOUT.
+        :return: the packed registers
+        """
+        return REGISTER_LAYOUT.pack(self.v, self.rpl, self.index, self.pc,
+                                    self.sp, self.delay, self.sound)
+
+    def load(self, data):
+        """
+        Restores the registers from the output of bytes().
+        :param data: the packed registers
+        """
+        v, rpl, self.index, self.pc, self.sp, self.delay, self.sound = \
+            REGISTER_LAYOUT.unpack(data)
+        self.v[:] = v
+        self.rpl[:] = rpl
@@ -0,0 +1,153 @@
+"""
+A Display that renders with NumPy and pygame.surfarray. Each present turns
+the frame buffer into an array of palette indices, scales it with
+np.repeat, writes it to an 8-bit canvas with blit_array, and copies the
+canvas to the window with a single blit, so a frame costs the same however
+many pixels are lit. The canvas's palette is a ramp from PIXEL_COLORS[0] to
+PIXEL_COLORS[1], followed by the XO-CHIP colors PIXEL_COLORS[2] and
+PIXEL_COLORS[3]; the canvas is kept separate from the window because most
+video drivers give the window a true color surface whatever depth is asked
+for.
+
+With phosphor persistence, pixels that are turned off fade out over several
+frames rather than vanishing at once. The glow of every pixel is kept in a
+float array, decayed by a constant factor on each present, and mapped onto
+the palette ramp, all as array operations.
+
+This module requires NumPy.
+"""
+
+import numpy as np
+
+from time import monotonic
+
+from pygame import display, surfarray, Surface
+
+from chip8.config import FRAME_RATE
+from chip8.display import Display, PIXEL_COLORS
+from chip8.framebuffer import DEFAULT_HEIGHT, DEFAULT_WIDTH
+
+# C O N S T A N T S ###########################################################
+
+# The number of shades between off and on used while pixels fade
+PHOSPHOR_LEVELS = 16
+
+
+# C L A S S E S ###############################################################
+
+
+class ArrayDisplay(Display):
+    """
+    A Display that paints the whole window with one blit per present, with
+    optional phosphor persistence.
+    """
+
+    __slots__ = ('decay', 'levels', 'palette', 'canvas', 'glow')
+
+    def __init__(self, scale_factor, height=DEFAULT_HEIGHT, width=DEFAULT_WIDTH,
+                 frame_rate=FRAME_RATE, decay=0.0):
+        """
+        Initializes the display. The decay is the fraction of its brightness
+        that a pixel keeps on each present after it is turned off; 0 turns
+        persistence off, so pixels go dark at once.
+        :param scale_factor: the scaling factor to apply to the screen
+        :param height: the height of the screen
+        :param width: the width of the screen
+        :param frame_rate: the maximum number of presents per second
+        :param decay: the phosphor decay factor, from 0 up to but not
+            including 1
+        """
+        if not 0.0 <= decay < 1.0:
+            raise ValueError("decay must be at least 0 and less than 1")
+        Display.__init__(self, scale_factor, height, width, frame_rate)
+        self.decay = decay
+        self.levels = PHOSPHOR_LEVELS if decay else 2
+        self.palette = palette_ramp(PIXEL_COLORS[0], PIXEL_COLORS[1],
+                                    self.levels) + \
+            [tuple(PIXEL_COLORS[color][:3]) for color in (2, 3)]
+        self.canvas = None
+        self.glow = None
+
+    def present(self):
+        """
+        Renders the frame buffer onto the canvas, copies the canvas to the
+        window with a single blit, and flips the window. If nothing changed
+        and no pixel is still fading, the window is left alone and the call
+        is counted in skipped_presents.
+        """
+        self.last_present = monotonic()
+        scale = self.scale_factor
+        if self.presented_rows is None:
+            self.canvas = Surface(
+                (self.width * scale, self.height * scale), 0, 8)
+            self.canvas.set_palette(self.palette)
+            self.glow = np.zeros((self.width, self.height), dtype=np.float32)
+        elif self.rows == self.presented_rows and not self.is_fading():
+            self.skipped_presents += 1
+            return
+        self.presented_rows = list(self.rows)
+        indices = self.get_indices()
+        surfarray.blit_array(
+            self.canvas, np.repeat(np.repeat(indices, scale, axis=0),
+                                   scale, axis=1))
+        self.surface.blit(self.canvas, (0, 0))
+        display.flip()
+        self.presents += 1
+
+    def get_colors(self):
+        """
+        Unpacks the frame buffer into an array of pixel colors, from 0 to 3.
+        :return: a uint8 array indexed by [x, y], as surfarray expects
+        """
+        packed = np.frombuffer(self.to_bytes(), dtype=np.uint8)
+        planes = np.unpackbits(packed.reshape(-1, self.height,
+                                              self.width // 8), axis=2)
+        colors = planes[0]
+        if len(planes) > 1:
+            colors |= planes[1] << 1
+        return colors.T
+
+    def get_indices(self):
+        """
+        Works out the palette index of every pixel, decaying the glow of
+        pixels that are off. Pixels in the XO-CHIP colors 2 and 3 use the
+        entries after the ramp, and fade out along the ramp when turned off.
+        :return: a uint8 array of palette indices indexed by [x, y]
+        """
+        colors = self.get_colors()
+        if not self.decay:
+            return colors
+        glow = self.glow
+        glow *= self.decay
+        np.maximum(glow, colors != 0, out=glow)
+        top = self.levels - 1
+        glow[glow < 0.5 / top] = 0.0
+        indices = (glow * top + 0.5).astype(np.uint8)
+        colored = colors > 1
+        indices[colored] = colors[colored] + (self.levels - 2)
+        return indices
+
+    def is_fading(self):
+        """
+        Returns whether any pixel is still fading out.
+        :return: True if some pixel is neither fully on nor fully off
+        """
+        glow = self.glow
+        return bool(self.decay) and bool(((glow > 0.0) & (glow < 1.0)).any())
+
+
+# F U N C T I O N S ###########################################################
+
+
+def palette_ramp(off_color, on_color, levels):
+    """
+    Builds a palette that steps evenly from one color to another.
+    :param off_color: the color at index 0
+    :param on_color: the color at index levels - 1
+    :param levels: the number of entries
+    :return: a list of (red, green, blue) tuples
+    """
+    top = levels - 1
+    return [tuple(int(round(off + (on - off) * level / float(top)))
+                  for off, on in zip(off_color[:3], on_color[:3]))
+            for level in range(levels)]
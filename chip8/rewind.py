@@ -0,0 +1,108 @@
+"""
+A rewind history for the Chip 8 CPU. Rather than keeping a full snapshot
+for every frame, the history keeps the latest snapshot plus a fixed-size ring
+of compressed XOR deltas, each of which turns a snapshot back into the one
+recorded before it. Most frames only change a few bytes, so a delta usually
+compresses to a few dozen bytes.
+"""
+
+import zlib
+
+from collections import deque
+
+# C O N S T A N T S ###########################################################
+
+# The default number of frames of history to keep (one minute at 60 Hz)
+DEFAULT_CAPACITY = 3600
+
+# The zlib compression level used for deltas
+COMPRESSION_LEVEL = 1
+
+
+# C L A S S E S ###############################################################
+
+
+class RewindBuffer(object):
+    """
+    Records snapshots of a Chip8CPU, and restores earlier ones. Call
+    record() once per frame; rewind() steps the CPU back through the recorded
+    frames, most recent first.
+    """
+
+    def __init__(self, cpu, capacity=DEFAULT_CAPACITY):
+        """
+        Attaches the history to a CPU.
+        :param cpu: the Chip8CPU to record and restore
+        :param capacity: the most frames that can be rewound
+        """
+        self.cpu = cpu
+        self.capacity = capacity
+        self.latest = None
+        self.deltas = deque(maxlen=capacity)
+
+    def __len__(self):
+        """
+        Returns the number of frames that can currently be rewound.
+        :return: the number of stored deltas
+        """
+        return len(self.deltas)
+
+    def record(self):
+        """
+        Snapshots the CPU, and stores the delta back to the previous
+        snapshot. Once the ring is full, the oldest delta is dropped.
+        """
+        snapshot = self.cpu.snapshot()
+        if self.latest is not None:
+            self.deltas.append(zlib.compress(xor_bytes(snapshot, self.latest),
+                                             COMPRESSION_LEVEL))
+        self.latest = snapshot
+
+    def rewind(self, frames=1):
+        """
+        Restores the CPU to the state recorded the specified number of frames
+        before the latest one. The rewound frames are dropped from the
+        history.
+        :param frames: the number of frames to go back
+        :return: the number of frames actually rewound
+        """
+        if self.latest is None:
+            return 0
+        frames = min(frames, len(self.deltas))
+        snapshot = self.latest
+        for _ in range(frames):
+            snapshot = xor_bytes(snapshot, zlib.decompress(self.deltas.pop()))
+        self.cpu.restore(snapshot)
+        self.latest = snapshot
+        return frames
+
+    def clear(self):
+        """
+        Forgets all of the recorded history.
+        """
+        self.latest = None
+        self.deltas.clear()
+
+    def get_size(self):
+        """
+        Returns the number of bytes held by the history.
+        :return: the size of the latest snapshot and all stored deltas
+        """
+        size = sum(len(delta) for delta in self.deltas)
+        if self.latest is not None:
+            size += len(self.latest)
+        return size
+
+
+# F U N C T I O N S ###########################################################
+
+
+def xor_bytes(first, second):
+    """
+    XORs two byte strings of equal length together.
+    :param first: the first byte string
+    :param second: the second byte string
+    :return: the XOR of the two
+    """
+    return (int.from_bytes(first, 'big') ^
+            int.from_bytes(second, 'big')).to_bytes(len(first), 'big')
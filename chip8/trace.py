@@ -0,0 +1,274 @@
+"""
+Instruction traces for the Chip 8 CPU. A TraceRecorder replaces the CPU's
+execute_instruction with a version that appends a fixed-width record for
+every instruction to a preallocated array, and writes the array to a file
+in large chunks whenever it fills. Traces are read back lazily, one chunk at
+a time, so that traces far larger than memory can be streamed and compared.
+
+Each record is five little-endian 16-bit words:
+
+    pc        the address of the instruction
+    opcode    the instruction
+    changed   the first V register the instruction changed in the high
+              byte, and its new value in the low byte; NO_CHANGE if no V
+              register changed
+    index     the index register after the instruction
+    vf        register VF after the instruction
+"""
+
+import sys
+
+from array import array
+from collections import namedtuple
+from struct import Struct
+
+# C O N S T A N T S ###########################################################
+
+# The header at the start of every trace file: a magic number, the format
+# version and the number of words in a record
+HEADER = Struct('<4sHH')
+MAGIC = b'C8TR'
+VERSION = 1
+RECORD_WORDS = 5
+RECORD_SIZE = RECORD_WORDS * 2
+
+# The changed field of a record in which no V register changed
+NO_CHANGE = 0xFFFF
+
+# The number of records buffered before they are written out
+CHUNK_RECORDS = 1 << 16
+
+# Trace files are little-endian, so big-endian hosts swap before writing and
+# after reading
+SWAP_BYTES = sys.byteorder == 'big'
+
+TraceRecord = namedtuple(
+    'TraceRecord', ['pc', 'opcode', 'register', 'value', 'index', 'vf'])
+
+
+# C L A S S E S ###############################################################
+
+
+class TraceRecorder(object):
+    """
+    Records every instruction a Chip8CPU executes through execute_instruction
+    to a trace file. Instructions run inside BlockJIT blocks do not go
+    through execute_instruction, and are not recorded.
+    """
+
+    def __init__(self, cpu, path, chunk_records=CHUNK_RECORDS):
+        """
+        Opens the trace file and writes its header. Recording does not start
+        until enable() is called.
+        :param cpu: the Chip8CPU to trace
+        :param path: the file to write the trace to
+        :param chunk_records: the number of records to buffer between writes
+        """
+        self.cpu = cpu
+        self.output = open(path, 'wb')
+        self.output.write(HEADER.pack(MAGIC, VERSION, RECORD_WORDS))
+        self.buffer = array('H', bytes(chunk_records * RECORD_SIZE))
+        self.position = 0
+        self.records = 0
+        self.enabled = False
+        self.original_skip_idle = None
+
+    def enable(self):
+        """
+        Starts recording, by shadowing the CPU's execute_instruction with
+        the tracing version. Idle loops are not skipped while recording, so
+        that every instruction the CPU counts is in the trace.
+        """
+        if not self.enabled:
+            self.cpu.execute_instruction = self.create_tracer()
+            self.original_skip_idle = self.cpu.skip_idle
+            self.cpu.skip_idle = False
+            self.enabled = True
+
+    def disable(self):
+        """
+        Stops recording, and puts the CPU's own execute_instruction and idle
+        loop skipping back. Records buffered so far are kept until flush()
+        or close().
+        """
+        if self.enabled:
+            del self.cpu.execute_instruction
+            self.cpu.skip_idle = self.original_skip_idle
+            self.enabled = False
+
+    def create_tracer(self):
+        """
+        Builds the tracing replacement for execute_instruction.
+        :return: the tracing function
+        """
+        cpu = self.cpu
+        execute_instruction = type(cpu).execute_instruction
+        registers = cpu.registers
+        v = cpu.v
+        buffer = self.buffer
+        size = len(buffer)
+        flush = self.flush
+
+        def trace_instruction(operand=None):
+            pc = registers.pc
+            before = bytes(v)
+            operand = execute_instruction(cpu, operand)
+            changed = NO_CHANGE
+            if v != before:
+                for register in range(16):
+                    if v[register] != before[register]:
+                        changed = (register << 8) | v[register]
+                        break
+            position = self.position
+            buffer[position] = pc
+            buffer[position + 1] = operand
+            buffer[position + 2] = changed
+            buffer[position + 3] = registers.index
+            buffer[position + 4] = v[0xF]
+            position += RECORD_WORDS
+            self.position = position
+            if position == size:
+                flush()
+            return operand
+
+        return trace_instruction
+
+    def flush(self):
+        """
+        Writes the buffered records to the trace file.
+        """
+        if self.position == 0:
+            return
+        chunk = memoryview(self.buffer)[:self.position]
+        if SWAP_BYTES:
+            chunk = array('H', chunk)
+            chunk.byteswap()
+        self.output.write(chunk)
+        self.records += self.position // RECORD_WORDS
+        self.position = 0
+
+    def close(self):
+        """
+        Stops recording, writes any buffered records and closes the file.
+        """
+        self.disable()
+        self.flush()
+        self.output.close()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# F U N C T I O N S ###########################################################
+
+
+def read_chunks(path, chunk_records=CHUNK_RECORDS):
+    """
+    Reads the raw records of a trace file, a chunk at a time.
+    :param path: the trace file to read
+    :param chunk_records: the number of records to read at once
+    :return: a generator of bytes objects, each holding whole records
+    """
+    with open(path, 'rb') as trace:
+        magic, version, words = HEADER.unpack(trace.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or words != RECORD_WORDS:
+            raise ValueError("{} is not a version {} trace".format(
+                path, VERSION))
+        while True:
+            chunk = trace.read(chunk_records * RECORD_SIZE)
+            if not chunk:
+                return
+            yield chunk[:len(chunk) - len(chunk) % RECORD_SIZE]
+
+
+def decode_records(chunk):
+    """
+    Decodes raw records into TraceRecords.
+    :param chunk: bytes holding whole records
+    :return: a generator of TraceRecords
+    """
+    words = array('H', chunk)
+    if SWAP_BYTES:
+        words.byteswap()
+    for position in range(0, len(words), RECORD_WORDS):
+        pc, opcode, changed, index, vf = words[position:position + RECORD_WORDS]
+        if changed == NO_CHANGE:
+            register = value = None
+        else:
+            register, value = changed >> 8, changed & 0xFF
+        yield TraceRecord(pc, opcode, register, value, index, vf)
+
+
+def read_trace(path, chunk_records=CHUNK_RECORDS):
+    """
+    Streams the records of a trace file, without loading it all at once.
+    :param path: the trace file to read
+    :param chunk_records: the number of records to read at once
+    :return: a generator of TraceRecords
+    """
+    for chunk in read_chunks(path, chunk_records):
+        for record in decode_records(chunk):
+            yield record
+
+
+def diff_traces(first, second, chunk_records=CHUNK_RECORDS):
+    """
+    Finds the first record at which two traces differ. Whole chunks are
+    compared as bytes, and only a chunk that differs is decoded.
+    :param first: the path of the first trace
+    :param second: the path of the second trace
+    :param chunk_records: the number of records to compare at once
+    :return: None if the traces are identical, otherwise a tuple of the
+        record number and the two records at it; a record is None if its
+        trace ended first
+    """
+    offset = 0
+    first_chunks = read_chunks(first, chunk_records)
+    second_chunks = read_chunks(second, chunk_records)
+    while True:
+        first_chunk = next(first_chunks, b'')
+        second_chunk = next(second_chunks, b'')
+        if first_chunk == second_chunk:
+            if not first_chunk:
+                return None
+            offset += len(first_chunk) // RECORD_SIZE
+            continue
+        first_records = list(decode_records(first_chunk))
+        second_records = list(decode_records(second_chunk))
+        for number in range(max(len(first_records), len(second_records))):
+            first_record = first_records[number] \
+                if number < len(first_records) else None
+            second_record = second_records[number] \
+                if number < len(second_records) else None
+            if first_record != second_record:
+                return offset + number, first_record, second_record
+
+
+def main(argv=None):
+    """
+    Compares two trace files named on the command line, and prints the first
+    divergence.
+    :param argv: the arguments, defaults to sys.argv
+    :return: the exit status; 1 if the traces differ
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        sys.stderr.write("usage: python -m chip8.trace FIRST SECOND\n")
+        return 2
+    divergence = diff_traces(*argv)
+    if divergence is None:
+        print("traces are identical")
+        return 0
+    number, first_record, second_record = divergence
+    print("traces diverge at record {}".format(number))
+    print("  {}: {}".format(argv[0], first_record))
+    print("  {}: {}".format(argv[1], second_record))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
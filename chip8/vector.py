@@ -0,0 +1,738 @@
+"""
+A lockstep execution engine that runs many Chip 8 machines at once with
+NumPy. Every machine (or lane) has its own memory, registers, keys and
+screen, all stored as rows of shared arrays. Each step fetches one
+instruction per lane, groups the lanes that are executing the same kind of
+instruction, and applies the semantics of the matching Chip8CPU handler to
+the whole group as array operations. The results for each lane match a
+scalar Chip8CPU running the same program exactly.
+
+This module requires NumPy.
+"""
+
+import numpy as np
+
+from random import Random
+
+from chip8.chip8 import UnknownOpCodeException
+from chip8.config import (
+    MAX_MEMORY, INSTRUCTIONS_PER_FRAME, PROGRAM_COUNTER_START,
+    STACK_POINTER_START
+)
+from chip8.framebuffer import (
+    SCREEN_MODE_NORMAL, SCREEN_MODE_EXTENDED, SCREEN_HEIGHT, SCREEN_WIDTH
+)
+from chip8.loader import load_image
+from chip8.registers import REGISTER_LAYOUT, NUM_REGISTERS
+
+# C O N S T A N T S ###########################################################
+
+# The largest screen any lane can use
+MAX_HEIGHT = SCREEN_HEIGHT[SCREEN_MODE_EXTENDED]
+MAX_WIDTH = SCREEN_WIDTH[SCREEN_MODE_EXTENDED]
+
+
+# C L A S S E S ###############################################################
+
+
+class VectorChip8(object):
+    """
+    Runs num_machines Chip 8 machines in lockstep. The state of lane n is
+    held in row n of each of the following arrays:
+
+        memory    (N, 4096) uint8   - main memory
+        v         (N, 16) uint8     - V0 - VF
+        rpl       (N, 16) uint8     - the RPL flags
+        index, pc, sp, delay, sound (N,) int32
+        keys      (N, 16) bool      - which keys are held down
+        frames    (N, 64, 128) uint8 - the screen, one byte per pixel. Lanes
+                                       in normal mode only use the top left
+                                       32 x 64 pixels.
+        extended  (N,) bool         - whether the lane is in extended mode
+        running   (N,) bool         - cleared by 00FD
+    """
+
+    def __init__(self, num_machines, instructions_per_frame=INSTRUCTIONS_PER_FRAME,
+                 seeds=None):
+        """
+        Allocates the state for all lanes, and resets them.
+        :param num_machines: the number of lanes to run
+        :param instructions_per_frame: the instructions to run per 60 Hz frame
+        :param seeds: a seed for each lane's random number generator, or None
+        """
+        self.num_machines = num_machines
+        self.instructions_per_frame = instructions_per_frame
+        self.memory = np.zeros((num_machines, MAX_MEMORY), dtype=np.uint8)
+        self.v = np.zeros((num_machines, NUM_REGISTERS), dtype=np.uint8)
+        self.rpl = np.zeros((num_machines, NUM_REGISTERS), dtype=np.uint8)
+        self.index = np.zeros(num_machines, dtype=np.int32)
+        self.pc = np.zeros(num_machines, dtype=np.int32)
+        self.sp = np.zeros(num_machines, dtype=np.int32)
+        self.delay = np.zeros(num_machines, dtype=np.int32)
+        self.sound = np.zeros(num_machines, dtype=np.int32)
+        self.keys = np.zeros((num_machines, NUM_REGISTERS), dtype=bool)
+        self.frames = np.zeros((num_machines, MAX_HEIGHT, MAX_WIDTH),
+                               dtype=np.uint8)
+        self.extended = np.zeros(num_machines, dtype=bool)
+        self.running = np.ones(num_machines, dtype=bool)
+        self.halted = np.zeros(num_machines, dtype=bool)
+
+        if seeds is None:
+            seeds = [None] * num_machines
+        self.randoms = [Random(seed) for seed in seeds]
+
+        self.operation_lookup = {
+            0x0: self.clear_return,  # 0nnn - SYS  nnn
+            0x1: self.jump_to_address,  # 1nnn - JUMP nnn
+            0x2: self.jump_to_subroutine,  # 2nnn - CALL nnn
+            0x3: self.skip_if_reg_equal_val,  # 3snn - SKE  Vs, nn
+            0x4: self.skip_if_reg_not_equal_val,  # 4snn - SKNE Vs, nn
+            0x5: self.skip_if_reg_equal_reg,  # 5st0 - SKE  Vs, Vt
+            0x6: self.move_value_to_reg,  # 6snn - LOAD Vs, nn
+            0x7: self.add_value_to_reg,  # 7snn - ADD  Vs, nn
+            0x8: self.execute_logical_instruction,  # see subfunctions below
+            0x9: self.skip_if_reg_not_equal_reg,  # 9st0 - SKNE Vs, Vt
+            0xA: self.load_index_reg_with_value,  # Annn - LOAD I, nnn
+            0xB: self.jump_to_index_plus_value,  # Bnnn - JUMP [I] + nnn
+            0xC: self.generate_random_number,  # Ctnn - RAND Vt, nn
+            0xD: self.draw_sprite,  # Dstn - DRAW Vs, Vy, n
+            0xE: self.keyboard_routines,  # see subfunctions below
+            0xF: self.misc_routines,  # see subfunctions below
+        }
+
+        self.logical_operation_lookup = {
+            0x0: self.move_reg_into_reg,  # 8st0 - LOAD Vs, Vt
+            0x1: self.logical_or,  # 8st1 - OR   Vs, Vt
+            0x2: self.logical_and,  # 8st2 - AND  Vs, Vt
+            0x3: self.exclusive_or,  # 8st3 - XOR  Vs, Vt
+            0x4: self.add_reg_to_reg,  # 8st4 - ADD  Vs, Vt
+            0x5: self.subtract_reg_from_reg,  # 8st5 - SUB  Vs, Vt
+            0x6: self.right_shift_reg,  # 8st6 - SHR  Vs
+            0x7: self.subtract_reg_from_reg1,  # 8st7 - SUBN Vs, Vt
+            0xE: self.left_shift_reg,  # 8stE - SHL  Vs
+        }
+
+        self.keyboard_routine_lookup = {
+            0x9E: self.skip_if_key_pressed,  # Es9E - SKPR Vs
+            0xA1: self.skip_if_key_not_pressed,  # EsA1 - SKUP Vs
+        }
+
+        self.misc_routine_lookup = {
+            0x07: self.move_delay_timer_into_reg,  # Ft07 - LOAD Vt, DELAY
+            0x0A: self.wait_for_keypress,  # Ft0A - KEYD Vt
+            0x15: self.move_reg_into_delay_timer,  # Fs15 - LOAD DELAY, Vs
+            0x18: self.move_reg_into_sound_timer,  # Fs18 - LOAD SOUND, Vs
+            0x1E: self.add_reg_into_index,  # Fs1E - ADD  I, Vs
+            0x29: self.load_index_with_reg_sprite,  # Fs29 - LOAD I, Vs
+            0x30: self.load_index_with_extended_reg_sprite,  # Fs30 - LOAD I, Vs
+            0x33: self.store_bcd_in_memory,  # Fs33 - BCD
+            0x55: self.store_regs_in_memory,  # Fs55 - STOR [I], Vs
+            0x65: self.read_regs_from_memory,  # Fs65 - LOAD Vs, [I]
+            0x75: self.store_regs_in_rpl,  # Fs75 - SRPL Vs
+            0x85: self.read_regs_from_rpl,  # Fs85 - LRPL Vs
+        }
+
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the registers, timers, screens and modes of every lane. Memory
+        is left as it is.
+        """
+        self.v[:] = 0
+        self.rpl[:] = 0
+        self.index[:] = 0
+        self.pc[:] = PROGRAM_COUNTER_START
+        self.sp[:] = STACK_POINTER_START
+        self.delay[:] = 0
+        self.sound[:] = 0
+        self.frames[:] = 0
+        self.extended[:] = False
+        self.running[:] = True
+        self.halted[:] = False
+
+    def load_rom(self, filename, offset=PROGRAM_COUNTER_START, lanes=None):
+        """
+        Loads a ROM file into the memory of the specified lanes.
+        :param filename: the name of the file to open
+        :param offset: the location in memory at which to load the data
+        :param lanes: the lanes to load into, defaults to all of them
+        """
+        self.load(load_image(filename), offset, lanes)
+
+    def load(self, data, offset=PROGRAM_COUNTER_START, lanes=None):
+        """
+        Copies bytes into the memory of the specified lanes.
+        :param data: the bytes to copy
+        :param offset: the location in memory at which to copy the data
+        :param lanes: the lanes to copy into, defaults to all of them
+        """
+        if offset + len(data) > MAX_MEMORY:
+            raise ValueError("data does not fit in memory")
+        if lanes is None:
+            lanes = slice(None)
+        self.memory[lanes, offset:offset + len(data)] = \
+            np.frombuffer(bytes(data), dtype=np.uint8)
+
+    # E X E C U T I O N #######################################################
+
+    def step(self, lanes=None):
+        """
+        Executes one instruction on each of the specified lanes.
+        :param lanes: an array of lane numbers, defaults to every lane that
+            is running and not halted
+        :return: the number of lanes that executed an instruction
+        """
+        if lanes is None:
+            lanes = np.flatnonzero(self.running & ~self.halted)
+        if len(lanes) == 0:
+            return 0
+        pc = self.pc[lanes]
+        operands = (self.memory[lanes, pc].astype(np.int32) << 8) | \
+            self.memory[lanes, pc + 1]
+        self.pc[lanes] = pc + 2
+        self.dispatch(self.operation_lookup, operands >> 12, lanes, operands)
+        return len(lanes)
+
+    def run_frame(self, cycles=None):
+        """
+        Runs a single 60 Hz frame on every running lane. A lane stops
+        executing for the rest of the frame when it exits with 00FD, or when
+        an Fx0A instruction is waiting for a key, just as Chip8CPU.run_frame
+        does. The timers of every lane that ran are then decremented.
+        :param cycles: the most instructions to execute per lane, defaults
+            to instructions_per_frame
+        :return: the number of instructions executed across all lanes
+        """
+        if cycles is None:
+            cycles = self.instructions_per_frame
+        frame_lanes = self.running.copy()
+        self.halted[:] = False
+        executed = 0
+        for _ in range(cycles):
+            count = self.step()
+            if count == 0:
+                break
+            executed += count
+        self.decrement_timers(frame_lanes)
+        return executed
+
+    def decrement_timers(self, lanes):
+        """
+        Decrement both the sound and delay timers of the specified lanes.
+        :param lanes: a boolean mask or array of lane numbers
+        """
+        delay = self.delay[lanes]
+        self.delay[lanes] = np.where(delay > 0, delay - 1, 0)
+        sound = self.sound[lanes]
+        self.sound[lanes] = np.where(sound > 0, sound - 1, 0)
+
+    def dispatch(self, lookup, keys, lanes, operands):
+        """
+        Splits the lanes into groups that share the same lookup key, and
+        calls the matching routine once for each group.
+        :param lookup: the table of routines
+        :param keys: the lookup key of each lane
+        :param lanes: the lane numbers
+        :param operands: the operand each lane is executing
+        """
+        for key in np.unique(keys):
+            group = keys == key
+            try:
+                routine = lookup[int(key)]
+            except KeyError:
+                raise UnknownOpCodeException(int(operands[group][0]))
+            routine(lanes[group], operands[group])
+
+    # S C R E E N   H E L P E R S #############################################
+
+    def get_screen(self, lane):
+        """
+        Returns the pixels of a lane's screen, sized for its current mode.
+        :param lane: the lane number
+        :return: a (height, width) array of 0s and 1s
+        """
+        mode = SCREEN_MODE_EXTENDED if self.extended[lane] \
+            else SCREEN_MODE_NORMAL
+        return self.frames[lane, :SCREEN_HEIGHT[mode], :SCREEN_WIDTH[mode]]
+
+    def get_screen_bytes(self, lane):
+        """
+        Packs a lane's screen in the same format as Framebuffer.to_bytes().
+        :param lane: the lane number
+        :return: the packed screen
+        """
+        return np.packbits(self.get_screen(lane), axis=1).tobytes()
+
+    def get_register_bytes(self, lane):
+        """
+        Packs a lane's registers in the same format as bytes(Registers).
+        :param lane: the lane number
+        :return: the packed registers
+        """
+        return REGISTER_LAYOUT.pack(
+            self.v[lane].tobytes(), self.rpl[lane].tobytes(),
+            int(self.index[lane]), int(self.pc[lane]), int(self.sp[lane]),
+            int(self.delay[lane]), int(self.sound[lane]))
+
+    def scroll(self, lanes, shift):
+        """
+        Applies a scroll to the active screen area of each lane, taking the
+        lanes in normal and extended mode separately.
+        :param lanes: the lane numbers
+        :param shift: a function that takes a (lanes, height, width) array
+            of pixels and returns the scrolled pixels
+        """
+        for extended, mode in ((False, SCREEN_MODE_NORMAL),
+                               (True, SCREEN_MODE_EXTENDED)):
+            selected = lanes[self.extended[lanes] == extended]
+            if len(selected) == 0:
+                continue
+            height = SCREEN_HEIGHT[mode]
+            width = SCREEN_WIDTH[mode]
+            self.frames[selected, :height, :width] = \
+                shift(self.frames[selected, :height, :width])
+
+    # O P E R A T I O N S #####################################################
+
+    def clear_return(self, lanes, operands):
+        """
+        0nnn - see Chip8CPU.clear_return. The low byte of the operand selects
+        the operation, and unknown operations are ignored.
+        """
+        operations = operands & 0x00FF
+        for operation in np.unique(operations):
+            operation = int(operation)
+            group = lanes[operations == operation]
+            if operation & 0x00F0 == 0x00C0:
+                num_lines = operation & 0x000F
+                self.scroll(group, lambda pixels, n=num_lines:
+                            scroll_pixels_down(pixels, n))
+            elif operation == 0x00E0:
+                self.frames[group] = 0
+            elif operation == 0x00EE:
+                self.return_from_subroutine(group)
+            elif operation == 0x00FB:
+                self.scroll(group, scroll_pixels_right)
+            elif operation == 0x00FC:
+                self.scroll(group, scroll_pixels_left)
+            elif operation == 0x00FD:
+                self.running[group] = False
+                self.halted[group] = True
+            elif operation == 0x00FE:
+                self.frames[group] = 0
+                self.extended[group] = False
+            elif operation == 0x00FF:
+                self.frames[group] = 0
+                self.extended[group] = True
+
+    def return_from_subroutine(self, lanes):
+        """
+        00EE - RTS
+        """
+        sp = self.sp[lanes] - 2
+        self.pc[lanes] = (self.memory[lanes, sp + 1].astype(np.int32) << 8) | \
+            self.memory[lanes, sp]
+        self.sp[lanes] = sp
+
+    def jump_to_address(self, lanes, operands):
+        """
+        1nnn - JUMP nnn
+        """
+        self.pc[lanes] = operands & 0x0FFF
+
+    def jump_to_subroutine(self, lanes, operands):
+        """
+        2nnn - CALL nnn
+        """
+        sp = self.sp[lanes]
+        pc = self.pc[lanes]
+        self.memory[lanes, sp] = pc & 0x00FF
+        self.memory[lanes, sp + 1] = (pc & 0xFF00) >> 8
+        self.sp[lanes] = sp + 2
+        self.pc[lanes] = operands & 0x0FFF
+
+    def skip(self, lanes, condition):
+        """
+        Advances the program counter of the lanes where condition holds.
+        :param lanes: the lane numbers
+        :param condition: a boolean array, one entry per lane
+        """
+        self.pc[lanes[condition]] += 2
+
+    def skip_if_reg_equal_val(self, lanes, operands):
+        """
+        3snn - SKE Vs, nn
+        """
+        source = (operands & 0x0F00) >> 8
+        self.skip(lanes, self.v[lanes, source] == (operands & 0x00FF))
+
+    def skip_if_reg_not_equal_val(self, lanes, operands):
+        """
+        4snn - SKNE Vs, nn
+        """
+        source = (operands & 0x0F00) >> 8
+        self.skip(lanes, self.v[lanes, source] != (operands & 0x00FF))
+
+    def skip_if_reg_equal_reg(self, lanes, operands):
+        """
+        5st0 - SKE Vs, Vt
+        """
+        source = (operands & 0x0F00) >> 8
+        target = (operands & 0x00F0) >> 4
+        self.skip(lanes, self.v[lanes, source] == self.v[lanes, target])
+
+    def move_value_to_reg(self, lanes, operands):
+        """
+        6snn - LOAD Vs, nn
+        """
+        target = (operands & 0x0F00) >> 8
+        self.v[lanes, target] = operands & 0x00FF
+
+    def add_value_to_reg(self, lanes, operands):
+        """
+        7snn - ADD Vs, nn
+        """
+        target = (operands & 0x0F00) >> 8
+        self.v[lanes, target] = \
+            (self.v[lanes, target].astype(np.int32) + (operands & 0x00FF)) & 0xFF
+
+    def execute_logical_instruction(self, lanes, operands):
+        """
+        8stn - dispatched to the logical_operation_lookup table.
+        """
+        self.dispatch(self.logical_operation_lookup, operands & 0x000F,
+                      lanes, operands)
+
+    def move_reg_into_reg(self, lanes, operands):
+        """
+        8st0 - LOAD Vs, Vt
+        """
+        target = (operands & 0x0F00) >> 8
+        source = (operands & 0x00F0) >> 4
+        self.v[lanes, target] = self.v[lanes, source]
+
+    def logical_or(self, lanes, operands):
+        """
+        8ts1 - OR   Vs, Vt
+        """
+        target = (operands & 0x0F00) >> 8
+        source = (operands & 0x00F0) >> 4
+        self.v[lanes, target] = self.v[lanes, target] | self.v[lanes, source]
+
+    def logical_and(self, lanes, operands):
+        """
+        8ts2 - AND  Vs, Vt
+        """
+        target = (operands & 0x0F00) >> 8
+        source = (operands & 0x00F0) >> 4
+        self.v[lanes, target] = self.v[lanes, target] & self.v[lanes, source]
+
+    def exclusive_or(self, lanes, operands):
+        """
+        8ts3 - XOR  Vs, Vt
+        """
+        target = (operands & 0x0F00) >> 8
+        source = (operands & 0x00F0) >> 4
+        self.v[lanes, target] = self.v[lanes, target] ^ self.v[lanes, source]
+
+    def add_reg_to_reg(self, lanes, operands):
+        """
+        8ts4 - ADD  Vt, Vs. The target is written before VF.
+        """
+        target = (operands & 0x0F00) >> 8
+        source = (operands & 0x00F0) >> 4
+        temp = self.v[lanes, target].astype(np.int32) + self.v[lanes, source]
+        self.v[lanes, target] = temp & 0xFF
+        self.v[lanes, 0xF] = temp > 255
+
+    def subtract_reg_from_reg(self, lanes, operands):
+        """
+        8ts5 - SUB  Vt, Vs. VF is written before the target.
+        """
+        target = (operands & 0x0F00) >> 8
+        source = (operands & 0x00F0) >> 4
+        target_reg = self.v[lanes, target].astype(np.int32)
+        source_reg = self.v[lanes, source].astype(np.int32)
+        self.v[lanes, 0xF] = target_reg > source_reg
+        self.v[lanes, target] = (target_reg - source_reg) & 0xFF
+
+    def right_shift_reg(self, lanes, operands):
+        """
+        8st6 - SHR  Vs, Vt. The result is written to Vt, then VF.
+        """
+        source = (operands & 0x0F00) >> 8
+        target = (operands & 0x00F0) >> 4
+        source_reg = self.v[lanes, source]
+        self.v[lanes, target] = source_reg >> 1
+        self.v[lanes, 0xF] = source_reg & 0x1
+
+    def subtract_reg_from_reg1(self, lanes, operands):
+        """
+        8ts7 - SUBN Vt, Vs. VF is written before the target.
+        """
+        target = (operands & 0x0F00) >> 8
+        source = (operands & 0x00F0) >> 4
+        target_reg = self.v[lanes, target].astype(np.int32)
+        source_reg = self.v[lanes, source].astype(np.int32)
+        self.v[lanes, 0xF] = source_reg > target_reg
+        self.v[lanes, target] = (source_reg - target_reg) & 0xFF
+
+    def left_shift_reg(self, lanes, operands):
+        """
+        8stE - SHL  Vs, Vt. The result is written to Vt, then VF.
+        """
+        source = (operands & 0x0F00) >> 8
+        target = (operands & 0x00F0) >> 4
+        source_reg = self.v[lanes, source].astype(np.int32)
+        self.v[lanes, target] = (source_reg << 1) & 0xFF
+        self.v[lanes, 0xF] = (source_reg & 0x80) >> 7
+
+    def skip_if_reg_not_equal_reg(self, lanes, operands):
+        """
+        9st0 - SKNE Vs, Vt
+        """
+        source = (operands & 0x0F00) >> 8
+        target = (operands & 0x00F0) >> 4
+        self.skip(lanes, self.v[lanes, source] != self.v[lanes, target])
+
+    def load_index_reg_with_value(self, lanes, operands):
+        """
+        Annn - LOAD I, nnn
+        """
+        self.index[lanes] = operands & 0x0FFF
+
+    def jump_to_index_plus_value(self, lanes, operands):
+        """
+        Bnnn - JUMP [I] + nnn
+        """
+        self.pc[lanes] = self.index[lanes] + (operands & 0x0FFF)
+
+    def generate_random_number(self, lanes, operands):
+        """
+        Ctnn - RAND Vt, nn. Each lane draws from its own generator, in the
+        same way as a scalar Chip8CPU seeded with the same value.
+        """
+        target = (operands & 0x0F00) >> 8
+        values = np.array([self.randoms[lane].randint(0, 255)
+                           for lane in lanes], dtype=np.int32)
+        self.v[lanes, target] = (operands & 0x00FF) & values
+
+    def draw_sprite(self, lanes, operands):
+        """
+        Dxyn - DRAW x, y, num_bytes. Sprites are XORed into each lane's
+        screen one row at a time across all lanes, wrapping at the edges of
+        the screen. Lanes in extended mode that draw with num_bytes set to 0
+        draw 16x16 sprites. VF is set to 1 in each lane where a pixel was
+        turned off. As with Memory.fetch_many, a ValueError is raised if any
+        lane's sprite runs past the end of memory.
+        """
+        x_source = (operands & 0x0F00) >> 8
+        y_source = (operands & 0x00F0) >> 4
+        num_bytes = operands & 0x000F
+        extended = self.extended[lanes]
+        height = np.where(extended, SCREEN_HEIGHT[SCREEN_MODE_EXTENDED],
+                          SCREEN_HEIGHT[SCREEN_MODE_NORMAL])
+        width = np.where(extended, SCREEN_WIDTH[SCREEN_MODE_EXTENDED],
+                         SCREEN_WIDTH[SCREEN_MODE_NORMAL])
+        x_pos = self.v[lanes, x_source] % width
+        y_pos = self.v[lanes, y_source] % height
+        index = self.index[lanes]
+        collision = np.zeros(len(lanes), dtype=bool)
+
+        large = extended & (num_bytes == 0)
+        if (index + np.where(large, 32, num_bytes) > MAX_MEMORY).any():
+            raise ValueError("sprite runs past the end of memory")
+        for sprite_width, group in ((16, np.flatnonzero(large)),
+                                    (8, np.flatnonzero(~large))):
+            if len(group) == 0:
+                continue
+            group_lanes = lanes[group]
+            columns = (x_pos[group, None] + np.arange(sprite_width)) % \
+                width[group, None]
+            row_bytes = sprite_width // 8
+            num_rows = np.full(len(group), 16) if sprite_width == 16 \
+                else num_bytes[group]
+            for row in range(int(np.max(num_rows))):
+                address = index[group] + row * row_bytes
+                active = row < num_rows
+                if not active.any():
+                    continue
+                row_lanes = group_lanes[active]
+                sprite = np.unpackbits(
+                    self.memory[row_lanes[:, None],
+                                address[active, None] + np.arange(row_bytes)],
+                    axis=1)
+                y_coord = (y_pos[group][active] + row) % height[group][active]
+                pixels = (row_lanes[:, None], y_coord[:, None],
+                          columns[active])
+                old = self.frames[pixels]
+                collision[group[active]] |= (old & sprite).any(axis=1)
+                self.frames[pixels] = old ^ sprite
+
+        self.v[lanes, 0xF] = collision
+
+    def keyboard_routines(self, lanes, operands):
+        """
+        Es-- - dispatched to the keyboard_routine_lookup table.
+        """
+        self.dispatch(self.keyboard_routine_lookup, operands & 0x00FF,
+                      lanes, operands)
+
+    def skip_if_key_pressed(self, lanes, operands):
+        """
+        Es9E - SKPR Vs
+        """
+        source = (operands & 0x0F00) >> 8
+        self.skip(lanes, self.keys[lanes, self.v[lanes, source] & 0xF])
+
+    def skip_if_key_not_pressed(self, lanes, operands):
+        """
+        EsA1 - SKUP Vs
+        """
+        source = (operands & 0x0F00) >> 8
+        self.skip(lanes, ~self.keys[lanes, self.v[lanes, source] & 0xF])
+
+    def misc_routines(self, lanes, operands):
+        """
+        Fs-- - dispatched to the misc_routine_lookup table.
+        """
+        self.dispatch(self.misc_routine_lookup, operands & 0x00FF,
+                      lanes, operands)
+
+    def move_delay_timer_into_reg(self, lanes, operands):
+        """
+        Ft07 - LOAD Vt, DELAY
+        """
+        target = (operands & 0x0F00) >> 8
+        self.v[lanes, target] = self.delay[lanes]
+
+    def wait_for_keypress(self, lanes, operands):
+        """
+        Ft0A - KEYD Vt. Lanes with no key down re-execute the instruction
+        on their next frame.
+        """
+        target = (operands & 0x0F00) >> 8
+        keys = self.keys[lanes]
+        pressed = keys.any(axis=1)
+        self.v[lanes[pressed], target[pressed]] = \
+            np.argmax(keys[pressed], axis=1)
+        waiting = lanes[~pressed]
+        self.pc[waiting] -= 2
+        self.halted[waiting] = True
+
+    def move_reg_into_delay_timer(self, lanes, operands):
+        """
+        Fs15 - LOAD DELAY, Vs
+        """
+        source = (operands & 0x0F00) >> 8
+        self.delay[lanes] = self.v[lanes, source]
+
+    def move_reg_into_sound_timer(self, lanes, operands):
+        """
+        Fs18 - LOAD SOUND, Vs
+        """
+        source = (operands & 0x0F00) >> 8
+        self.sound[lanes] = self.v[lanes, source]
+
+    def add_reg_into_index(self, lanes, operands):
+        """
+        Fs1E - ADD I, Vs
+        """
+        source = (operands & 0x0F00) >> 8
+        self.index[lanes] = (self.index[lanes] + self.v[lanes, source]) & 0xFFFF
+
+    def load_index_with_reg_sprite(self, lanes, operands):
+        """
+        Fs29 - LOAD I, Vs
+        """
+        source = (operands & 0x0F00) >> 8
+        self.index[lanes] = self.v[lanes, source].astype(np.int32) * 5
+
+    def load_index_with_extended_reg_sprite(self, lanes, operands):
+        """
+        Fs30 - LOAD I, Vs
+        """
+        source = (operands & 0x0F00) >> 8
+        self.index[lanes] = self.v[lanes, source].astype(np.int32) * 10 + 80
+
+    def store_bcd_in_memory(self, lanes, operands):
+        """
+        Fs33 - BCD
+        """
+        source = (operands & 0x0F00) >> 8
+        value = self.v[lanes, source]
+        index = self.index[lanes]
+        self.memory[lanes, index] = value // 100
+        self.memory[lanes, index + 1] = (value // 10) % 10
+        self.memory[lanes, index + 2] = value % 10
+
+    def store_regs_in_memory(self, lanes, operands):
+        """
+        Fs55 - STOR [I], Vs
+        """
+        source = (operands & 0x0F00) >> 8
+        index = self.index[lanes]
+        for counter in range(NUM_REGISTERS):
+            selected = source >= counter
+            if not selected.any():
+                break
+            self.memory[lanes[selected], index[selected] + counter] = \
+                self.v[lanes[selected], counter]
+
+    def read_regs_from_memory(self, lanes, operands):
+        """
+        Fs65 - LOAD Vs, [I]
+        """
+        source = (operands & 0x0F00) >> 8
+        index = self.index[lanes]
+        for counter in range(NUM_REGISTERS):
+            selected = source >= counter
+            if not selected.any():
+                break
+            self.v[lanes[selected], counter] = \
+                self.memory[lanes[selected], index[selected] + counter]
+
+    def store_regs_in_rpl(self, lanes, operands):
+        """
+        Fs75 - SRPL Vs
+        """
+        selected = np.arange(NUM_REGISTERS) <= ((operands & 0x0F00) >> 8)[:, None]
+        self.rpl[lanes] = np.where(selected, self.v[lanes], self.rpl[lanes])
+
+    def read_regs_from_rpl(self, lanes, operands):
+        """
+        Fs85 - LRPL Vs
+        """
+        selected = np.arange(NUM_REGISTERS) <= ((operands & 0x0F00) >> 8)[:, None]
+        self.v[lanes] = np.where(selected, self.rpl[lanes], self.v[lanes])
+
+
+# F U N C T I O N S ###########################################################
+
+
+def scroll_pixels_down(pixels, num_lines):
+    """
+    Scrolls a (lanes, height, width) block of pixels down by num_lines.
+    """
+    scrolled = np.zeros_like(pixels)
+    scrolled[:, num_lines:, :] = pixels[:, :pixels.shape[1] - num_lines, :]
+    return scrolled
+
+
+def scroll_pixels_left(pixels):
+    """
+    Scrolls a (lanes, height, width) block of pixels left by 4 pixels.
+    """
+    scrolled = np.zeros_like(pixels)
+    scrolled[:, :, :-4] = pixels[:, :, 4:]
+    return scrolled
+
+
+def scroll_pixels_right(pixels):
+    """
+    Scrolls a (lanes, height, width) block of pixels right by 4 pixels.
+    """
+    scrolled = np.zeros_like(pixels)
+    scrolled[:, :, 4:] = pixels[:, :, :-4]
+    return scrolled
@@ -1,21 +1,111 @@
-import pygame
-if __name__ == '__main__':
-    pygame.init()
+"""
+Starts the Chip 8 emulator with a pygame window.
+"""
+
+import argparse
+
+from pygame import error
+
+from chip8.audio import Audio, NullAudio
+from chip8.chip8 import Chip8CPU
+from chip8.config import FONT_FILE, INSTRUCTIONS_PER_FRAME
+from chip8.display import Display
+from chip8.keypad import PygameKeypad
+from chip8.pipeline import Pipeline
+from chip8.profiler import Profiler
+from chip8.quirks import DEFAULT_PROFILE, PROFILES
+from chip8.trace import TraceRecorder
+
 
-    # Set up the drawing window
-    screen = pygame.display.set_mode([500, 500])
-    running = True
-    while running:
+def parse_arguments():
+    """
+    Parses the command line arguments passed to the emulator.
 
-        # Did the user click the window close button?
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            # Fill the background with white
-            screen.fill((255, 255, 255))
+    :return: the parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Starts a simple Chip 8 emulator.")
+    parser.add_argument(
+        "rom", help="the ROM file to load on startup")
+    parser.add_argument(
+        "-s", help="the scale factor to apply to the display (default is 5)",
+        type=int, default=5, dest="scale")
+    parser.add_argument(
+        "-i", help="the number of instructions to execute per frame "
+                   "(default is {})".format(INSTRUCTIONS_PER_FRAME),
+        type=int, default=INSTRUCTIONS_PER_FRAME, dest="instructions")
+    parser.add_argument(
+        "--quirks", help="the quirk profile of the interpreter the ROM was "
+                         "written for (default is {})".format(
+                             DEFAULT_PROFILE),
+        choices=sorted(PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument(
+        "--uncapped", help="run frames as fast as possible instead of at "
+                           "60 Hz", action="store_true")
+    parser.add_argument(
+        "--renderer", help="how to draw the screen: 'rects' paints changed "
+                           "pixels one by one, 'array' paints the whole "
+                           "screen with NumPy (default is rects)",
+        choices=["rects", "array"], default="rects")
+    parser.add_argument(
+        "--phosphor", help="let pixels fade out, keeping this fraction of "
+                           "their brightness each frame; implies --renderer "
+                           "array", type=float, default=0.0, metavar="DECAY")
+    parser.add_argument(
+        "--threaded", help="run the CPU in a worker thread, and present "
+                           "frames from the main thread", action="store_true")
+    parser.add_argument(
+        "--mute", help="do not play sound", action="store_true")
+    parser.add_argument(
+        "--profile", help="profile the emulator, and print a report on exit, "
+                          "or write it as JSON to FILE if given",
+        nargs='?', const='', default=None, metavar="FILE")
+    parser.add_argument(
+        "--trace", help="record every instruction executed to FILE",
+        metavar="FILE")
+    return parser.parse_args()
 
-            # Draw a solid blue circle in the center
-            pygame.draw.circle(screen, (0, 0, 255), (250, 250), 75)
 
-            # Flip the display
-            pygame.display.flip()
\ No newline at end of file
+def main_loop(args):
+    """
+    Runs the main emulator loop with the specified arguments.
+
+    :param args: the parsed command line arguments
+    """
+    if args.renderer == "array" or args.phosphor:
+        from chip8.renderer import ArrayDisplay
+        screen = ArrayDisplay(scale_factor=args.scale, decay=args.phosphor)
+    else:
+        screen = Display(scale_factor=args.scale)
+    screen.init_display()
+    audio = NullAudio() if args.mute else Audio()
+    try:
+        audio.open()
+    except error:
+        audio = NullAudio()
+    cpu = Chip8CPU(screen, instructions_per_frame=args.instructions,
+                   audio=audio, keypad=PygameKeypad(), quirks=args.quirks)
+    cpu.load_rom(FONT_FILE, 0)
+    cpu.load_rom(args.rom)
+    if args.profile is not None:
+        profiler = Profiler(cpu)
+        profiler.enable()
+        profiler.dump_at_exit(args.profile or None)
+    tracer = None
+    if args.trace:
+        tracer = TraceRecorder(cpu, args.trace)
+        tracer.enable()
+    try:
+        if args.threaded:
+            Pipeline(cpu, screen).run(uncapped=args.uncapped)
+        else:
+            cpu.run(uncapped=args.uncapped)
+    finally:
+        if tracer is not None:
+            tracer.close()
+        audio.close()
+        screen.destroy()
+
+
+if __name__ == '__main__':
+    main_loop(parse_arguments())
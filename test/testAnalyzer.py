@@ -0,0 +1,174 @@
+import io
+import os
+import tempfile
+import unittest
+
+from contextlib import redirect_stdout
+
+from chip8.analyzer import analyze, analyze_rom, Block, main
+from chip8.chip8 import Chip8CPU
+from chip8.config import MAX_MEMORY
+
+
+def assemble(operands, address=0x200):
+    memory = bytearray(MAX_MEMORY)
+    for operand in operands:
+        memory[address] = operand >> 8
+        memory[address + 1] = operand & 0xFF
+        address += 2
+    return memory
+
+
+class TestAnalyzer(unittest.TestCase):
+
+    def test_blocks_follow_jumps_skips_and_calls(self):
+        memory = assemble([
+            0x6001,  # 200: LOAD V0, 1
+            0x3001,  # 202: SKE  V0, 1
+            0x220C,  # 204: CALL 20C
+            0x7001,  # 206: ADD  V0, 1
+            0x1202,  # 208: JUMP 202
+            0x0000,  # 20A: unreachable
+            0x6102,  # 20C: LOAD V1, 2
+            0x00EE,  # 20E: RTS
+        ])
+        analysis = analyze(memory)
+        self.assertNotIn(0x20A, analysis.instructions)
+        self.assertEqual(Block(0x200, 0x202, (0x202,)),
+                         analysis.blocks[0x200])
+        self.assertEqual(Block(0x202, 0x204, (0x204, 0x206)),
+                         analysis.blocks[0x202])
+        self.assertEqual(Block(0x204, 0x206, (0x206, 0x20C)),
+                         analysis.blocks[0x204])
+        self.assertEqual(Block(0x206, 0x20A, (0x202,)),
+                         analysis.blocks[0x206])
+        self.assertEqual(Block(0x20C, 0x210, ()), analysis.blocks[0x20C])
+        self.assertFalse(analysis.may_self_modify())
+        self.assertTrue(analysis.is_cacheable(0x206))
+
+    def test_computed_jump_with_known_index(self):
+        memory = assemble([
+            0xA200,  # 200: LOAD I, 200
+            0xB008,  # 202: JUMP [I] + 8
+            0x00E0,  # 204: unreachable
+            0x00E0,  # 206: unreachable
+            0x1208,  # 208: JUMP 208
+        ])
+        analysis = analyze(memory)
+        self.assertEqual((0x208,), analysis.blocks[0x200].successors)
+        self.assertNotIn(0x204, analysis.instructions)
+        self.assertFalse(analysis.unresolved_jumps)
+
+    def test_computed_jump_with_unknown_index(self):
+        memory = assemble([0xF029, 0xB008])
+        analysis = analyze(memory)
+        self.assertEqual({0x202}, analysis.unresolved_jumps)
+
+    def test_computed_jump_from_register_is_unresolved(self):
+        memory = assemble([0xA200, 0xB008])
+        analysis = analyze(memory, cpu=Chip8CPU(None, quirks='chip8'))
+        self.assertEqual({0x202}, analysis.unresolved_jumps)
+
+    def test_index_advances_with_increment_quirk(self):
+        memory = assemble([
+            0xA300,  # 200: LOAD I, 300
+            0xF155,  # 202: STOR [I], V1
+            0xF155,  # 204: STOR [I], V1
+            0x1206,  # 206: JUMP 206
+        ])
+        analysis = analyze(memory, cpu=Chip8CPU(None, quirks='chip8'))
+        self.assertEqual({0x300, 0x301, 0x302, 0x303}, analysis.written)
+
+    def test_writes_are_indexed(self):
+        memory = assemble([
+            0xA206,  # 200: LOAD I, 206
+            0xF155,  # 202: STOR [I], V1
+            0x1202,  # 204: JUMP 202
+            0x1200,  # 206: unreachable, but written
+        ])
+        analysis = analyze(memory)
+        self.assertEqual({0x206, 0x207}, analysis.written)
+        self.assertFalse(analysis.may_self_modify())
+
+        memory = assemble([0xA203, 0xF033, 0x1202])
+        analysis = analyze(memory)
+        self.assertEqual({0x203, 0x204, 0x205}, analysis.written)
+        self.assertTrue(analysis.may_self_modify())
+        self.assertFalse(analysis.is_cacheable(0x202))
+        self.assertTrue(analysis.is_cacheable(0x200))
+
+    def test_unknown_writes(self):
+        memory = assemble([0xA300, 0xF01E, 0xF055, 0x1200])
+        analysis = analyze(memory)
+        self.assertEqual({0x204}, analysis.unknown_writes)
+        self.assertTrue(analysis.may_self_modify())
+
+    def test_index_merges_to_unknown(self):
+        memory = assemble([
+            0x3000,  # 200: SKE  V0, 0
+            0xA300,  # 202: LOAD I, 300
+            0xF055,  # 204: STOR [I], V0
+            0x1204,  # 206: JUMP 204
+        ])
+        analysis = analyze(memory)
+        self.assertEqual({0x204}, analysis.unknown_writes)
+
+    def test_xochip_long_loads_and_range_stores(self):
+        memory = assemble([
+            0x3000,  # 200: SKE  V0, 0
+            0xF000,  # 202: LOAD I, 0310
+            0x0310,
+            0x5022,  # 206: STOR [I], V0 - V2
+            0x1206,  # 208: JUMP 206
+        ])
+        analysis = analyze(memory, cpu=Chip8CPU(None, quirks='xochip'))
+        self.assertEqual((0x202, 0x206), analysis.blocks[0x200].successors)
+        self.assertNotIn(0x204, analysis.instructions)
+        self.assertEqual({0x206}, analysis.unknown_writes)
+        memory[0x200:0x202] = b'\x12\x02'
+        analysis = analyze(memory, cpu=Chip8CPU(None, quirks='xochip'))
+        self.assertEqual({0x310, 0x311, 0x312}, analysis.written)
+
+    def test_xochip_range_load_is_not_a_skip(self):
+        memory = assemble([
+            0x5123,  # 200: LOAD V1 - V2, [I]
+            0x1200,  # 202: JUMP 200
+            0x800F,  # 204: data
+        ])
+        analysis = analyze(memory, cpu=Chip8CPU(None, quirks='xochip'))
+        self.assertEqual((0x200,), analysis.blocks[0x200].successors)
+        self.assertNotIn(0x204, analysis.instructions)
+        self.assertFalse(analysis.unknown_opcodes)
+
+    def test_xochip_long_load_and_audio_need_register_zero(self):
+        memory = assemble([0x3000, 0xF100, 0xF102])
+        analysis = analyze(memory, cpu=Chip8CPU(None, quirks='xochip'))
+        self.assertEqual({0x202: 0xF100, 0x204: 0xF102},
+                         analysis.unknown_opcodes)
+
+    def test_unknown_opcodes(self):
+        memory = assemble([0x3000, 0x800F, 0xF0FF])
+        analysis = analyze(memory)
+        self.assertEqual({0x202: 0x800F, 0x204: 0xF0FF},
+                         analysis.unknown_opcodes)
+        self.assertIn('unknown op-code 800F', analysis.report())
+
+    def test_analyze_rom_sizes_memory_from_quirks(self):
+        handle, rom = tempfile.mkstemp(suffix='.xo8')
+        with os.fdopen(handle, 'wb') as output:
+            # JUMP 200, padded out past the end of 4 KB of memory
+            output.write(bytes([0x12, 0x00]) + bytes(MAX_MEMORY))
+        try:
+            with self.assertRaises(ValueError):
+                analyze_rom(rom)
+            analysis = analyze_rom(rom, quirks='xochip')
+            self.assertEqual({0x200: 0x1200}, analysis.instructions)
+            with redirect_stdout(io.StringIO()) as report:
+                self.assertEqual(0, main(['--quirks', 'xochip', rom]))
+            self.assertIn('1 reachable instructions', report.getvalue())
+        finally:
+            os.remove(rom)
+
+
+if __name__ == '__main__':
+    unittest.main()
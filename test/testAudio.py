@@ -0,0 +1,85 @@
+import os
+import unittest
+
+from pygame import error, mixer
+
+from chip8.audio import (
+    Audio, NullAudio, pattern_rate, pattern_wave, square_wave
+)
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import Framebuffer
+
+
+class TestAudio(unittest.TestCase):
+
+    def test_square_wave_is_one_period(self):
+        samples = square_wave(441, 44100, 0.5)
+        self.assertEqual(100, len(samples))
+        self.assertEqual([16383] * 50 + [-16383] * 50, list(samples))
+
+    def test_pattern_wave_follows_pitch(self):
+        pattern = bytes([0xF0] * 16)
+        self.assertEqual(4000, pattern_rate(64))
+        self.assertEqual(8000, pattern_rate(112))
+        samples = pattern_wave(pattern, 64, 8000, 0.5)
+        self.assertEqual(256, len(samples))
+        self.assertEqual([16383] * 8 + [-16383] * 8, list(samples[:16]))
+        self.assertEqual(128, len(pattern_wave(pattern, 112, 8000, 0.5)))
+
+    def test_sound_timer_drives_audio(self):
+        audio = NullAudio()
+        cpu = Chip8CPU(Framebuffer(), audio=audio)
+        cpu.memory.store_many(0x200, bytes([0x60, 0x02, 0xF0, 0x18, 0x12,
+                                            0x04]))
+        cpu.run_frame(2)
+        self.assertTrue(audio.playing)
+        cpu.run_frame()
+        self.assertTrue(audio.playing)
+        cpu.run_frame()
+        self.assertFalse(audio.playing)
+        self.assertEqual(1, audio.beeps)
+
+    def test_pattern_replaces_tone(self):
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        audio = Audio()
+        try:
+            audio.open()
+        except error as exception:
+            self.skipTest("no audio device: {}".format(exception))
+        try:
+            audio.update(5)
+            tone = audio.tone
+            audio.load_pattern(None, 100)
+            audio.update(5)
+            self.assertIs(tone, audio.tone)
+            audio.load_pattern(bytes([0xAA] * 16), 64)
+            audio.load_pattern(bytes([0xAA] * 16), 80)
+            self.assertIs(tone, audio.tone)
+            audio.update(5)
+            self.assertIsNot(tone, audio.tone)
+            self.assertEqual(1, audio.tone.get_num_channels())
+        finally:
+            audio.close()
+
+    def test_mixer_plays_while_timer_runs(self):
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        audio = Audio()
+        try:
+            audio.open()
+        except error as exception:
+            self.skipTest("no audio device: {}".format(exception))
+        try:
+            audio.update(5)
+            self.assertTrue(audio.playing)
+            self.assertEqual(1, audio.tone.get_num_channels())
+            audio.update(4)
+            self.assertEqual(1, audio.tone.get_num_channels())
+            audio.update(0)
+            self.assertFalse(audio.playing)
+        finally:
+            audio.close()
+        self.assertFalse(mixer.get_init())
+
+
+if __name__ == '__main__':
+    unittest.main()
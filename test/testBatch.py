@@ -0,0 +1,90 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from chip8.batch import main, run_rom
+
+# LOAD V0, 5; LOAD I, sprite 5; DRAW V0, V0, 5; RAND V1, 0xFF; JUMP 0x206
+PROGRAM = bytes([0x60, 0x05, 0xF0, 0x29, 0xD0, 0x05, 0xC1, 0xFF, 0x12, 0x06])
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.rom = tempfile.mkstemp(suffix='.ch8')
+        with os.fdopen(handle, 'wb') as rom:
+            rom.write(PROGRAM)
+
+    def tearDown(self):
+        os.remove(self.rom)
+
+    def test_run_rom_is_deterministic(self):
+        first = run_rom(self.rom, cycles=500, seed=7, font=None)
+        second = run_rom(self.rom, cycles=500, seed=7, font=None)
+        for key in ('registers', 'framebuffer', 'instructions'):
+            self.assertEqual(first[key], second[key])
+        self.assertEqual(500, first['instructions'])
+        self.assertIsNone(first['error'])
+
+    def test_run_rom_frames(self):
+        result = run_rom(self.rom, frames=6, instructions_per_frame=5,
+                         font=None)
+        self.assertEqual(6, result['frames'])
+        self.assertEqual(30, result['instructions'])
+
+    def test_run_rom_reports_unknown_op_codes(self):
+        with open(self.rom, 'wb') as rom:
+            rom.write(bytes([0x80, 0x0F]))
+        result = run_rom(self.rom, cycles=10, font=None)
+        self.assertIn('800F', result['error'])
+
+    def test_run_rom_reports_missing_rom(self):
+        missing = self.rom + '.missing'
+        result = run_rom(missing, cycles=10, font=None)
+        self.assertIn(missing, result['error'])
+        self.assertEqual(0, result['instructions'])
+        output = io.StringIO()
+        main([missing, self.rom, '-c', '10', '-j', '1'], output)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertIsNotNone(lines[0]['error'])
+        self.assertIsNone(lines[1]['error'])
+
+    def test_run_rom_profile(self):
+        result = run_rom(self.rom, cycles=50, font=None, profile=True)
+        self.assertEqual(24, result['profile']['opcodes']['Cxnn']['count'])
+        self.assertNotIn('profile', run_rom(self.rom, cycles=50, font=None))
+
+    def test_main_writes_one_line_per_rom(self):
+        output = io.StringIO()
+        main([self.rom, self.rom, '-c', '200', '-j', '2', '--seed', '3'],
+             output)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(2, len(lines))
+        self.assertEqual(lines[0]['registers'], lines[1]['registers'])
+        self.assertEqual(lines[0]['registers'],
+                         run_rom(self.rom, cycles=200, seed=3)['registers'])
+
+    def test_main_rejects_missing_font(self):
+        with self.assertRaises(SystemExit):
+            main([self.rom, '--font', self.rom + '.missing'], io.StringIO())
+
+    def test_main_finds_default_font_from_any_directory(self):
+        output = io.StringIO()
+        directory = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        try:
+            main([self.rom, '-c', '200', '-j', '1'], output)
+        finally:
+            os.chdir(directory)
+        result = json.loads(output.getvalue())
+        self.assertEqual(run_rom(self.rom, cycles=200)['framebuffer'],
+                         result['framebuffer'])
+        self.assertNotEqual(
+            run_rom(self.rom, cycles=200, font=None)['framebuffer'],
+            result['framebuffer'])
+
+
+if __name__ == '__main__':
+    unittest.main()
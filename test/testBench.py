@@ -0,0 +1,53 @@
+import io
+import unittest
+
+from bench.startup import measure_startup
+from bench.suite import compare, run_suite
+from bench.workloads import WORKLOADS, assemble
+
+
+class TestBench(unittest.TestCase):
+
+    def test_workloads_run(self):
+        results = run_suite(backends=['interpreter', 'jit'], frames=2,
+                            instructions_per_frame=50, repeat=1,
+                            output=io.StringIO())
+        self.assertEqual(set(WORKLOADS), set(results['results']))
+        for backends in results['results'].values():
+            # The compiler runs whole blocks, so it may run a few extra
+            self.assertEqual(100, backends['interpreter']['instructions'])
+            self.assertGreaterEqual(backends['jit']['instructions'], 100)
+            self.assertGreater(backends['jit']['instructions_per_second'], 0)
+
+    def test_default_profile_backends_skip_xochip(self):
+        output = io.StringIO()
+        results = run_suite(workloads=['xochip'], backends=['vector'],
+                            frames=1, repeat=1, output=output)
+        self.assertEqual({}, results['results'])
+        self.assertIn('needs the xochip quirk profile', output.getvalue())
+
+    def test_startup_does_not_load_pygame(self):
+        results = measure_startup(repeat=1, output=io.StringIO())
+        self.assertFalse(results['headless']['pygame_loaded'])
+        self.assertTrue(results['pygame']['pygame_loaded'])
+        self.assertGreater(results['headless']['first_instruction'], 0)
+
+    def test_assemble_rejects_overlapping_data(self):
+        with self.assertRaises(ValueError):
+            assemble([0x1200] * 0x81, b'\x00')
+
+    def test_compare_flags_regressions(self):
+        def results(speed):
+            return {'results': {'alu': {'jit': {
+                'instructions_per_second': speed,
+                'frames_per_second': speed / 10}}}}
+
+        rows = compare(results(100.0), results(90.0), threshold=0.05)
+        self.assertEqual(2, len(rows))
+        self.assertTrue(all(row[-1] for row in rows))
+        rows = compare(results(100.0), results(97.0), threshold=0.05)
+        self.assertFalse(any(row[-1] for row in rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+import tracemalloc
+import unittest
+
+from chip8.chip8 import CPU_INSTANCE_BYTES, Chip8CPU, UnknownOpCodeException
+from chip8.framebuffer import Framebuffer
+
+
+class TestChip8CPU(unittest.TestCase):
+
+    def setUp(self):
+        self.screen = Framebuffer()
+        self.cpu = Chip8CPU(self.screen)
+
+    def load(self, address, *operands):
+        for operand in operands:
+            self.cpu.memory[address] = operand >> 8
+            self.cpu.memory[address + 1] = operand & 0xFF
+            address += 2
+
+    def test_execute_from_memory_advances_pc(self):
+        self.load(0x200, 0x6A12, 0x7A01)
+        self.assertEqual(0x6A12, self.cpu.execute_instruction())
+        self.assertEqual(0x7A01, self.cpu.execute_instruction())
+        self.assertEqual(0x13, self.cpu.v[0xA])
+        self.assertEqual(0x204, self.cpu.registers.pc)
+
+    def test_decode_cache_reused(self):
+        self.load(0x200, 0x7001, 0x1200)
+        for _ in range(10):
+            self.cpu.execute_instruction()
+        self.assertEqual(5, self.cpu.v[0])
+        self.assertEqual({0x200, 0x202}, set(self.cpu.decode_cache))
+
+    def test_store_regs_invalidates_decode_cache(self):
+        self.load(0x204, 0x6007)
+        self.cpu.registers.pc = 0x204
+        self.cpu.execute_instruction()
+        self.assertEqual(7, self.cpu.v[0])
+
+        self.cpu.v[0] = 0x60
+        self.cpu.v[1] = 0x09
+        self.cpu.execute_instruction(0xA205)
+        self.cpu.execute_instruction(0xF155)
+        self.cpu.registers.pc = 0x204
+        self.cpu.execute_instruction()
+        self.assertEqual(0x6060, self.cpu.operand)
+
+    def test_store_bcd_invalidates_decode_cache(self):
+        self.load(0x300, 0x6100)
+        self.cpu.registers.pc = 0x300
+        self.cpu.execute_instruction()
+        self.cpu.v[2] = 234
+        self.cpu.execute_instruction(0xA2FF)
+        self.cpu.execute_instruction(0xF233)
+        self.cpu.registers.pc = 0x300
+        self.cpu.execute_instruction()
+        self.assertEqual(0x0304, self.cpu.operand)
+
+    def test_call_invalidates_stack_entries(self):
+        sp = self.cpu.registers.sp
+        self.load(sp, 0x6001)
+        self.cpu.registers.pc = sp
+        self.cpu.execute_instruction()
+        self.cpu.registers.pc = 0x234
+        self.cpu.execute_instruction(0x2400)
+        self.assertNotIn(sp, self.cpu.decode_cache)
+
+    def test_call_and_return(self):
+        self.load(0x200, 0x2300)
+        self.load(0x300, 0x00EE)
+        self.cpu.execute_instruction()
+        self.assertEqual(0x300, self.cpu.registers.pc)
+        self.cpu.execute_instruction()
+        self.assertEqual(0x202, self.cpu.registers.pc)
+
+    def test_registers_hold_eight_bit_values(self):
+        self.cpu.v[1] = 0x81
+        self.cpu.execute_instruction(0x812E)  # SHL V1 into V2
+        self.assertEqual(0x02, self.cpu.v[2])
+        self.assertEqual(1, self.cpu.v[0xF])
+        self.cpu.v[3] = 5
+        self.cpu.v[4] = 5
+        self.cpu.execute_instruction(0x8345)  # SUB V3, V4
+        self.assertEqual(0, self.cpu.v[3])
+        self.cpu.execute_instruction(0x73FF)  # ADD V3, 0xFF
+        self.assertEqual(0xFF, self.cpu.v[3])
+
+    def test_registers_snapshot(self):
+        self.cpu.v[0xA] = 7
+        self.cpu.registers.index = 0x345
+        self.cpu.registers.delay = 9
+        snapshot = bytes(self.cpu.registers)
+        self.cpu.reset()
+        self.assertEqual(0, self.cpu.v[0xA])
+        self.cpu.registers.load(snapshot)
+        self.assertEqual(7, self.cpu.v[0xA])
+        self.assertEqual(0x345, self.cpu.registers.index)
+        self.assertEqual(9, self.cpu.registers.delay)
+        self.assertIs(self.cpu.v, self.cpu.registers.v)
+
+    def test_run_frame_decrements_timers(self):
+        self.load(0x200, 0x1200)
+        self.cpu.registers.delay = 5
+        self.cpu.registers.sound = 1
+        self.assertEqual(10, self.cpu.run_frame())
+        self.assertEqual(4, self.cpu.registers.delay)
+        self.assertEqual(0, self.cpu.registers.sound)
+        self.cpu.run_frame()
+        self.assertEqual(0, self.cpu.registers.sound)
+
+    def test_run_frame_stops_on_key_wait(self):
+        self.load(0x200, 0x7001, 0xF50A, 0x1200)
+        self.assertEqual(2, self.cpu.run_frame())
+        self.assertEqual(0x202, self.cpu.registers.pc)
+        self.assertEqual(1, self.cpu.run_frame())
+        self.cpu.keys = 1 << 0xC
+        self.cpu.run_frame(2)
+        self.assertEqual(0xC, self.cpu.v[5])
+        self.assertEqual(0x200, self.cpu.registers.pc)
+
+    def test_run_stops_on_exit(self):
+        self.load(0x200, 0x7001, 0x7001, 0x7001, 0x00FD)
+        self.assertEqual(4, self.cpu.run(1000, uncapped=True))
+        self.assertFalse(self.cpu.running)
+        self.assertEqual(3, self.cpu.v[0])
+
+    def test_run_executes_cycles(self):
+        self.load(0x200, 0x7001, 0x1200)
+        self.assertEqual(25, self.cpu.run(25, uncapped=True))
+        self.assertEqual(13, self.cpu.v[0])
+        self.assertEqual(0, self.cpu.registers.delay)
+
+    def test_run_frame_skips_self_jump(self):
+        self.load(0x200, 0x7001, 0x1202)
+        self.assertEqual(1000, self.cpu.run_frame(1000))
+        self.assertEqual(1, self.cpu.v[0])
+        self.assertEqual(0x202, self.cpu.registers.pc)
+        self.assertGreater(self.cpu.skipped_cycles, 990)
+
+    def test_run_frame_skipping_matches_full_execution(self):
+        reference = Chip8CPU(Framebuffer())
+        reference.is_idle_loop = lambda jump_address, target: False
+        for cpu in (self.cpu, reference):
+            cpu.memory[0x200:0x20E] = bytes([
+                0x60, 0x05, 0xF0, 0x15, 0xF1, 0x07, 0x31, 0x00, 0x12, 0x04,
+                0x72, 0x01, 0x12, 0x00])
+        for cycles in (7, 100, 33, 100, 100, 100, 100, 64):
+            self.assertEqual(reference.run_frame(cycles),
+                             self.cpu.run_frame(cycles))
+            self.assertEqual(bytes(reference.registers),
+                             bytes(self.cpu.registers))
+        self.assertEqual(1, self.cpu.v[2])
+        self.assertGreater(self.cpu.skipped_cycles, 0)
+        self.assertEqual(0, reference.skipped_cycles)
+
+    def test_run_frame_without_skipping_idle_loops(self):
+        cpu = Chip8CPU(Framebuffer(), skip_idle=False)
+        cpu.memory.store_many(0x200, bytes([0x70, 0x01, 0x12, 0x02]))
+        self.assertEqual(1000, cpu.run_frame(1000))
+        self.assertEqual(1, cpu.v[0])
+        self.assertEqual(0x202, cpu.registers.pc)
+        self.assertEqual(0, cpu.skipped_cycles)
+
+    def test_run_frame_skips_idle_loop_after_busy_passes(self):
+        # Counts V0 down to zero, then spins with the same registers
+        self.load(0x200, 0x6020, 0x3000, 0x70FF, 0x1202)
+        reference = Chip8CPU(Framebuffer(), skip_idle=False)
+        reference.memory[:] = self.cpu.memory
+        self.assertEqual(reference.run_frame(2000),
+                         self.cpu.run_frame(2000))
+        self.assertEqual(bytes(reference.registers),
+                         bytes(self.cpu.registers))
+        self.assertGreater(self.cpu.skipped_cycles, 1000)
+
+    def test_run_frame_does_not_skip_random_loop(self):
+        self.load(0x200, 0xC0FF, 0x1200)
+        self.cpu.run_frame(100)
+        self.assertEqual(0, self.cpu.skipped_cycles)
+
+    def test_run_frame_rechecks_loop_after_write(self):
+        self.load(0x200, 0x1200)
+        self.cpu.run_frame(100)
+        self.cpu.memory.store_many(0x200, bytes([0xC0, 0xFF, 0x12, 0x00]))
+        self.cpu.registers.pc = 0x200
+        skipped = self.cpu.skipped_cycles
+        self.cpu.run_frame(100)
+        self.assertEqual(skipped, self.cpu.skipped_cycles)
+
+    def test_dispatch_tables_shared(self):
+        other = Chip8CPU(Framebuffer())
+        for name in ('operation_lookup', 'logical_operation_lookup',
+                     'keyboard_routine_lookup', 'misc_routine_lookup'):
+            self.assertIsInstance(getattr(self.cpu, name), tuple)
+            self.assertIs(getattr(self.cpu, name), getattr(other, name))
+
+    def test_instance_size_within_budget(self):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            cpus = [Chip8CPU(self.screen, seed=seed) for seed in range(100)]
+            size = (tracemalloc.get_traced_memory()[0] - before) / len(cpus)
+        finally:
+            tracemalloc.stop()
+        self.assertLess(size, CPU_INSTANCE_BYTES)
+
+    def test_load_rom(self):
+        self.cpu.load_rom('FONTS.chip8', 0)
+        self.assertEqual([0xF0, 0x90, 0x90, 0x90, 0xF0],
+                         list(self.cpu.memory[0:5]))
+
+    def test_unknown_op_code(self):
+        self.load(0x200, 0x8008)
+        with self.assertRaises(UnknownOpCodeException):
+            self.cpu.execute_instruction()
+        with self.assertRaises(UnknownOpCodeException):
+            self.cpu.execute_instruction(0xF0FF)
+        with self.assertRaises(UnknownOpCodeException):
+            self.cpu.execute_instruction(0xE000)
+
+    def test_snapshot_restore_round_trip(self):
+        self.cpu.load_rom('FONTS.chip8', 0)
+        self.load(0x200, 0x00FF, 0x6A05, 0xAA50, 0xD000, 0xFA15, 0xFA75)
+        for _ in range(6):
+            self.cpu.execute_instruction()
+        snapshot = self.cpu.snapshot()
+        screen = self.screen.to_bytes()
+
+        other = Chip8CPU(Framebuffer())
+        other.restore(snapshot)
+        self.assertEqual(bytes(self.cpu.registers), bytes(other.registers))
+        self.assertEqual(self.cpu.memory, other.memory)
+        self.assertEqual('extended', other.mode)
+        self.assertEqual(screen, other.screen.to_bytes())
+        self.assertEqual(snapshot, other.snapshot())
+
+    def test_restore_drops_decoded_instructions(self):
+        self.load(0x200, 0x6001, 0x1200)
+        snapshot = self.cpu.snapshot()
+        self.load(0x200, 0x6002)
+        self.cpu.execute_instruction()
+        self.assertEqual(2, self.cpu.v[0])
+        self.cpu.restore(snapshot)
+        self.cpu.execute_instruction()
+        self.assertEqual(1, self.cpu.v[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,60 @@
-import unittest2
+import unittest
+from time import monotonic
+
 from chip8.display import Display
 
-class TestDisplay(unittest2.TestCase):
+
+class RecordingDisplay(Display):
+
+    def present(self):
+        self.last_present = monotonic()
+        self.presents += 1
+
+class TestDisplay(unittest.TestCase):
 
     def setUp(self):
-        self.display = Display()
\ No newline at end of file
+        self.display = Display(5)
+
+    def test_everything_dirty_before_first_present(self):
+        self.assertEqual([(0, 0, 64, 32)], self.display.get_dirty_rects())
+
+    def test_dirty_rects_merge_consecutive_rows(self):
+        self.display.presented_rows = list(self.display.rows)
+        self.display.draw_pixel(3, 4, 1)
+        self.display.draw_pixel(10, 5, 1)
+        self.display.draw_pixel(63, 9, 1)
+        self.assertEqual([(3, 4, 8, 2), (63, 9, 1, 1)],
+                         self.display.get_dirty_rects())
+
+    def test_dirty_rects_include_second_plane(self):
+        self.display.presented_rows = list(self.display.rows)
+        self.display.draw_pixel(7, 2, 2)
+        self.assertEqual([(7, 2, 1, 1)], self.display.get_dirty_rects())
+
+    def test_no_dirty_rects_when_unchanged(self):
+        self.display.draw_pixel(3, 4, 1)
+        self.display.presented_rows = list(self.display.rows)
+        self.assertEqual([], self.display.get_dirty_rects())
+
+    def test_capped_update_is_deferred(self):
+        display = RecordingDisplay(5, frame_rate=1)
+        display.update()
+        display.update()
+        self.assertEqual(1, display.presents)
+        self.assertTrue(display.pending)
+        display.flush()
+        self.assertEqual(1, display.presents)
+        display.last_present -= 1
+        display.flush()
+        self.assertEqual(2, display.presents)
+        self.assertFalse(display.pending)
+        display.flush(force=True)
+        self.assertEqual(2, display.presents)
+
+    def test_forced_flush_presents_at_once(self):
+        display = RecordingDisplay(5, frame_rate=1)
+        display.update()
+        display.update()
+        display.flush(force=True)
+        self.assertEqual(2, display.presents)
+        self.assertFalse(display.pending)
@@ -0,0 +1,222 @@
+import random
+import unittest
+
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import (
+    ALL_PLANES, FIRST_PLANE, Framebuffer, SECOND_PLANE
+)
+
+
+class TestFramebuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.screen = Framebuffer()
+        self.screen.init_display()
+
+    def test_starts_blank(self):
+        self.assertEqual([0] * 32, self.screen.rows)
+
+    def test_draw_and_get_pixel(self):
+        self.screen.draw_pixel(0, 0, 1)
+        self.screen.draw_pixel(63, 31, 1)
+        self.assertEqual(1, self.screen.get_pixel(0, 0))
+        self.assertEqual(1, self.screen.get_pixel(63, 31))
+        self.assertEqual(0, self.screen.get_pixel(1, 0))
+        self.assertEqual(1 << 63, self.screen.rows[0])
+        self.assertEqual(1, self.screen.rows[31])
+        self.screen.draw_pixel(0, 0, 0)
+        self.assertEqual(0, self.screen.get_pixel(0, 0))
+
+    def test_clear_screen(self):
+        self.screen.draw_pixel(10, 10, 1)
+        self.screen.clear_screen()
+        self.assertEqual(0, self.screen.get_pixel(10, 10))
+
+    def test_set_extended_and_normal(self):
+        self.screen.draw_pixel(10, 10, 1)
+        self.screen.set_extended()
+        self.assertEqual(128, self.screen.get_width())
+        self.assertEqual(64, self.screen.get_height())
+        self.assertEqual([0] * 64, self.screen.rows)
+        self.screen.set_normal()
+        self.assertEqual(64, self.screen.get_width())
+        self.assertEqual(32, self.screen.get_height())
+
+    def test_scroll_down(self):
+        self.screen.draw_pixel(5, 0, 1)
+        self.screen.scroll_down(3)
+        self.assertEqual(0, self.screen.get_pixel(5, 0))
+        self.assertEqual(1, self.screen.get_pixel(5, 3))
+
+    def test_scroll_down_zero_lines(self):
+        self.screen.draw_pixel(5, 31, 1)
+        self.screen.scroll_down(0)
+        self.assertEqual(1, self.screen.get_pixel(5, 31))
+        self.assertEqual(32, len(self.screen.rows))
+
+    def test_scroll_down_extended(self):
+        self.screen.set_extended()
+        self.screen.draw_pixel(127, 48, 1)
+        self.screen.scroll_down(15)
+        self.assertEqual(0, self.screen.get_pixel(127, 50))
+        self.assertEqual(1, self.screen.get_pixel(127, 63))
+        self.screen.scroll_down(14)
+        self.assertEqual([0] * 64, self.screen.rows)
+        self.assertEqual(64, len(self.screen.rows))
+
+    def test_scroll_down_past_bottom(self):
+        self.screen.draw_pixel(5, 31, 1)
+        self.screen.scroll_down(1)
+        self.assertEqual([0] * 32, self.screen.rows)
+
+    def test_scroll_left(self):
+        self.screen.draw_pixel(5, 1, 1)
+        self.screen.draw_pixel(1, 1, 1)
+        self.screen.scroll_left()
+        self.assertEqual(1, self.screen.get_pixel(1, 1))
+        self.assertEqual(0, self.screen.get_pixel(5, 1))
+        self.assertEqual(1 << 62, self.screen.rows[1])
+
+    def test_scroll_right(self):
+        self.screen.draw_pixel(5, 1, 1)
+        self.screen.draw_pixel(62, 1, 1)
+        self.screen.scroll_right()
+        self.assertEqual(1, self.screen.get_pixel(9, 1))
+        self.assertEqual(0, self.screen.get_pixel(5, 1))
+        self.assertEqual(1 << 54, self.screen.rows[1])
+
+    def draw_sprite_by_pixel(self, x_pos, y_pos, sprite_rows, sprite_width):
+        collision = 0
+        for y_index, sprite_row in enumerate(sprite_rows):
+            y_coord = (y_pos + y_index) % self.screen.get_height()
+            for x_index in range(sprite_width):
+                x_coord = (x_pos + x_index) % self.screen.get_width()
+                color = (sprite_row >> (sprite_width - 1 - x_index)) & 1
+                current_color = self.screen.get_pixel(x_coord, y_coord)
+                if color and current_color:
+                    collision = 1
+                self.screen.draw_pixel(x_coord, y_coord, color ^ current_color)
+        return collision
+
+    def test_draw_sprite_matches_pixel_drawing(self):
+        generator = random.Random(1234)
+        reference = Framebuffer()
+        for extended in (False, True):
+            if extended:
+                self.screen.set_extended()
+                reference.set_extended()
+            sprite_width = 16 if extended else 8
+            for _ in range(200):
+                x_pos = generator.randint(0, 255)
+                y_pos = generator.randint(0, 255)
+                sprite_rows = [generator.getrandbits(sprite_width)
+                               for _ in range(generator.randint(1, 16))]
+                reference.rows = list(self.screen.rows)
+                collision = reference.draw_sprite(
+                    x_pos, y_pos, sprite_rows, sprite_width)
+                expected = self.draw_sprite_by_pixel(
+                    x_pos, y_pos, sprite_rows, sprite_width)
+                self.assertEqual(expected, collision)
+                self.assertEqual(self.screen.rows, reference.rows)
+
+    def test_draw_sprite_clips(self):
+        collision = self.screen.draw_sprite(60, 30, [0xFF, 0xFF, 0xFF],
+                                            wrap=False)
+        self.assertEqual(0, collision)
+        self.assertEqual(0xF, self.screen.rows[30])
+        self.assertEqual(0xF, self.screen.rows[31])
+        self.assertEqual(0, self.screen.rows[0])
+
+    def test_draw_and_get_colors(self):
+        self.screen.draw_pixel(3, 4, 2)
+        self.screen.draw_pixel(5, 4, 3)
+        self.assertEqual(2, self.screen.get_pixel(3, 4))
+        self.assertEqual(3, self.screen.get_pixel(5, 4))
+        self.assertEqual(0, self.screen.get_pixel(4, 4))
+        self.screen.draw_pixel(5, 4, 1)
+        self.assertEqual(1, self.screen.get_pixel(5, 4))
+
+    def test_draw_sprite_on_planes_matches_each_plane(self):
+        generator = random.Random(4321)
+        first = Framebuffer()
+        second = Framebuffer()
+        row_mask = (1 << 64) - 1
+        for wrap in (True, False):
+            for _ in range(200):
+                x_pos = generator.randint(0, 255)
+                y_pos = generator.randint(0, 255)
+                height = generator.randint(1, 15)
+                sprite_rows = [generator.getrandbits(8)
+                               for _ in range(2 * height)]
+                expected = first.draw_sprite(
+                    x_pos, y_pos, sprite_rows[:height], 8, wrap) | \
+                    second.draw_sprite(
+                        x_pos, y_pos, sprite_rows[height:], 8, wrap)
+                collision = self.screen.draw_sprite(
+                    x_pos, y_pos, sprite_rows, 8, wrap, ALL_PLANES)
+                self.assertEqual(expected, collision)
+                self.assertEqual(first.rows, [row & row_mask
+                                              for row in self.screen.rows])
+                self.assertEqual(second.rows, [row >> 64
+                                               for row in self.screen.rows])
+
+    def test_draw_sprite_on_second_plane(self):
+        self.screen.draw_sprite(60, 0, [0xFF], 8, True, SECOND_PLANE)
+        self.assertEqual(0, self.screen.rows[0] & ((1 << 64) - 1))
+        self.assertEqual(2, self.screen.get_pixel(63, 0))
+        self.assertEqual(2, self.screen.get_pixel(0, 0))
+        self.assertEqual(0, self.screen.draw_sprite(0, 0, [0x80]))
+
+    def test_planes_cleared_and_scrolled_separately(self):
+        self.screen.draw_pixel(8, 1, 3)
+        self.screen.scroll_down(2, SECOND_PLANE)
+        self.assertEqual(1, self.screen.get_pixel(8, 1))
+        self.assertEqual(2, self.screen.get_pixel(8, 3))
+        self.screen.scroll_up(2, SECOND_PLANE)
+        self.assertEqual(3, self.screen.get_pixel(8, 1))
+        self.screen.scroll_left(FIRST_PLANE)
+        self.assertEqual(1, self.screen.get_pixel(4, 1))
+        self.assertEqual(2, self.screen.get_pixel(8, 1))
+        self.screen.scroll_right(ALL_PLANES)
+        self.assertEqual(1, self.screen.get_pixel(8, 1))
+        self.assertEqual(2, self.screen.get_pixel(12, 1))
+        self.screen.clear_screen(FIRST_PLANE)
+        self.assertEqual(0, self.screen.get_pixel(8, 1))
+        self.assertEqual(2, self.screen.get_pixel(12, 1))
+
+    def test_scroll_keeps_planes_apart(self):
+        self.screen.draw_pixel(0, 0, 2)
+        self.screen.draw_pixel(63, 0, 2)
+        self.screen.scroll_left()
+        self.assertEqual(2, self.screen.get_pixel(59, 0))
+        self.assertEqual(1 << 68, self.screen.rows[0])
+        self.screen.scroll_right()
+        self.assertEqual(1 << 64, self.screen.rows[0])
+        self.screen.scroll_right()
+        self.assertEqual(0, self.screen.rows[0])
+
+    def test_bytes_round_trip_both_planes(self):
+        self.screen.draw_pixel(1, 2, 1)
+        self.assertEqual(256, len(self.screen.to_bytes()))
+        self.screen.draw_pixel(9, 3, 2)
+        data = self.screen.to_bytes()
+        self.assertEqual(512, len(data))
+        restored = Framebuffer()
+        restored.load_bytes(data)
+        self.assertEqual(self.screen.rows, restored.rows)
+
+    def test_cpu_runs_headless(self):
+        cpu = Chip8CPU(self.screen)
+        cpu.memory[0x300] = 0xF0
+        cpu.execute_instruction(0x6005)  # LOAD V0, 5
+        cpu.execute_instruction(0xA300)  # LOAD I, 0x300
+        cpu.execute_instruction(0xD001)  # DRAW V0, V0, 1
+        self.assertEqual(0xF << (64 - 4 - 5), self.screen.rows[5])
+        self.assertEqual(0, cpu.v[0xF])
+        cpu.execute_instruction(0xD001)
+        self.assertEqual(0, self.screen.rows[5])
+        self.assertEqual(1, cpu.v[0xF])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import random
+import unittest
+
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import Framebuffer
+from chip8.jit import BlockJIT
+from chip8.quirks import PROFILES
+
+# Instruction templates the compiler translates, with the fields that are
+# filled in at random: x, y, nn and a jump target within the program.
+TEMPLATES = [
+    0x6000, 0x7000, 0x8000, 0x8001, 0x8002, 0x8003, 0x8004, 0x8005, 0x8006,
+    0x8007, 0x800E, 0x3000, 0x4000, 0x5000, 0x9000, 0xA000, 0xC000, 0xF007,
+    0xF015, 0xF018, 0xF01E, 0xF029, 0xF030, 0xF065, 0xF075, 0xF085, 0x1000,
+]
+
+
+class TestBlockJIT(unittest.TestCase):
+
+    def make_program(self, generator, length):
+        program = []
+        for _ in range(length):
+            template = generator.choice(TEMPLATES)
+            if template == 0x1000:
+                target = 0x200 + 2 * generator.randrange(length)
+                program.append(0x1000 | target)
+            elif template == 0xA000:
+                program.append(0xA000 | generator.randrange(0x300, 0x400))
+            elif template == 0xF065:
+                program.append(0xF065 | generator.randrange(16) << 8)
+            elif template & 0xF000 in (0x5000, 0x8000, 0x9000):
+                program.append(template | generator.randrange(16) << 8 |
+                               generator.randrange(16) << 4)
+            elif template & 0xF000 == 0xF000:
+                program.append(template | generator.randrange(16) << 8)
+            else:
+                program.append(template | generator.randrange(16) << 8 |
+                               generator.randrange(256))
+        return program
+
+    def make_cpu(self, program, seed=None, quirks='legacy'):
+        cpu = Chip8CPU(Framebuffer(), seed=seed, quirks=quirks)
+        for offset, operand in enumerate(program):
+            cpu.memory[0x200 + offset * 2] = operand >> 8
+            cpu.memory[0x201 + offset * 2] = operand & 0xFF
+        cpu.execute_instruction(0xA300)
+        return cpu
+
+    def state(self, cpu):
+        return bytes(cpu.registers), cpu.operand
+
+    def test_matches_interpreter(self):
+        generator = random.Random(42)
+        for seed in range(50):
+            program = self.make_program(generator, 40)
+            interpreter = self.make_cpu(program, seed)
+            compiled = self.make_cpu(program, seed)
+            jit = BlockJIT(compiled)
+
+            for _ in range(100):
+                for _ in range(jit.execute_block()):
+                    interpreter.execute_instruction()
+                self.assertEqual(self.state(interpreter),
+                                 self.state(compiled))
+
+    def test_matches_interpreter_for_each_profile(self):
+        generator = random.Random(7)
+        for quirks in sorted(PROFILES):
+            for seed in range(10):
+                program = self.make_program(generator, 40)
+                interpreter = self.make_cpu(program, seed, quirks)
+                compiled = self.make_cpu(program, seed, quirks)
+                jit = BlockJIT(compiled)
+
+                for _ in range(100):
+                    for _ in range(jit.execute_block()):
+                        interpreter.execute_instruction()
+                    self.assertEqual(self.state(interpreter),
+                                     self.state(compiled))
+
+    def test_computed_jump_follows_profile(self):
+        for quirks, target in (('legacy', 0x310), ('chip8', 0x114),
+                               ('schip', 0x116)):
+            cpu = self.make_cpu([0x6004, 0x6106, 0xB110], quirks=quirks)
+            cpu.execute_instruction(0xA200)
+            jit = BlockJIT(cpu)
+            self.assertEqual(3, jit.execute_block())
+            self.assertEqual(target, cpu.registers.pc)
+
+    def test_skips_over_long_index_load(self):
+        for value, target in ((0, 0x208), (1, 0x204)):
+            cpu = self.make_cpu([0x6000 | value, 0x3000, 0xF000, 0x1234],
+                                quirks='xochip')
+            cpu.registers.pc = 0x200
+            jit = BlockJIT(cpu)
+            self.assertEqual(2, jit.execute_block())
+            self.assertEqual(target, cpu.registers.pc)
+
+    def test_blocks_end_at_branches(self):
+        cpu = self.make_cpu([0x6001, 0x7001, 0x3003, 0x1200, 0x00E0])
+        jit = BlockJIT(cpu)
+        self.assertEqual(3, jit.execute_block())
+        self.assertEqual(0x206, cpu.registers.pc)
+        self.assertEqual(1, jit.execute_block())
+        self.assertEqual(0x200, cpu.registers.pc)
+
+    def test_interprets_uncompilable_instructions(self):
+        cpu = self.make_cpu([0x00E0, 0x6001])
+        jit = BlockJIT(cpu)
+        self.assertEqual(1, jit.execute_block())
+        self.assertEqual(0x202, cpu.registers.pc)
+        self.assertIsNone(jit.blocks[0x200][0])
+
+    def test_memory_writes_invalidate_blocks(self):
+        cpu = self.make_cpu([0x6007, 0x1200])
+        jit = BlockJIT(cpu)
+        jit.execute_block()
+        self.assertEqual(7, cpu.v[0])
+        self.assertIn(0x200, jit.blocks)
+
+        cpu.v[0] = 0x60
+        cpu.v[1] = 0x09
+        cpu.execute_instruction(0xA200)
+        cpu.execute_instruction(0xF155)
+        self.assertNotIn(0x200, jit.blocks)
+        jit.execute_block()
+        self.assertEqual(9, cpu.v[0])
+
+    def test_run_stops_when_not_running(self):
+        cpu = self.make_cpu([0x7001, 0x00FD])
+        jit = BlockJIT(cpu)
+        self.assertEqual(2, jit.run(1000))
+        self.assertFalse(cpu.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
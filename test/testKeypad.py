@@ -0,0 +1,77 @@
+import unittest
+
+from pygame import KEYDOWN, KEYUP, QUIT, K_4, K_g, K_m, K_v, K_z
+from pygame.event import Event
+
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import Framebuffer
+from chip8.keypad import PygameKeypad, keys_to_mask
+
+
+class TestKeypad(unittest.TestCase):
+
+    def setUp(self):
+        self.keypad = PygameKeypad()
+
+    def test_key_events_set_and_clear_bits(self):
+        keys, closed = self.keypad.gather(0, [
+            Event(KEYDOWN, key=K_g), Event(KEYDOWN, key=K_m),
+            Event(KEYDOWN, key=K_4), Event(KEYUP, key=K_4)])
+        self.assertEqual(0x8001, keys)
+        self.assertFalse(closed)
+        keys, closed = self.keypad.gather(keys, [Event(KEYUP, key=K_g)])
+        self.assertEqual(0x8000, keys)
+
+    def test_other_keys_ignored(self):
+        keys, closed = self.keypad.gather(0x0010, [
+            Event(KEYDOWN, key=K_z), Event(KEYUP, key=K_z)])
+        self.assertEqual(0x0010, keys)
+
+    def test_quit_reported(self):
+        keys, closed = self.keypad.gather(
+            0, [Event(QUIT), Event(KEYDOWN, key=K_v)])
+        self.assertEqual(1 << 0xC, keys)
+        self.assertTrue(closed)
+
+    def test_poll_without_display_keeps_keys(self):
+        self.assertEqual((0x0101, False), self.keypad.poll(0x0101))
+
+    def test_keys_to_mask(self):
+        pressed = [False] * 16
+        pressed[0x3] = pressed[0xE] = True
+        self.assertEqual(0x4008, keys_to_mask(pressed))
+
+
+class TestKeypadInstructions(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu = Chip8CPU(Framebuffer())
+        self.cpu.v[1] = 0x5
+
+    def test_skip_if_key_pressed(self):
+        self.cpu.registers.pc = 0x200
+        self.cpu.execute_instruction(0xE19E)
+        self.assertEqual(0x200, self.cpu.registers.pc)
+        self.cpu.keys = 1 << 0x5
+        self.cpu.execute_instruction(0xE19E)
+        self.assertEqual(0x202, self.cpu.registers.pc)
+
+    def test_skip_if_key_not_pressed(self):
+        self.cpu.registers.pc = 0x200
+        self.cpu.keys = 1 << 0x5
+        self.cpu.execute_instruction(0xE1A1)
+        self.assertEqual(0x200, self.cpu.registers.pc)
+        self.cpu.keys = 1 << 0x4
+        self.cpu.execute_instruction(0xE1A1)
+        self.assertEqual(0x202, self.cpu.registers.pc)
+
+    def test_wait_for_keypress_takes_lowest_key(self):
+        self.cpu.registers.pc = 0x202
+        self.cpu.keys = (1 << 0x9) | (1 << 0x6)
+        self.cpu.execute_instruction(0xF30A)
+        self.assertEqual(0x6, self.cpu.v[3])
+        self.assertEqual(0x202, self.cpu.registers.pc)
+
+
+if __name__ == '__main__':
+    unittest.main()
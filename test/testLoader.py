@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from chip8 import loader
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import Framebuffer
+
+PROGRAM = bytes([0x60, 0x05, 0x12, 0x00])
+
+
+class TestLoader(unittest.TestCase):
+
+    def setUp(self):
+        loader.clear_cache()
+        self.directory = tempfile.mkdtemp()
+        self.rom = self.write('rom.ch8', PROGRAM)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        loader.clear_cache()
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as image_file:
+            image_file.write(data)
+        return path
+
+    def test_load_image(self):
+        self.assertEqual(PROGRAM, loader.load_image(self.rom))
+        self.assertEqual(b'', loader.load_image(self.write('empty.ch8', b'')))
+
+    def test_identical_images_are_shared(self):
+        copy = self.write('copy.ch8', PROGRAM)
+        first = loader.load_image(self.rom)
+        self.assertIs(first, loader.load_image(copy))
+        self.assertIs(first, loader.load_image(self.rom))
+        self.assertEqual(1, len(loader.IMAGE_CACHE))
+
+    def test_changed_file_is_reloaded(self):
+        loader.load_image(self.rom)
+        with open(self.rom, 'wb') as image_file:
+            image_file.write(b'\x00\xE0')
+        status = os.stat(self.rom)
+        os.utime(self.rom, ns=(status.st_atime_ns,
+                               status.st_mtime_ns + 1000000000))
+        self.assertEqual(b'\x00\xE0', loader.load_image(self.rom))
+
+    def test_prewarm(self):
+        digests = loader.prewarm([self.rom, 'FONTS.chip8'])
+        self.assertEqual(2, len(digests))
+        self.assertEqual(set(digests), set(loader.IMAGE_CACHE))
+
+    def test_cpu_loads_from_cache(self):
+        cpu = Chip8CPU(Framebuffer())
+        cpu.load_rom(self.rom)
+        self.assertEqual(PROGRAM, bytes(cpu.memory[0x200:0x204]))
+        with self.assertRaises(ValueError):
+            cpu.load_rom(self.rom, len(cpu.memory) - 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
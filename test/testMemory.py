@@ -0,0 +1,59 @@
+import unittest
+
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import Framebuffer
+from chip8.memory import Memory
+
+
+class TestMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.memory = Memory()
+
+    def test_store_and_fetch(self):
+        self.memory.store_byte(0x10, 0x1FF)
+        self.memory.store_word(0x20, 0xABCD)
+        self.memory.store_many(0x30, b'\x01\x02\x03')
+        self.assertEqual(0xFF, self.memory.fetch_byte(0x10))
+        self.assertEqual(0xABCD, self.memory.fetch_word(0x20))
+        self.assertEqual(b'\x01\x02\x03', bytes(self.memory.fetch_many(0x30, 3)))
+
+    def test_fetch_many_is_a_view(self):
+        view = self.memory.fetch_many(0x100, 4)
+        self.memory[0x101] = 0x42
+        self.assertEqual(0x42, view[1])
+
+    def test_bounds_are_checked(self):
+        with self.assertRaises(ValueError):
+            self.memory.store_many(0xFFE, b'\x00\x00\x00')
+        with self.assertRaises(ValueError):
+            self.memory.fetch_many(0xFFF, 2)
+        with self.assertRaises(ValueError):
+            self.memory.fetch_word(-1)
+
+    def test_watchers_see_overlapping_writes(self):
+        writes = []
+        watcher = self.memory.watch(lambda *write: writes.append(write),
+                                    0x200, 0x300)
+        self.memory.store_many(0x1FE, b'\x00\x00')
+        self.memory.store_many(0x1FF, b'\x00\x00')
+        self.memory.store_word(0x300, 0)
+        self.memory.store_byte(0x2FF, 0)
+        self.assertEqual([(0x1FF, 2), (0x2FF, 1)], writes)
+        self.memory.unwatch(watcher)
+        self.memory.store_byte(0x250, 0)
+        self.assertEqual(2, len(writes))
+
+    def test_cpu_writes_notify_watchers(self):
+        cpu = Chip8CPU(Framebuffer())
+        writes = []
+        cpu.memory.watch(lambda *write: writes.append(write))
+        cpu.registers.index = 0x300
+        cpu.execute_instruction(0xF255)
+        cpu.execute_instruction(0xF033)
+        cpu.execute_instruction(0x2400)
+        self.assertEqual([(0x300, 3), (0x300, 3), (0xB4, 2)], writes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import time
+import unittest
+
+from chip8.chip8 import Chip8CPU, UnknownOpCodeException
+from chip8.display import Display
+from chip8.framebuffer import Framebuffer
+from chip8.pipeline import Frame, FrameQueue, Pipeline
+
+
+class SlowScreen(Framebuffer):
+
+    def update(self):
+        time.sleep(0.002)
+
+
+class CappedScreen(Display):
+
+    def __init__(self):
+        Display.__init__(self, 1, frame_rate=1)
+        self.shown = None
+
+    def present(self):
+        self.last_present = time.monotonic()
+        self.shown = self.to_bytes()
+
+
+class TestFrameQueue(unittest.TestCase):
+
+    def test_drops_oldest_when_full(self):
+        frames = FrameQueue(2)
+        for number in range(5):
+            frames.put(Frame(number, 64, 32, b''))
+        self.assertEqual(2, frames.get_depth())
+        self.assertEqual(5, frames.published)
+        self.assertEqual(3, frames.dropped)
+        self.assertEqual(3, frames.get().number)
+        self.assertEqual(4, frames.get().number)
+
+    def test_get_times_out_and_finishes(self):
+        frames = FrameQueue()
+        self.assertIsNone(frames.get(0.001))
+        frames.put(Frame(0, 64, 32, b''))
+        frames.close()
+        self.assertFalse(frames.is_finished())
+        self.assertEqual(0, frames.get().number)
+        self.assertTrue(frames.is_finished())
+        self.assertIsNone(frames.get())
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.screen = Framebuffer()
+        self.cpu = Chip8CPU(self.screen, instructions_per_frame=4, seed=3)
+        self.cpu.load_rom('FONTS.chip8', 0)
+        # Draws digits at a moving position, forever
+        self.cpu.memory.store_many(0x200, bytes([
+            0x60, 0x00, 0xF0, 0x29, 0xD0, 0x05, 0x70, 0x01, 0x12, 0x02]))
+
+    def test_presents_final_frame(self):
+        pipeline = Pipeline(self.cpu, self.screen)
+        self.assertEqual(400, pipeline.run(400, uncapped=True))
+        reference = Chip8CPU(Framebuffer(), instructions_per_frame=4, seed=3)
+        reference.load_rom('FONTS.chip8', 0)
+        reference.memory.store_many(0x200, self.cpu.memory[0x200:0x20A])
+        reference.run(400, uncapped=True)
+        self.assertEqual(reference.screen.to_bytes(), self.screen.to_bytes())
+        self.assertIs(self.screen, self.cpu.screen)
+        self.assertNotIn('poll_input', vars(self.cpu))
+        self.assertTrue(self.cpu.running)
+        stats = pipeline.get_stats()
+        self.assertEqual(100, stats['published'])
+        self.assertEqual(stats['published'],
+                         stats['presented'] + stats['dropped'])
+        self.assertEqual(0, stats['depth'])
+
+    def test_capped_screen_shows_final_frame(self):
+        self.screen = CappedScreen()
+        self.cpu.screen = self.screen
+        Pipeline(self.cpu, self.screen).run(400, uncapped=True)
+        self.assertGreater(self.screen.skipped_presents, 0)
+        self.assertFalse(self.screen.pending)
+        self.assertEqual(self.screen.to_bytes(), self.screen.shown)
+
+    def test_slow_presenter_drops_frames(self):
+        self.screen = SlowScreen()
+        self.cpu.screen = self.screen
+        pipeline = Pipeline(self.cpu, self.screen, queue_size=2)
+        pipeline.run(4000, uncapped=True)
+        stats = pipeline.get_stats()
+        self.assertEqual(1000, stats['published'])
+        self.assertGreater(stats['dropped'], 0)
+        self.assertLessEqual(stats['max_depth'], 2)
+        self.assertEqual(stats['published'],
+                         stats['presented'] + stats['dropped'])
+
+    def test_errors_raised_on_calling_thread(self):
+        self.cpu.memory.store_many(0x200, bytes([0x80, 0x08]))
+        pipeline = Pipeline(self.cpu, self.screen)
+        with self.assertRaises(UnknownOpCodeException):
+            pipeline.run(100, uncapped=True)
+        self.assertIs(self.screen, self.cpu.screen)
+
+
+if __name__ == '__main__':
+    unittest.main()
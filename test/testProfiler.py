@@ -0,0 +1,67 @@
+import unittest
+
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import Framebuffer
+from chip8.profiler import Profiler, TimedScreen
+
+# LOAD V0, 5; ADD V0, V1; LOAD I, sprite 5; DRAW V0, V0, 5; JUMP 0x200
+PROGRAM = [0x6005, 0x8014, 0xF029, 0xD005, 0x1200]
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.screen = Framebuffer()
+        self.cpu = Chip8CPU(self.screen)
+        self.cpu.load_rom('FONTS.chip8', 0)
+        for offset, operand in enumerate(PROGRAM):
+            self.cpu.memory[0x200 + offset * 2] = operand >> 8
+            self.cpu.memory[0x201 + offset * 2] = operand & 0xFF
+        self.profiler = Profiler(self.cpu)
+
+    def test_counts_opcodes_addresses_and_screen_calls(self):
+        self.profiler.enable()
+        self.cpu.run_frame(50)
+        statistics = self.profiler.to_dict()
+        for label in ('6xnn', '8xy4', 'Fx29', 'Dxyn', '1nnn'):
+            self.assertEqual(10, statistics['opcodes'][label]['count'])
+        self.assertEqual(10, statistics['addresses']['0x206']['count'])
+        self.assertEqual(10, statistics['screen']['draw_sprite']['count'])
+        self.assertEqual(1, statistics['screen']['update']['count'])
+        self.assertNotIn('Fx55', statistics['opcodes'])
+        self.assertIn('Dxyn', self.profiler.report())
+
+    def test_disable_restores_tables_and_screen(self):
+        tables = (self.cpu.operation_lookup, self.cpu.misc_routine_lookup)
+        self.profiler.enable()
+        self.assertIsInstance(self.cpu.screen, TimedScreen)
+        self.cpu.run_frame(5)
+        self.profiler.disable()
+        self.assertIs(self.screen, self.cpu.screen)
+        self.assertIs(tables[0], self.cpu.operation_lookup)
+        self.assertIs(tables[1], self.cpu.misc_routine_lookup)
+        self.cpu.run_frame(5)
+        self.assertEqual(1, self.profiler.to_dict()['opcodes']['Dxyn']['count'])
+
+    def test_idle_loops_not_skipped_while_profiling(self):
+        self.cpu.memory.store_many(0x200, bytes([0x12, 0x00]))
+        self.profiler.enable()
+        self.assertFalse(self.cpu.skip_idle)
+        self.cpu.run_frame(100)
+        statistics = self.profiler.to_dict()
+        self.assertEqual(100, statistics['opcodes']['1nnn']['count'])
+        self.profiler.disable()
+        self.assertTrue(self.cpu.skip_idle)
+
+    def test_profiled_run_matches_unprofiled_run(self):
+        other = Chip8CPU(Framebuffer())
+        other.memory[:] = self.cpu.memory
+        self.profiler.enable()
+        self.cpu.run_frame(37)
+        other.run_frame(37)
+        self.assertEqual(bytes(other.registers), bytes(self.cpu.registers))
+        self.assertEqual(other.screen.to_bytes(), self.screen.to_bytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
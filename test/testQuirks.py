@@ -0,0 +1,241 @@
+import unittest
+
+from chip8.audio import NullAudio
+from chip8.chip8 import Chip8CPU, UnknownOpCodeException
+from chip8.framebuffer import ALL_PLANES, Framebuffer, SECOND_PLANE
+from chip8.quirks import PROFILES, Quirks, get_quirks
+
+
+class TestQuirks(unittest.TestCase):
+
+    def make_cpu(self, quirks):
+        return Chip8CPU(Framebuffer(), quirks=quirks)
+
+    def test_default_profile_is_legacy(self):
+        cpu = Chip8CPU(Framebuffer())
+        self.assertEqual(PROFILES['legacy'], cpu.quirks)
+        self.assertIs(Chip8CPU.OPERATIONS[0xD], cpu.operation_lookup[0xD])
+
+    def test_get_quirks(self):
+        self.assertEqual(PROFILES['schip'], get_quirks('schip'))
+        custom = PROFILES['chip8']._replace(clip=False)
+        self.assertIs(custom, get_quirks(custom))
+        self.assertRaises(ValueError, get_quirks, 'chip48')
+
+    def test_profile_tables_shared(self):
+        first = self.make_cpu('chip8')
+        second = self.make_cpu('chip8')
+        other = self.make_cpu('schip')
+        for name in ('operation_lookup', 'logical_operation_lookup',
+                     'keyboard_routine_lookup', 'misc_routine_lookup'):
+            self.assertIs(getattr(first, name), getattr(second, name))
+        self.assertIsNot(first.logical_operation_lookup,
+                         other.logical_operation_lookup)
+
+    def test_shift_right(self):
+        for quirks, expected in (('legacy', [0x05, 0x02, 0x01]),
+                                 ('chip8', [0x02, 0x04, 0x00]),
+                                 ('schip', [0x02, 0x04, 0x01])):
+            cpu = self.make_cpu(quirks)
+            cpu.v[0] = 0x05
+            cpu.v[1] = 0x04
+            cpu.execute_instruction(0x8016)
+            self.assertEqual(expected, [cpu.v[0], cpu.v[1], cpu.v[0xF]],
+                             quirks)
+
+    def test_shift_left(self):
+        for quirks, expected in (('legacy', [0x81, 0x02, 0x01]),
+                                 ('chip8', [0x08, 0x04, 0x00]),
+                                 ('schip', [0x02, 0x04, 0x01])):
+            cpu = self.make_cpu(quirks)
+            cpu.v[0] = 0x81
+            cpu.v[1] = 0x04
+            cpu.execute_instruction(0x801E)
+            self.assertEqual(expected, [cpu.v[0], cpu.v[1], cpu.v[0xF]],
+                             quirks)
+
+    def test_computed_jump(self):
+        for quirks, expected in (('legacy', 0x510), ('chip8', 0x211),
+                                 ('schip', 0x212)):
+            cpu = self.make_cpu(quirks)
+            cpu.registers.index = 0x300
+            cpu.v[0] = 0x01
+            cpu.v[2] = 0x02
+            cpu.execute_instruction(0xB210)
+            self.assertEqual(expected, cpu.registers.pc, quirks)
+
+    def test_load_store_increment(self):
+        for quirks, expected in (('legacy', 0x300), ('schip', 0x300),
+                                 ('chip8', 0x303), ('xochip', 0x303)):
+            cpu = self.make_cpu(quirks)
+            cpu.registers.index = 0x300
+            cpu.v[0:3] = [1, 2, 3]
+            cpu.execute_instruction(0xF255)
+            self.assertEqual(expected, cpu.registers.index, quirks)
+            cpu.registers.index = 0x300
+            cpu.execute_instruction(0xF265)
+            self.assertEqual(expected, cpu.registers.index, quirks)
+            self.assertEqual([1, 2, 3], list(cpu.v[0:3]))
+
+    def test_logic_resets_flag(self):
+        for quirks, expected in (('legacy', 1), ('chip8', 0), ('schip', 1)):
+            for operand in (0x8011, 0x8012, 0x8013):
+                cpu = self.make_cpu(quirks)
+                cpu.v[0xF] = 1
+                cpu.execute_instruction(operand)
+                self.assertEqual(expected, cpu.v[0xF], quirks)
+
+    def test_sprites_clip_or_wrap(self):
+        for quirks, wrapped in (('legacy', True), ('xochip', True),
+                                ('chip8', False), ('schip', False)):
+            cpu = self.make_cpu(quirks)
+            cpu.memory[0x300] = 0xFF
+            cpu.memory[0x301] = 0xFF
+            cpu.registers.index = 0x300
+            cpu.v[0] = 60
+            cpu.v[1] = 31
+            cpu.execute_instruction(0xD012)
+            self.assertEqual(0x0F, cpu.screen.rows[31] & 0x0F, quirks)
+            self.assertEqual(wrapped, bool(cpu.screen.rows[0]), quirks)
+            self.assertEqual(wrapped,
+                             bool(cpu.screen.rows[31] >> 60), quirks)
+
+    def test_custom_quirks(self):
+        quirks = Quirks(shift='vx', jump='index', increment=True, clip=False,
+                        reset_flag=False, xochip=False)
+        cpu = self.make_cpu(quirks)
+        cpu.v[0] = 0x04
+        cpu.execute_instruction(0x8016)
+        self.assertEqual(0x02, cpu.v[0])
+
+    def test_xochip_memory(self):
+        self.assertEqual(4096, len(self.make_cpu('chip8').memory))
+        self.assertEqual(65536, len(self.make_cpu('xochip').memory))
+
+    def test_long_index_load(self):
+        cpu = self.make_cpu('xochip')
+        cpu.memory.store_many(0x200, bytes([0xF0, 0x00, 0xBE, 0xEF]))
+        cpu.execute_instruction()
+        self.assertEqual(0xBEEF, cpu.registers.index)
+        self.assertEqual(0x204, cpu.registers.pc)
+        self.assertRaises(UnknownOpCodeException,
+                          self.make_cpu('chip8').execute_instruction, 0xF000)
+
+    def test_long_index_load_and_skips_wrap_at_end_of_memory(self):
+        cpu = self.make_cpu('xochip')
+        cpu.memory[0xFFFE:0x10000] = bytes([0xF0, 0x00])
+        cpu.memory.store_many(0x0000, bytes([0xAB, 0xCD]))
+        cpu.registers.pc = 0xFFFE
+        cpu.execute_instruction()
+        self.assertEqual(0xABCD, cpu.registers.index)
+        self.assertEqual(0x0002, cpu.registers.pc)
+        cpu.memory[0xFFFF] = 0xF0
+        cpu.registers.pc = 0xFFFF
+        cpu.execute_instruction(0x3000)
+        self.assertEqual(0x0001, cpu.registers.pc)
+
+    def test_long_index_load_and_audio_need_register_zero(self):
+        cpu = self.make_cpu('xochip')
+        cpu.memory.store_many(0x200, bytes([0xF1, 0x00, 0x12, 0x34]))
+        self.assertRaises(UnknownOpCodeException, cpu.execute_instruction)
+        self.assertEqual(0, cpu.registers.index)
+        self.assertRaises(UnknownOpCodeException, cpu.execute_instruction,
+                          0xF102)
+        self.assertIsNone(cpu.audio_pattern)
+
+    def test_skips_over_long_index_load(self):
+        for operand in (0x3000, 0x4001, 0x5010, 0x9020, 0xE0A1):
+            cpu = self.make_cpu('xochip')
+            cpu.memory.store_many(0x200, bytes([0xF0, 0x00, 0x12, 0x34]))
+            cpu.v[2] = 1
+            cpu.execute_instruction(operand)
+            self.assertEqual(0x204, cpu.registers.pc, hex(operand))
+        cpu = self.make_cpu('xochip')
+        cpu.memory.store_many(0x200, bytes([0xF1, 0x00]))
+        cpu.execute_instruction(0x3000)
+        self.assertEqual(0x202, cpu.registers.pc)
+
+    def test_register_range_store_and_load(self):
+        cpu = self.make_cpu('xochip')
+        cpu.registers.index = 0x8000
+        cpu.v[2:6] = bytes([1, 2, 3, 4])
+        cpu.execute_instruction(0x5252)
+        self.assertEqual([1, 2, 3, 4], list(cpu.memory[0x8000:0x8004]))
+        cpu.execute_instruction(0x5522)
+        self.assertEqual([4, 3, 2, 1], list(cpu.memory[0x8000:0x8004]))
+        self.assertEqual(0x8000, cpu.registers.index)
+        cpu.execute_instruction(0x5A73)
+        self.assertEqual([1, 2, 3, 4], list(cpu.v[7:11]))
+        cpu.execute_instruction(0x57A3)
+        self.assertEqual([4, 3, 2, 1], list(cpu.v[7:11]))
+        self.assertRaises(UnknownOpCodeException, cpu.execute_instruction,
+                          0x5011)
+
+    def test_planes_selected_for_drawing(self):
+        cpu = self.make_cpu('xochip')
+        cpu.memory.store_many(0x300, bytes([0x80, 0xC0]))
+        cpu.registers.index = 0x300
+        cpu.execute_instruction(0xF201)
+        self.assertEqual(SECOND_PLANE, cpu.planes)
+        cpu.execute_instruction(0xD011)
+        self.assertEqual(2, cpu.screen.get_pixel(0, 0))
+        cpu.execute_instruction(0xF301)
+        cpu.execute_instruction(0xD011)
+        self.assertEqual(1, cpu.v[0xF])
+        self.assertEqual(1, cpu.screen.get_pixel(0, 0))
+        self.assertEqual(2, cpu.screen.get_pixel(1, 0))
+        cpu.execute_instruction(0x00E0)
+        self.assertEqual([0] * 32, cpu.screen.rows)
+
+    def test_large_sprite_in_normal_mode(self):
+        cpu = self.make_cpu('xochip')
+        cpu.memory.store_many(0x300, bytes([0xFF] * 32))
+        cpu.registers.index = 0x300
+        cpu.execute_instruction(0xD010)
+        self.assertEqual(0xFFFF << 48, cpu.screen.rows[15])
+        self.assertEqual(0, cpu.screen.rows[16])
+
+    def test_scroll_up(self):
+        cpu = self.make_cpu('xochip')
+        cpu.screen.draw_pixel(0, 5, ALL_PLANES)
+        cpu.execute_instruction(0x00D2)
+        self.assertEqual(1, cpu.screen.get_pixel(0, 3))
+        self.assertEqual(2, cpu.screen.get_pixel(0, 5))
+        cpu.execute_instruction(0xF301)
+        cpu.execute_instruction(0x00D2)
+        self.assertEqual(1, cpu.screen.get_pixel(0, 1))
+        self.assertEqual(2, cpu.screen.get_pixel(0, 3))
+
+    def test_audio_pattern_and_pitch(self):
+        audio = NullAudio()
+        cpu = Chip8CPU(Framebuffer(), audio=audio, quirks='xochip')
+        cpu.memory.store_many(0x300, bytes(range(16)))
+        cpu.registers.index = 0x300
+        cpu.execute_instruction(0xF002)
+        self.assertEqual(bytes(range(16)), audio.pattern)
+        cpu.v[3] = 112
+        cpu.execute_instruction(0xF33A)
+        self.assertEqual(112, audio.pitch)
+        cpu.reset()
+        self.assertIsNone(audio.pattern)
+        self.assertEqual(64, audio.pitch)
+
+    def test_xochip_snapshot_round_trip(self):
+        cpu = self.make_cpu('xochip')
+        cpu.memory[0xFFFF] = 0x42
+        cpu.screen.draw_pixel(7, 7, 3)
+        cpu.execute_instruction(0xF201)
+        cpu.registers.index = 0x300
+        cpu.execute_instruction(0xF002)
+        snapshot = cpu.snapshot()
+        restored = self.make_cpu('xochip')
+        restored.restore(snapshot)
+        self.assertEqual(0x42, restored.memory[0xFFFF])
+        self.assertEqual(3, restored.screen.get_pixel(7, 7))
+        self.assertEqual(SECOND_PLANE, restored.planes)
+        self.assertEqual(bytes(16), restored.audio_pattern)
+        self.assertEqual(snapshot, restored.snapshot())
+
+
+if __name__ == '__main__':
+    unittest.main()
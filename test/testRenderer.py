@@ -0,0 +1,90 @@
+import os
+import unittest
+
+from chip8.display import PIXEL_COLORS
+from chip8.renderer import ArrayDisplay, palette_ramp
+
+OFF = tuple(PIXEL_COLORS[0])
+ON = tuple(PIXEL_COLORS[1])
+
+
+class TestArrayDisplay(unittest.TestCase):
+
+    def setUp(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+    def create(self, decay=0.0):
+        display = ArrayDisplay(3, frame_rate=0, decay=decay)
+        display.init_display()
+        self.addCleanup(display.destroy)
+        return display
+
+    def test_palette_ramp(self):
+        self.assertEqual([(0, 0, 0), (100, 50, 0), (200, 100, 0)],
+                         palette_ramp((0, 0, 0), (200, 100, 0), 3))
+
+    def test_decay_must_be_below_one(self):
+        with self.assertRaises(ValueError):
+            ArrayDisplay(3, decay=1.0)
+
+    def test_present_scales_pixels(self):
+        display = self.create()
+        display.draw_pixel(2, 1, 1)
+        display.draw_pixel(63, 31, 1)
+        display.update()
+        surface = display.surface
+        self.assertEqual((192, 96), surface.get_size())
+        for x_pos, y_pos in ((6, 3), (8, 5), (189, 93), (191, 95)):
+            self.assertEqual(ON, tuple(surface.get_at((x_pos, y_pos))))
+        for x_pos, y_pos in ((5, 3), (9, 5), (0, 0), (188, 95)):
+            self.assertEqual(OFF, tuple(surface.get_at((x_pos, y_pos))))
+
+    def test_unchanged_frame_not_presented(self):
+        display = self.create()
+        presents = display.presents
+        display.update()
+        self.assertEqual(presents, display.presents)
+        self.assertEqual(1, display.skipped_presents)
+
+    def test_phosphor_fades_out(self):
+        display = self.create(decay=0.5)
+        display.draw_pixel(2, 1, 1)
+        display.update()
+        display.draw_pixel(2, 1, 0)
+        shades = []
+        while display.is_fading() or not shades:
+            display.update()
+            shades.append(display.surface.get_at((6, 3))[0])
+        self.assertEqual(sorted(shades, reverse=True), shades)
+        self.assertGreater(shades[0], 0)
+        self.assertLess(shades[0], ON[0])
+        self.assertEqual(0, shades[-1])
+        presents = display.presents
+        display.update()
+        self.assertEqual(presents, display.presents)
+
+    def test_present_draws_plane_colors(self):
+        for decay in (0.0, 0.5):
+            display = self.create(decay)
+            display.draw_pixel(0, 0, 2)
+            display.draw_pixel(1, 0, 3)
+            display.draw_pixel(2, 0, 1)
+            display.update()
+            surface = display.surface
+            self.assertEqual(tuple(PIXEL_COLORS[2]),
+                             tuple(surface.get_at((0, 0))))
+            self.assertEqual(tuple(PIXEL_COLORS[3]),
+                             tuple(surface.get_at((3, 0))))
+            self.assertEqual(ON, tuple(surface.get_at((6, 0))))
+
+    def test_mode_switch_resizes_canvas(self):
+        display = self.create()
+        display.set_extended()
+        display.draw_pixel(127, 63, 1)
+        display.update()
+        self.assertEqual((384, 192), display.surface.get_size())
+        self.assertEqual(ON, tuple(display.surface.get_at((383, 191))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import Framebuffer
+from chip8.rewind import RewindBuffer
+
+
+class TestRewindBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu = Chip8CPU(Framebuffer())
+        self.cpu.load_rom('FONTS.chip8', 0)
+        # Count V0 up, and draw the font glyph for each value
+        program = [0x7001, 0xF029, 0xD115, 0x1200]
+        for offset, operand in enumerate(program):
+            self.cpu.memory[0x200 + offset * 2] = operand >> 8
+            self.cpu.memory[0x201 + offset * 2] = operand & 0xFF
+
+    def run_frames(self, history, frames):
+        snapshots = []
+        for _ in range(frames):
+            self.cpu.run_frame(4)
+            history.record()
+            snapshots.append(self.cpu.snapshot())
+        return snapshots
+
+    def test_rewind_restores_earlier_frames(self):
+        history = RewindBuffer(self.cpu)
+        snapshots = self.run_frames(history, 10)
+        self.assertEqual(9, len(history))
+
+        self.assertEqual(1, history.rewind())
+        self.assertEqual(snapshots[8], self.cpu.snapshot())
+        self.assertEqual(3, history.rewind(3))
+        self.assertEqual(snapshots[5], self.cpu.snapshot())
+
+    def test_rewind_is_limited_by_capacity(self):
+        history = RewindBuffer(self.cpu, capacity=4)
+        snapshots = self.run_frames(history, 10)
+        self.assertEqual(4, len(history))
+        self.assertEqual(4, history.rewind(8))
+        self.assertEqual(snapshots[5], self.cpu.snapshot())
+        self.assertEqual(0, history.rewind())
+
+    def test_recording_continues_after_rewind(self):
+        history = RewindBuffer(self.cpu)
+        snapshots = self.run_frames(history, 5)
+        history.rewind(2)
+        self.run_frames(history, 3)
+        self.assertEqual(5, len(history))
+        history.rewind(3)
+        self.assertEqual(2, len(history))
+        self.assertEqual(snapshots[2], self.cpu.snapshot())
+
+    def test_deltas_are_small(self):
+        history = RewindBuffer(self.cpu)
+        self.run_frames(history, 60)
+        snapshot_size = len(self.cpu.snapshot())
+        self.assertLess(history.get_size(), snapshot_size * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
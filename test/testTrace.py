@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from chip8.chip8 import Chip8CPU
+from chip8.framebuffer import Framebuffer
+from chip8.trace import TraceRecorder, TraceRecord, diff_traces, read_trace
+
+# LOAD V3, 7; ADD V3, 1; LOAD I, 0x300; ADD V4, V3; JUMP 0x202
+PROGRAM = [0x6307, 0x7301, 0xA300, 0x8434, 0x1202]
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, name, instructions, program=PROGRAM, chunk_records=4):
+        cpu = Chip8CPU(Framebuffer())
+        for offset, operand in enumerate(program):
+            cpu.memory[0x200 + offset * 2] = operand >> 8
+            cpu.memory[0x201 + offset * 2] = operand & 0xFF
+        path = os.path.join(self.directory, name)
+        with TraceRecorder(cpu, path, chunk_records) as tracer:
+            cpu.run_frame(instructions)
+        self.assertEqual(instructions, tracer.records)
+        self.assertNotIn('execute_instruction', vars(cpu))
+        return path
+
+    def test_idle_loops_not_skipped_while_recording(self):
+        cpu = Chip8CPU(Framebuffer())
+        cpu.memory.store_many(0x200, bytes([0x12, 0x00]))
+        path = os.path.join(self.directory, 'idle')
+        with TraceRecorder(cpu, path) as tracer:
+            self.assertFalse(cpu.skip_idle)
+            cpu.run_frame(100)
+        self.assertEqual(100, tracer.records)
+        self.assertEqual(0, cpu.skipped_cycles)
+        self.assertTrue(cpu.skip_idle)
+
+    def test_records_round_trip(self):
+        records = list(read_trace(self.record('trace', 6), chunk_records=3))
+        self.assertEqual(6, len(records))
+        self.assertEqual(TraceRecord(0x200, 0x6307, 3, 7, 0, 0), records[0])
+        self.assertEqual(TraceRecord(0x202, 0x7301, 3, 8, 0, 0), records[1])
+        self.assertEqual(TraceRecord(0x204, 0xA300, None, None, 0x300, 0),
+                         records[2])
+        self.assertEqual(TraceRecord(0x206, 0x8434, 4, 8, 0x300, 0),
+                         records[3])
+        self.assertEqual(0x202, records[5].pc)
+
+    def test_identical_traces(self):
+        first = self.record('first', 50)
+        second = self.record('second', 50)
+        self.assertIsNone(diff_traces(first, second, chunk_records=8))
+
+    def test_first_divergence(self):
+        first = self.record('first', 50)
+        changed = list(PROGRAM)
+        changed[3] = 0x8435
+        second = self.record('second', 50, changed)
+        number, first_record, second_record = \
+            diff_traces(first, second, chunk_records=8)
+        self.assertEqual(3, number)
+        self.assertEqual(0x8434, first_record.opcode)
+        self.assertEqual(0x8435, second_record.opcode)
+
+    def test_shorter_trace(self):
+        first = self.record('first', 20)
+        second = self.record('second', 17)
+        number, first_record, second_record = \
+            diff_traces(first, second, chunk_records=8)
+        self.assertEqual(17, number)
+        self.assertIsNotNone(first_record)
+        self.assertIsNone(second_record)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import random
+import unittest
+
+from chip8.chip8 import Chip8CPU, UnknownOpCodeException
+from chip8.framebuffer import Framebuffer
+from chip8.keypad import keys_to_mask
+from chip8.vector import VectorChip8
+
+# Instruction templates for random programs, with the fields that are filled
+# in at random: x, y, n, nn and a jump target within the program.
+TEMPLATES = [
+    0x6000, 0x7000, 0x8000, 0x8001, 0x8002, 0x8003, 0x8004, 0x8005, 0x8006,
+    0x8007, 0x800E, 0x3000, 0x4000, 0x5000, 0x9000, 0xA000, 0xC000, 0xD000,
+    0xE09E, 0xE0A1, 0xF007, 0xF00A, 0xF015, 0xF018, 0xF033, 0xF055, 0xF065,
+    0xF075, 0xF085, 0x1000, 0x00E0, 0x00C0, 0x00FB, 0x00FC, 0x00FE, 0x00FF,
+]
+
+NUM_LANES = 16
+
+
+class TestVectorChip8(unittest.TestCase):
+
+    def make_program(self, generator, length):
+        program = []
+        for _ in range(length):
+            template = generator.choice(TEMPLATES)
+            if template == 0x1000:
+                target = 0x200 + 2 * generator.randrange(length)
+                program.append(0x1000 | target)
+            elif template == 0xA000:
+                program.append(0xA000 | generator.randrange(0x300, 0x3F0))
+            elif template == 0x00C0:
+                program.append(0x00C0 | generator.randrange(16))
+            elif template & 0xF000 == 0x0000:
+                program.append(template)
+            elif template & 0xF000 in (0x5000, 0x8000, 0x9000):
+                program.append(template | generator.randrange(16) << 8 |
+                               generator.randrange(16) << 4)
+            elif template == 0xD000:
+                program.append(template | generator.randrange(16) << 8 |
+                               generator.randrange(16) << 4 |
+                               generator.randrange(16))
+            elif template & 0xF000 in (0xE000, 0xF000):
+                program.append(template | generator.randrange(16) << 8)
+            else:
+                program.append(template | generator.randrange(16) << 8 |
+                               generator.randrange(256))
+        program.append(0x1200)
+        return bytes(byte for operand in program
+                     for byte in (operand >> 8, operand & 0xFF))
+
+    def make_cpu(self, program, seed):
+        cpu = Chip8CPU(Framebuffer(), seed=seed)
+        cpu.memory[0x200:0x200 + len(program)] = program
+        cpu.execute_instruction(0xA300)
+        return cpu
+
+    def assert_lane_matches(self, machines, lane, cpu):
+        self.assertEqual(machines.get_register_bytes(lane),
+                         bytes(cpu.registers))
+        self.assertEqual(machines.memory[lane].tobytes(), bytes(cpu.memory))
+        self.assertEqual(machines.get_screen_bytes(lane),
+                         cpu.screen.to_bytes())
+        self.assertEqual(bool(machines.running[lane]), cpu.running)
+
+    def test_lanes_match_scalar_cpu(self):
+        generator = random.Random(7)
+        for trial in range(5):
+            programs = [self.make_program(generator, 48)
+                        for _ in range(NUM_LANES)]
+            seeds = list(range(trial * NUM_LANES, (trial + 1) * NUM_LANES))
+            cpus = [self.make_cpu(program, seed)
+                    for program, seed in zip(programs, seeds)]
+            machines = VectorChip8(NUM_LANES, seeds=seeds)
+            for lane, program in enumerate(programs):
+                machines.load(program, lanes=lane)
+            machines.index[:] = 0x300
+
+            for _ in range(30):
+                for lane, cpu in enumerate(cpus):
+                    keys = [generator.random() < 0.2 for _ in range(16)]
+                    cpu.keys = keys_to_mask(keys)
+                    machines.keys[lane] = keys
+                    if cpu.running:
+                        cpu.run_frame()
+                machines.run_frame()
+                for lane, cpu in enumerate(cpus):
+                    self.assert_lane_matches(machines, lane, cpu)
+
+    def test_call_and_return(self):
+        program = bytes([0x22, 0x06, 0x60, 0x01, 0x00, 0xFD,
+                         0x61, 0x02, 0x00, 0xEE])
+        cpu = self.make_cpu(program, 0)
+        machines = VectorChip8(2, seeds=[0, 0])
+        machines.load(program)
+        machines.index[:] = 0x300
+        cpu.run_frame()
+        machines.run_frame()
+        for lane in range(2):
+            self.assert_lane_matches(machines, lane, cpu)
+        self.assertFalse(machines.running.any())
+
+    def test_lanes_diverge_on_keys(self):
+        program = bytes([0xE0, 0x9E, 0x61, 0x01, 0x62, 0x01])
+        machines = VectorChip8(2)
+        machines.load(program)
+        machines.keys[1, 0] = True
+        machines.step()
+        machines.step()
+        self.assertEqual(list(machines.v[:, 1]), [1, 0])
+        self.assertEqual(list(machines.v[:, 2]), [0, 1])
+        self.assertEqual(list(machines.pc), [0x204, 0x206])
+
+    def test_unknown_opcode_raises(self):
+        machines = VectorChip8(2)
+        machines.load(bytes([0xF0, 0xFF]), lanes=1)
+        machines.load(bytes([0x60, 0x01]), lanes=0)
+        with self.assertRaises(UnknownOpCodeException):
+            machines.step()
+
+
+if __name__ == '__main__':
+    unittest.main()